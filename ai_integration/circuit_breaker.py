@@ -0,0 +1,103 @@
+import os
+import time
+import threading
+
+# Breaker settings (can be tuned per deployment through the environment)
+FAILURE_THRESHOLD = int(os.getenv('LLM_BREAKER_FAILURES', 5))
+RESET_TIMEOUT = float(os.getenv('LLM_BREAKER_RESET_SECONDS', 30))
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream that keeps failing.
+
+    The breaker is closed while calls succeed. After failure_threshold
+    consecutive failures it opens and rejects calls for reset_timeout
+    seconds, then lets a single trial call through (half open): success
+    closes it again, failure reopens it.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self.counters = {'trips': 0, 'rejected': 0}
+
+    @property
+    def state(self):
+        """'closed', 'open' or 'half_open'"""
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """
+        Check whether a call may go upstream.
+
+        Returns:
+            bool: False while the breaker is open, or while the half-open trial call is running
+        """
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.counters['rejected'] += 1
+            return False
+
+    def record_success(self):
+        """Close the breaker after a successful call"""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        """Count a failed call, opening the breaker at the threshold"""
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_running:
+                    self.counters['trips'] += 1
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+
+    def stats(self):
+        """Get the breaker state and counters"""
+        with self._lock:
+            return dict(self.counters, state=self._state(), failures=self._failures)
+
+
+class BreakerRegistry:
+    """One breaker per upstream model, created on first use"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def get(self, name):
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker()
+            return breaker
+
+    def stats(self):
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.stats() for name, breaker in breakers.items()}
+
+
+# Shared registry used by the gateway
+breakers = BreakerRegistry()
@@ -0,0 +1,361 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+import openai
+from openai import OpenAI
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Backend selection: 'openai' (default), 'record' (call OpenAI and save fixtures) or 'replay' (serve fixtures)
+BACKEND = os.getenv('LLM_BACKEND', 'openai')
+FIXTURE_DIR = os.getenv('LLM_FIXTURE_DIR', os.path.join(os.path.dirname(__file__), 'fixtures'))
+
+# Replay settings: latency distribution and what to do with requests that were never recorded
+REPLAY_LATENCY = os.getenv('LLM_REPLAY_LATENCY', 'recorded')
+REPLAY_MISS = os.getenv('LLM_REPLAY_MISS', 'error')
+
+DEFAULT_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 30))
+MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 1))
+
+# Shared OpenAI client (one connection pool for the whole process)
+_client = None
+_client_lock = threading.Lock()
+
+
+class LLMError(Exception):
+    """Raised when a model call fails"""
+
+
+class LLMTimeoutError(LLMError):
+    """Raised when a model call misses its deadline"""
+
+
+def _resolve_api_key():
+    """Find the OpenAI API key in the environment or the Replit secrets file"""
+    # Try to get API key from environment variables
+    key = os.getenv('OPENAI_API_KEY')
+
+    # If not found, try to get it from .replit file
+    if not key:
+        try:
+            # Check if we're on Replit
+            if os.environ.get('REPL_ID'):
+                # Try to read the API key from .replit file
+                import configparser
+                config = configparser.ConfigParser()
+                config.read('.replit')
+                if 'secrets' in config and 'OPENAI_API_KEY' in config['secrets']:
+                    key = config['secrets']['OPENAI_API_KEY']
+        except Exception as e:
+            print(f"Error reading API key from .replit: {e}")
+
+    return key
+
+
+api_key = _resolve_api_key()
+
+
+def get_client():
+    """
+    Get the shared OpenAI client, creating it on first use.
+
+    The client is created lazily so that importing the gateway never fails
+    when no API key is configured; the error surfaces on the first call instead.
+
+    Returns:
+        OpenAI: The shared client
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenAI(
+                    api_key=api_key or "",
+                    timeout=DEFAULT_TIMEOUT,
+                    max_retries=MAX_RETRIES
+                )
+    return _client
+
+
+def is_completion_model(model):
+    """Check whether a model is served by the legacy completions endpoint"""
+    return 'instruct' in model
+
+
+def fixture_key(request):
+    """
+    Identify a request for recording and replay.
+
+    The model is left out: the router may send a task to another tier than
+    the one it was recorded on (its latency samples differ on every run), and
+    the recorded answer should still be served.
+
+    Args:
+        request (dict): model, prompt, system_prompt, max_tokens and temperature
+
+    Returns:
+        str: Hex digest of the request without its model
+    """
+    payload = json.dumps({k: v for k, v in request.items() if k != 'model'}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class OpenAIBackend:
+    """Calls the OpenAI API through the shared client"""
+
+    name = 'openai'
+
+    def _create(self, request, timeout, **options):
+        model = request['model']
+        options.update({'model': model, 'max_tokens': request['max_tokens'], 'timeout': timeout})
+        if request.get('temperature') is not None:
+            options['temperature'] = request['temperature']
+
+        if is_completion_model(model):
+            return get_client().completions.create(prompt=request['prompt'], **options)
+
+        messages = []
+        if request.get('system_prompt'):
+            messages.append({"role": "system", "content": request['system_prompt']})
+        messages.append({"role": "user", "content": request['prompt']})
+        return get_client().chat.completions.create(messages=messages, **options)
+
+    def complete(self, request, timeout):
+        """
+        Run a blocking call.
+
+        Args:
+            request (dict): model, prompt, system_prompt, max_tokens and temperature
+            timeout (float): Seconds left before the deadline
+
+        Returns:
+            dict: text, prompt_tokens and completion_tokens
+        """
+        try:
+            response = self._create(request, timeout)
+        except openai.APITimeoutError as e:
+            raise LLMTimeoutError(f"Model call exceeded {timeout:.1f}s") from e
+        except openai.OpenAIError as e:
+            raise LLMError(str(e)) from e
+
+        choice = response.choices[0]
+        text = choice.text if is_completion_model(request['model']) else choice.message.content
+        usage = getattr(response, 'usage', None)
+        return {
+            'text': text or "",
+            'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+            'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0
+        }
+
+    def stream(self, request, timeout):
+        """
+        Run a streaming call.
+
+        Args:
+            request (dict): model, prompt, system_prompt, max_tokens and temperature
+            timeout (float): Seconds left before the deadline
+
+        Yields:
+            tuple: (text, usage) pairs; usage is a (prompt_tokens, completion_tokens)
+                tuple on the chunk that reports it and None otherwise
+        """
+        completion_model = is_completion_model(request['model'])
+        options = {'stream': True}
+        if not completion_model:
+            # Ask for token usage in the final chunk
+            options['stream_options'] = {'include_usage': True}
+
+        try:
+            response = self._create(request, timeout, **options)
+            for event in response:
+                usage = getattr(event, 'usage', None)
+                usage = (usage.prompt_tokens, usage.completion_tokens) if usage else None
+                text = ''
+                if event.choices:
+                    choice = event.choices[0]
+                    text = (choice.text if completion_model else choice.delta.content) or ''
+                if text or usage:
+                    yield text, usage
+        except openai.APITimeoutError as e:
+            raise LLMTimeoutError(f"Model call exceeded {timeout:.1f}s") from e
+        except openai.OpenAIError as e:
+            raise LLMError(str(e)) from e
+
+
+class RecordingBackend:
+    """Passes calls to another backend and saves every response as a fixture"""
+
+    name = 'record'
+
+    def __init__(self, inner, fixture_dir=FIXTURE_DIR):
+        self.inner = inner
+        self.fixture_dir = fixture_dir
+        os.makedirs(self.fixture_dir, exist_ok=True)
+
+    def _save(self, request, response, latency):
+        filepath = os.path.join(self.fixture_dir, f"{fixture_key(request)}.json")
+        tmp_path = f"{filepath}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'request': request, 'response': response, 'latency': latency}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, filepath)
+
+    def complete(self, request, timeout):
+        started = time.monotonic()
+        response = self.inner.complete(request, timeout)
+        self._save(request, response, time.monotonic() - started)
+        return response
+
+    def stream(self, request, timeout):
+        started = time.monotonic()
+        chunks = []
+        prompt_tokens = completion_tokens = 0
+        for text, usage in self.inner.stream(request, timeout):
+            chunks.append(text)
+            if usage:
+                prompt_tokens, completion_tokens = usage
+            yield text, usage
+
+        response = {'text': ''.join(chunks), 'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens}
+        self._save(request, response, time.monotonic() - started)
+
+
+def parse_latency(spec):
+    """
+    Parse a synthetic latency distribution.
+
+    Supported specs: 'none', 'recorded' (replay the recorded wall time),
+    'fixed:SECONDS', 'uniform:LOW,HIGH', 'normal:MEAN,STDDEV' and
+    'lognormal:MU,SIGMA' (parameters of the underlying normal, in log-seconds).
+
+    Args:
+        spec (str): The distribution spec
+
+    Returns:
+        callable: Function of the recorded latency returning seconds to sleep
+    """
+    name, _, args = spec.partition(':')
+    params = [float(value) for value in args.split(',')] if args else []
+
+    if name == 'none':
+        return lambda recorded: 0.0
+    if name == 'recorded':
+        return lambda recorded: recorded or 0.0
+    if name == 'fixed':
+        return lambda recorded: params[0]
+    if name == 'uniform':
+        return lambda recorded: random.uniform(params[0], params[1])
+    if name == 'normal':
+        return lambda recorded: max(0.0, random.gauss(params[0], params[1]))
+    if name == 'lognormal':
+        return lambda recorded: random.lognormvariate(params[0], params[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class ReplayBackend:
+    """Serves recorded fixtures with synthetic latency, without touching the network"""
+
+    name = 'replay'
+
+    def __init__(self, fixture_dir=FIXTURE_DIR, latency=REPLAY_LATENCY, on_miss=REPLAY_MISS):
+        self.fixture_dir = fixture_dir
+        self.latency = parse_latency(latency)
+        self.on_miss = on_miss
+        self._fixtures = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Index every fixture file by request key"""
+        fixtures = {}
+        if os.path.isdir(self.fixture_dir):
+            for filename in os.listdir(self.fixture_dir):
+                if filename.endswith('.json'):
+                    with open(os.path.join(self.fixture_dir, filename), 'r', encoding='utf-8') as f:
+                        fixture = json.load(f)
+                    fixtures[fixture_key(fixture['request'])] = fixture
+        return fixtures
+
+    def _lookup(self, request):
+        with self._lock:
+            if self._fixtures is None:
+                self._fixtures = self._load()
+        fixture = self._fixtures.get(fixture_key(request))
+        if fixture is not None:
+            return fixture
+
+        if self.on_miss == 'synthetic':
+            # Deterministic filler sized like a real answer, so our own code paths still do full work
+            words = max(1, request['max_tokens'] * 3 // 4)
+            text = ' '.join(re.findall(r'\w+', request['prompt'])[:20] or ['respuesta'])
+            text = ' '.join((text.split() * (words // max(1, len(text.split())) + 1))[:words])
+            return {
+                'response': {'text': text, 'prompt_tokens': len(request['prompt']) // 4, 'completion_tokens': words * 4 // 3},
+                'latency': None
+            }
+
+        raise LLMError(f"No recorded response for request {fixture_key(request)[:12]}")
+
+    def complete(self, request, timeout):
+        fixture = self._lookup(request)
+        delay = self.latency(fixture.get('latency'))
+        if delay > timeout:
+            time.sleep(timeout)
+            raise LLMTimeoutError(f"Model call exceeded {timeout:.1f}s")
+        time.sleep(delay)
+        return dict(fixture['response'])
+
+    def stream(self, request, timeout):
+        fixture = self._lookup(request)
+        response = fixture['response']
+        delay = self.latency(fixture.get('latency'))
+
+        # Spread the latency over word-sized chunks
+        chunks = re.findall(r'\S+\s*', response['text']) or ['']
+        started = time.monotonic()
+        for chunk in chunks:
+            time.sleep(delay / len(chunks))
+            if time.monotonic() - started > timeout:
+                raise LLMTimeoutError(f"Model call exceeded {timeout:.1f}s")
+            yield chunk, None
+        yield '', (response.get('prompt_tokens', 0), response.get('completion_tokens', 0))
+
+
+_backend = None
+
+
+def get_backend():
+    """
+    Get the backend selected by LLM_BACKEND, creating it on first use.
+
+    Returns:
+        The backend object (OpenAIBackend, RecordingBackend or ReplayBackend)
+    """
+    global _backend
+    if _backend is None:
+        with _client_lock:
+            if _backend is None:
+                if BACKEND == 'replay':
+                    _backend = ReplayBackend()
+                elif BACKEND == 'record':
+                    _backend = RecordingBackend(OpenAIBackend())
+                elif BACKEND == 'openai':
+                    _backend = OpenAIBackend()
+                else:
+                    raise ValueError(f"Unknown LLM_BACKEND: {BACKEND}")
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Replace the active backend (for tests and load-test harnesses).
+
+    Args:
+        backend: An object with complete(request, timeout) and stream(request, timeout)
+    """
+    global _backend
+    _backend = backend
@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Use in-memory storage only for Vercel deployment (read-only file system)
+# Check if running on Vercel
+IS_VERCEL = os.environ.get('VERCEL') == '1'
+
+# Cache settings (can be tuned per deployment through the environment)
+CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', '1') == '1'
+MEMORY_ENTRIES = int(os.getenv('LLM_CACHE_MEMORY_ENTRIES', 1024))
+DISK_TTL = int(os.getenv('LLM_CACHE_TTL', 7 * 24 * 3600))
+DISK_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+CACHE_DIR = os.getenv('LLM_CACHE_DIR', os.path.join(os.path.dirname(__file__), 'cache'))
+
+
+def make_key(template, model, params, prompt):
+    """
+    Build a content-addressed cache key for a model call.
+
+    Args:
+        template (str): Prompt template id and version
+        model (str): The model name
+        params (dict): Generation parameters (max_tokens, temperature, ...)
+        prompt (str): The rendered prompt
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    payload = json.dumps(
+        {'template': template, 'model': model, 'params': params, 'prompt': prompt},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """Two-tier response cache: an in-process LRU in front of a directory of JSON files"""
+
+    def __init__(self, cache_dir=None, memory_entries=MEMORY_ENTRIES, ttl=DISK_TTL, max_bytes=DISK_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None
+
+        self.counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'evictions': 0,
+            'saved_seconds': 0.0,
+            'saved_tokens': 0
+        }
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _remember(self, key, value):
+        """Insert into the memory tier, evicting the least recently used entry"""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _count_hit(self, tier, value):
+        self.counters[tier] += 1
+        self.counters['saved_seconds'] += value.get('latency', 0.0)
+        self.counters['saved_tokens'] += value.get('prompt_tokens', 0) + value.get('completion_tokens', 0)
+
+    def get(self, key, count=True, allow_stale=False):
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): Key from make_key()
+            count (bool): Whether the lookup updates the hit/miss counters
+            allow_stale (bool): Whether expired disk entries may be returned
+                (used to keep serving while the model is unavailable)
+
+        Returns:
+            dict: The cached response fields, or None on a miss
+        """
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                if count:
+                    self._count_hit('memory_hits', value)
+                return value
+
+        value = self._read_disk(key, allow_stale)
+
+        with self._lock:
+            if value is None:
+                if count:
+                    self.counters['misses'] += 1
+                return None
+            # Stale reads stay out of the memory tier, so they are never served as fresh
+            if not allow_stale:
+                self._remember(key, value)
+            if count:
+                self._count_hit('disk_hits', value)
+            return value
+
+    def set(self, key, value):
+        """
+        Store a response in both tiers.
+
+        Args:
+            key (str): Key from make_key()
+            value (dict): JSON-serializable response fields
+        """
+        with self._lock:
+            self._remember(key, value)
+            self.counters['writes'] += 1
+
+        if self.cache_dir:
+            self._write_disk(key, value)
+
+    def _read_disk(self, key, allow_stale=False):
+        if not self.cache_dir:
+            return None
+
+        filepath = self._path(key)
+        try:
+            # Expired entries are left for _evict() so they can still be served stale
+            if not allow_stale and time.time() - os.path.getmtime(filepath) > self.ttl:
+                return None
+            with open(filepath, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, value):
+        filepath = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+            # Write to a temporary file and rename so readers never see partial entries
+            tmp_path = f"{filepath}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, filepath)
+        except OSError as e:
+            print(f"Error writing LLM cache entry: {e}")
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_size()
+            else:
+                self._disk_bytes += len(data)
+            over_limit = self._disk_bytes > self.max_bytes
+
+        if over_limit:
+            self._evict()
+
+    def _remove(self, filepath):
+        try:
+            size = os.path.getsize(filepath)
+            os.remove(filepath)
+        except OSError:
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes -= size
+            self.counters['evictions'] += 1
+
+    def _entries(self):
+        """List (mtime, size, path) for every entry in the disk tier"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                if not filename.endswith('.json'):
+                    continue
+                filepath = os.path.join(root, filename)
+                try:
+                    stat = os.stat(filepath)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, filepath))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Drop expired entries, then the oldest ones until the disk tier is under 90% of its budget"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        now = time.time()
+
+        for mtime, size, filepath in entries:
+            if total <= target and now - mtime <= self.ttl:
+                break
+            self._remove(filepath)
+            total -= size
+
+        with self._lock:
+            self._disk_bytes = total
+
+    def stats(self):
+        """
+        Get the cache hit/miss counters.
+
+        Returns:
+            dict: Counters plus the current hit rate and tier sizes
+        """
+        with self._lock:
+            stats = dict(self.counters)
+            stats['memory_entries'] = len(self._memory)
+            stats['disk_bytes'] = self._disk_bytes
+
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+
+# Shared cache used by the gateway
+cache = LLMCache(cache_dir=None if IS_VERCEL else CACHE_DIR)
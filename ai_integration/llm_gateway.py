@@ -0,0 +1,520 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+from ai_integration import llm_cache, semantic_cache
+from ai_integration.llm_backends import api_key, get_backend, LLMError, LLMTimeoutError
+from ai_integration.circuit_breaker import breakers
+from ai_integration.model_router import router
+from ai_integration.single_flight import flights
+from ai_integration.llm_metrics import metrics
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Gateway settings (can be tuned per deployment through the environment)
+DEFAULT_MODEL = os.getenv('LLM_DEFAULT_MODEL', 'gpt-3.5-turbo')
+DEFAULT_SYSTEM_PROMPT = "You are a language learning assistant."
+MAX_IN_FLIGHT = int(os.getenv('LLM_MAX_IN_FLIGHT', 16))
+DEFAULT_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 30))
+
+# Deadline in seconds per task (template name without version); LLM_DEADLINES
+# overrides them as "task=seconds,task=seconds"
+DEADLINES = {
+    'interactive_lesson': 45,
+    'subject_lesson': 45,
+    'cultural_content': 30,
+    'immersion_content': 30,
+    'article_chunk_study_aids': 30,
+    'youtube_chunk_study_aids': 30,
+    'writing_exercise': 20,
+    'typing_exercise': 20,
+    'writing_feedback': 20,
+    'journal_feedback': 20,
+    'translation_batch': 20
+}
+for _override in filter(None, os.getenv('LLM_DEADLINES', '').split(',')):
+    _task, _, _seconds = _override.partition('=')
+    DEADLINES[_task.strip()] = float(_seconds)
+
+# Hedging: when a call outlives the recent p95 for its task and model, send a
+# second identical request and take whichever answers first
+HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', '1') == '1'
+HEDGE_PERCENTILE = int(os.getenv('LLM_HEDGE_PERCENTILE', 95))
+HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', 20))
+
+# Bounds the number of model calls in flight across all request threads.
+# Because every call holds a slot, this also bounds the number of pooled
+# connections the shared client keeps open. The slots are split into lanes
+# by latency target (see model_router), so quick tasks such as translations
+# never queue behind lesson generations.
+SHORT_LANE_SLOTS = int(os.getenv('LLM_SHORT_LANE_SLOTS', MAX_IN_FLIGHT // 2))
+_lanes = {
+    'short': threading.BoundedSemaphore(SHORT_LANE_SLOTS),
+    'long': threading.BoundedSemaphore(MAX_IN_FLIGHT - SHORT_LANE_SLOTS)
+}
+
+# Runs hedged calls, so that a stuck request never holds the caller past its deadline
+_hedge_pool = ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT * 2, thread_name_prefix='llm-hedge')
+_hedge_counters = {'hedged': 0, 'hedge_wins': 0, 'abandoned': 0, 'stale_served': 0}
+_counters_lock = threading.Lock()
+
+
+class LLMUnavailableError(LLMError):
+    """Raised without calling the model while its circuit breaker is open"""
+
+
+class LLMResponse:
+    """Result of a model call, identical for every call site"""
+
+    def __init__(self, text, model, prompt_tokens=0, completion_tokens=0, latency=0.0, cached=False):
+        self.text = text
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.latency = latency
+        self.cached = cached
+
+    def to_dict(self):
+        """Convert the response to a dictionary for logging and API responses"""
+        return {
+            'text': self.text,
+            'model': self.model,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'latency': self.latency,
+            'cached': self.cached
+        }
+
+
+def complete(prompt, max_tokens=500, model=None, system_prompt=DEFAULT_SYSTEM_PROMPT, temperature=None, timeout=None,
+             template=None, use_cache=False, route=None, hedge=None, semantic=None):
+    """
+    Run a single model call through the shared gateway.
+
+    When use_cache is set, identical requests (same template, model,
+    parameters and rendered prompt) are answered from the response cache,
+    and concurrent identical misses share a single upstream call. For tasks
+    that opted in to the semantic cache, a miss may also be answered with
+    the cached response to a sufficiently similar request.
+
+    If the model fails or its circuit breaker is open, the call is answered
+    from an expired cache entry when there is one; otherwise the error reaches
+    the caller, which serves its own degraded result (e.g. the pre-check
+    feedback of journal entries and writing checks).
+
+    Args:
+        prompt (str): The prompt to send
+        max_tokens (int): Maximum number of tokens to generate
+        model (str, optional): The model to use (defaults to the model the router
+            picks for the task, or LLM_DEFAULT_MODEL for untemplated calls)
+        system_prompt (str): System message for chat models
+        temperature (float, optional): Sampling temperature
+        timeout (float, optional): Deadline in seconds for the whole call,
+            including time spent waiting for a free slot (defaults to the
+            task's entry in DEADLINES)
+        template (str, optional): Id and version of the prompt template
+        use_cache (bool): Whether to serve and store the response in the cache
+        route (str, optional): Route charged for the call in the metrics
+            (defaults to the current Flask endpoint)
+        hedge (bool, optional): Whether a slow call may be hedged (defaults to LLM_HEDGE_ENABLED)
+        semantic (tuple, optional): (exact parameters, free text) of the request
+            for the semantic cache, as built by RenderedPrompt.options()
+
+    Returns:
+        LLMResponse: The model response
+
+    Raises:
+        LLMTimeoutError: If the deadline passes before the call completes
+        LLMUnavailableError: If the circuit breaker for the model is open
+        LLMError: If the model call fails
+    """
+    # The router picks the model tier and token budget for the task
+    selection = router.select(_task_name(template), model, max_tokens)
+    model = selection.model or DEFAULT_MODEL
+    max_tokens = selection.max_tokens
+    # Metrics and hedging track each template version separately, so versions can be compared
+    task = template
+    timeout = timeout or DEADLINES.get(_task_name(template), DEFAULT_TIMEOUT)
+    hedge_after = _hedge_delay(task, model) if (HEDGE_ENABLED if hedge is None else hedge) else None
+    started = time.monotonic()
+    status = 'bypass'
+    cache_key = None
+
+    try:
+        if not (use_cache and llm_cache.CACHE_ENABLED):
+            result = _call_model(prompt, max_tokens, model, system_prompt, temperature, timeout, hedge_after, selection.lane)
+        else:
+            params = {'max_tokens': max_tokens, 'temperature': temperature, 'system_prompt': system_prompt}
+            cache_key = llm_cache.make_key(template, model, params, prompt)
+            hit = llm_cache.cache.get(cache_key)
+            similar = None if hit is not None else _similar_hit(template, model, params, semantic)
+            if hit is not None or similar is not None:
+                status = 'hit' if hit is not None else 'similar'
+                result = _from_cache(hit or similar)
+            else:
+                # Callers that wait on another caller's flight never run fetch()
+                status = 'coalesced'
+
+                def fetch():
+                    nonlocal status
+                    # Another thread or process may have filled the cache while we waited for the flight
+                    hit = llm_cache.cache.get(cache_key, count=False)
+                    if hit is not None:
+                        status = 'hit'
+                        return _from_cache(hit)
+
+                    status = 'miss'
+                    result = _call_model(
+                        prompt, max_tokens, model, system_prompt, temperature, timeout, hedge_after, selection.lane
+                    )
+                    llm_cache.cache.set(cache_key, result.to_dict())
+                    _index_similar(template, model, params, semantic, cache_key)
+                    return result
+
+                result = flights.do(cache_key, fetch, timeout=timeout)
+
+    except LLMError as e:
+        degraded = _degraded(cache_key)
+        if degraded is None:
+            metrics.record(task, model, latency=time.monotonic() - started, cache_status=status, error=True, route=route)
+            raise
+        status, result = degraded
+        print(f"Serving {status} response for {task or 'untemplated'} call: {e}")
+        metrics.record(task, model, latency=time.monotonic() - started, cache_status=status, error=True, route=route)
+        return result
+    except Exception:
+        metrics.record(task, model, latency=time.monotonic() - started, cache_status=status, error=True, route=route)
+        raise
+
+    # Only the caller that actually hit the model is charged for its tokens
+    charged = status in ('miss', 'bypass')
+    if charged:
+        router.observe(_task_name(template), result.model, result.latency)
+    metrics.record(
+        task,
+        result.model,
+        prompt_tokens=result.prompt_tokens if charged else 0,
+        completion_tokens=result.completion_tokens if charged else 0,
+        latency=time.monotonic() - started,
+        cache_status=status,
+        route=route
+    )
+    return result
+
+
+def _task_name(template):
+    """Strip the version from a template id ('interactive_lesson:1' -> 'interactive_lesson')"""
+    return template.split(':', 1)[0] if template else None
+
+
+def _semantic_partition(template, model, params, semantic):
+    """The semantic cache partition for a request, or None if its task has not opted in"""
+    if not semantic or semantic_cache.threshold_for(_task_name(template)) is None:
+        return None
+    return llm_cache.make_key(template, model, params, semantic[0])
+
+
+def _similar_hit(template, model, params, semantic):
+    """
+    Find the cached response to a similar earlier request.
+
+    Returns:
+        dict: The cache entry, or None
+    """
+    partition = _semantic_partition(template, model, params, semantic)
+    if partition is None:
+        return None
+    match = semantic_cache.index.lookup(partition, semantic[1], semantic_cache.threshold_for(_task_name(template)))
+    if match is None:
+        return None
+    hit = llm_cache.cache.get(match[0], count=False)
+    if hit is None:
+        # The response has since been evicted from the cache
+        semantic_cache.index.discard(partition, match[0])
+    return hit
+
+
+def _index_similar(template, model, params, semantic, cache_key):
+    """Make a freshly cached response available to similar requests"""
+    partition = _semantic_partition(template, model, params, semantic)
+    if partition is not None:
+        semantic_cache.index.add(partition, semantic[1], cache_key)
+
+
+def _count(name):
+    with _counters_lock:
+        _hedge_counters[name] += 1
+
+
+def _hedge_delay(task, model):
+    """Seconds after which a call is hedged, or None until there are enough samples"""
+    return metrics.percentile(HEDGE_PERCENTILE, task=task, model=model, min_samples=HEDGE_MIN_SAMPLES)
+
+
+def _degraded(cache_key):
+    """
+    Find something to serve after the model failed.
+
+    Returns:
+        tuple: ('stale', response) for an expired cache entry, or None if there is none
+    """
+    if cache_key is not None:
+        hit = llm_cache.cache.get(cache_key, count=False, allow_stale=True)
+        if hit is not None:
+            _count('stale_served')
+            return 'stale', _from_cache(hit)
+    return None
+
+
+def _from_cache(hit):
+    """Build a response from a cache entry"""
+    return LLMResponse(
+        text=hit['text'],
+        model=hit['model'],
+        prompt_tokens=hit.get('prompt_tokens', 0),
+        completion_tokens=hit.get('completion_tokens', 0),
+        latency=0.0,
+        cached=True
+    )
+
+
+def _request(prompt, max_tokens, model, system_prompt, temperature):
+    """Describe a model call for the backend"""
+    return {
+        'model': model,
+        'prompt': prompt,
+        'system_prompt': system_prompt,
+        'max_tokens': max_tokens,
+        'temperature': temperature
+    }
+
+
+def _call_model(prompt, max_tokens, model, system_prompt, temperature, timeout, hedge_after=None, lane='long'):
+    """Make the upstream call while holding an in-flight slot in the given lane"""
+    started = time.monotonic()
+    deadline = started + timeout
+    slots = _lanes[lane]
+
+    # Wait for a free slot, but never past the deadline
+    if not slots.acquire(timeout=timeout):
+        raise LLMTimeoutError(f"No free model slot within {timeout:.1f}s")
+
+    try:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMTimeoutError(f"Deadline of {timeout:.1f}s passed before the call started")
+
+        breaker = breakers.get(model)
+        if not breaker.allow():
+            raise LLMUnavailableError(f"Circuit breaker open for {model}")
+
+        request = _request(prompt, max_tokens, model, system_prompt, temperature)
+        try:
+            if hedge_after is not None and hedge_after < remaining:
+                response = _hedged(request, remaining, hedge_after, lane)
+            else:
+                response = get_backend().complete(request, remaining)
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+    finally:
+        slots.release()
+
+    return LLMResponse(
+        text=response['text'].strip(),
+        model=model,
+        prompt_tokens=response.get('prompt_tokens', 0),
+        completion_tokens=response.get('completion_tokens', 0),
+        latency=time.monotonic() - started
+    )
+
+
+def _hedged(request, timeout, hedge_after, lane='long'):
+    """
+    Run a call, and send an identical second request if the first has not
+    answered after hedge_after seconds. The caller already holds a slot for
+    the first request; the hedge is only sent if another slot in the same
+    lane is free, so hedging never adds load to a saturated gateway.
+
+    Returns:
+        dict: The first successful response
+
+    Raises:
+        LLMTimeoutError: If neither request answers before the deadline
+        LLMError: If every request that was sent failed
+    """
+    deadline = time.monotonic() + timeout
+    backend = get_backend()
+    primary = _hedge_pool.submit(backend.complete, request, timeout)
+    pending = {primary}
+    secondary = None
+
+    done, _ = wait(pending, timeout=hedge_after)
+    slots = _lanes[lane]
+    if not done and slots.acquire(blocking=False):
+        def run_hedge():
+            try:
+                return backend.complete(request, timeout - hedge_after)
+            finally:
+                slots.release()
+
+        secondary = _hedge_pool.submit(run_hedge)
+        pending.add(secondary)
+        _count('hedged')
+
+    error = None
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                if future is secondary:
+                    _count('hedge_wins')
+                return future.result()
+            error = future.exception()
+
+    if pending:
+        # Stuck requests finish in the pool; the caller is released at its deadline
+        _count('abandoned')
+        raise LLMTimeoutError(f"Model call exceeded {timeout:.1f}s")
+    raise error
+
+
+def stats():
+    """
+    Get the gateway's resilience counters.
+
+    Returns:
+        dict: Hedging and degraded-serving counters, the state of every circuit
+            breaker and the model router's choices
+    """
+    with _counters_lock:
+        counters = dict(_hedge_counters)
+    counters['breakers'] = breakers.stats()
+    counters['routing'] = router.stats()
+    return counters
+
+
+def complete_text(prompt, **kwargs):
+    """
+    Run a model call and return only the generated text.
+
+    Args:
+        prompt (str): The prompt to send
+        **kwargs: Options passed through to complete()
+
+    Returns:
+        str: The generated text
+    """
+    return complete(prompt, **kwargs).text
+
+
+def stream_text(prompt, max_tokens=500, model=None, system_prompt=DEFAULT_SYSTEM_PROMPT, temperature=None, timeout=None,
+                template=None, use_cache=False, semantic=None):
+    """
+    Run a model call and yield the generated text as it arrives.
+
+    Takes the same arguments as complete(), except hedging.
+    A cache hit is yielded as a single chunk; a streamed response is stored
+    in the cache once complete. While the circuit breaker is open an expired
+    cache entry is yielded instead, if there is one.
+
+    Yields:
+        str: Chunks of generated text
+
+    Raises:
+        LLMTimeoutError: If the deadline passes before the stream completes
+        LLMUnavailableError: If the circuit breaker for the model is open
+        LLMError: If the model call fails
+    """
+    selection = router.select(_task_name(template), model, max_tokens)
+    model = selection.model or DEFAULT_MODEL
+    max_tokens = selection.max_tokens
+    slots = _lanes[selection.lane]
+    # Metrics track each template version separately
+    task = template
+    timeout = timeout or DEADLINES.get(_task_name(template), DEFAULT_TIMEOUT)
+    started = time.monotonic()
+    deadline = started + timeout
+
+    cache_key = None
+    if use_cache and llm_cache.CACHE_ENABLED:
+        params = {'max_tokens': max_tokens, 'temperature': temperature, 'system_prompt': system_prompt}
+        cache_key = llm_cache.make_key(template, model, params, prompt)
+        hit = llm_cache.cache.get(cache_key)
+        status = 'hit'
+        if hit is None:
+            hit = _similar_hit(template, model, params, semantic)
+            status = 'similar'
+        if hit is not None:
+            metrics.record(task, hit['model'], latency=time.monotonic() - started, cache_status=status)
+            yield hit['text']
+            return
+
+    if not slots.acquire(timeout=timeout):
+        metrics.record(task, model, latency=time.monotonic() - started, error=True)
+        raise LLMTimeoutError(f"No free model slot within {timeout:.1f}s")
+
+    breaker = breakers.get(model)
+    if not breaker.allow():
+        slots.release()
+        degraded = _degraded(cache_key)
+        if degraded is None:
+            metrics.record(task, model, latency=time.monotonic() - started, error=True)
+            raise LLMUnavailableError(f"Circuit breaker open for {model}")
+        metrics.record(task, model, latency=time.monotonic() - started, cache_status='stale', error=True)
+        yield degraded[1].text
+        return
+
+    chunks = []
+    usage = None
+    failed = finished = False
+    try:
+        request = _request(prompt, max_tokens, model, system_prompt, temperature)
+        for text, event_usage in get_backend().stream(request, timeout):
+            if time.monotonic() > deadline:
+                raise LLMTimeoutError(f"Model stream exceeded {timeout:.1f}s")
+            if event_usage:
+                usage = event_usage
+            if text:
+                chunks.append(text)
+                yield text
+        finished = True
+
+    except Exception:
+        failed = True
+        metrics.record(task, model, latency=time.monotonic() - started, error=True)
+        raise
+    finally:
+        slots.release()
+        # A stream the client abandoned after the first chunk still shows the model is answering
+        if failed or not (finished or chunks):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    prompt_tokens, completion_tokens = usage or (0, 0)
+    result = LLMResponse(
+        text=''.join(chunks).strip(),
+        model=model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        latency=time.monotonic() - started
+    )
+    metrics.record(
+        task,
+        model,
+        prompt_tokens=result.prompt_tokens,
+        completion_tokens=result.completion_tokens,
+        latency=result.latency,
+        cache_status='miss' if cache_key is not None else 'bypass'
+    )
+    router.observe(_task_name(template), model, result.latency)
+
+    if cache_key is not None:
+        llm_cache.cache.set(cache_key, result.to_dict())
+        _index_similar(template, model, params, semantic, cache_key)
@@ -0,0 +1,221 @@
+import os
+import time
+import atexit
+import sqlite3
+import datetime
+import threading
+from collections import deque
+
+# Use in-memory aggregation only for Vercel deployment (read-only file system)
+# Check if running on Vercel
+IS_VERCEL = os.environ.get('VERCEL') == '1'
+
+# Local SQLite table the aggregates are flushed to
+STATS_DB = os.getenv('LLM_STATS_DB', os.path.join(os.path.dirname(__file__), 'llm_stats.db'))
+FLUSH_INTERVAL = int(os.getenv('LLM_STATS_FLUSH_SECONDS', 60))
+
+# Number of recent latencies kept per (route, task, model) for percentiles
+LATENCY_WINDOW = 512
+
+# USD per 1K (prompt, completion) tokens
+MODEL_PRICES = {
+    'gpt-3.5-turbo': (0.0005, 0.0015),
+    'gpt-3.5-turbo-instruct': (0.0015, 0.002),
+    'gpt-4o-mini': (0.00015, 0.0006),
+    'gpt-4o': (0.0025, 0.01)
+}
+
+_COUNTERS = ('calls', 'errors', 'cache_hits', 'coalesced', 'prompt_tokens', 'completion_tokens', 'total_latency', 'cost')
+
+
+def _empty():
+    stats = dict.fromkeys(_COUNTERS, 0)
+    stats['max_latency'] = 0.0
+    return stats
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Estimate the USD cost of a call from its token counts"""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+def current_route():
+    """Name the Flask endpoint making the call, or 'background' outside a request"""
+    try:
+        from flask import has_request_context, request
+        if has_request_context():
+            return request.endpoint or request.path
+    except ImportError:
+        pass
+    return 'background'
+
+
+class LLMMetrics:
+    """Cheap in-process aggregator of model call statistics"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._pending = {}
+        self._latencies = {}
+        self._period_start = datetime.datetime.utcnow()
+        self._flusher = None
+
+    def record(self, task, model, prompt_tokens=0, completion_tokens=0, latency=0.0, cache_status='bypass',
+               error=False, route=None):
+        """
+        Record one model call.
+
+        Args:
+            task (str): Id and version of the prompt template the call rendered
+            model (str): The model name
+            prompt_tokens (int): Tokens sent
+            completion_tokens (int): Tokens generated
+            latency (float): Wall time in seconds
+            cache_status (str): 'hit', 'similar' (a similar request's response), 'miss', 'coalesced' or 'bypass'
+            error (bool): Whether the call failed
+            route (str, optional): Calling route (defaults to the current Flask endpoint)
+        """
+        key = (route or current_route(), task or 'untemplated', model)
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+
+        with self._lock:
+            for table in (self._totals, self._pending):
+                stats = table.setdefault(key, _empty())
+                stats['calls'] += 1
+                stats['errors'] += 1 if error else 0
+                stats['cache_hits'] += 1 if cache_status in ('hit', 'similar') else 0
+                stats['coalesced'] += 1 if cache_status == 'coalesced' else 0
+                stats['prompt_tokens'] += prompt_tokens
+                stats['completion_tokens'] += completion_tokens
+                stats['total_latency'] += latency
+                stats['cost'] += cost
+                stats['max_latency'] = max(stats['max_latency'], latency)
+
+            # Only upstream calls say anything about model latency
+            if cache_status in ('miss', 'bypass') and not error:
+                self._latencies.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(latency)
+
+        self._ensure_flusher()
+
+    def percentile(self, pct=95, task=None, model=None, route=None, min_samples=1):
+        """
+        Get a latency percentile over recent upstream calls.
+
+        Args:
+            pct (int): The percentile (0-100)
+            task (str, optional): Only include calls for this task
+            model (str, optional): Only include calls to this model
+            route (str, optional): Only include calls from this route
+            min_samples (int): Return None with fewer samples than this
+
+        Returns:
+            float: The latency in seconds, or None without enough samples
+        """
+        with self._lock:
+            samples = [
+                latency
+                for (r, t, m), window in self._latencies.items()
+                if (task is None or t == task) and (model is None or m == model) and (route is None or r == route)
+                for latency in window
+            ]
+        if not samples or len(samples) < min_samples:
+            return None
+        samples.sort()
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+    def snapshot(self):
+        """
+        Get the aggregated statistics since the process started.
+
+        Returns:
+            list: One dict per (route, task, model) with counters, averages and percentiles
+        """
+        with self._lock:
+            totals = {key: dict(stats) for key, stats in self._totals.items()}
+            windows = {key: sorted(window) for key, window in self._latencies.items()}
+
+        rows = []
+        for (route, task, model), stats in sorted(totals.items()):
+            window = windows.get((route, task, model), [])
+            stats.update({
+                'route': route,
+                'task': task,
+                'model': model,
+                'avg_latency': stats['total_latency'] / stats['calls'] if stats['calls'] else 0.0,
+                'p50_latency': window[len(window) // 2] if window else None,
+                'p95_latency': window[min(len(window) - 1, int(len(window) * 0.95))] if window else None
+            })
+            rows.append(stats)
+        return rows
+
+    def _ensure_flusher(self):
+        if not self.db_path or self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='llm-metrics-flush', daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        """Append the aggregates collected since the last flush to the SQLite table"""
+        if not self.db_path:
+            return
+
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            period_start = self._period_start
+            self._period_start = datetime.datetime.utcnow()
+
+        if not pending:
+            return
+
+        rows = [
+            (period_start.isoformat(), self._period_start.isoformat(), route, task, model)
+            + tuple(stats[name] for name in _COUNTERS) + (stats['max_latency'],)
+            for (route, task, model), stats in pending.items()
+        ]
+
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            try:
+                with conn:
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS llm_call_stats (
+                            period_start TEXT NOT NULL,
+                            period_end TEXT NOT NULL,
+                            route TEXT NOT NULL,
+                            task TEXT NOT NULL,
+                            model TEXT NOT NULL,
+                            calls INTEGER NOT NULL,
+                            errors INTEGER NOT NULL,
+                            cache_hits INTEGER NOT NULL,
+                            coalesced INTEGER NOT NULL,
+                            prompt_tokens INTEGER NOT NULL,
+                            completion_tokens INTEGER NOT NULL,
+                            total_latency REAL NOT NULL,
+                            cost REAL NOT NULL,
+                            max_latency REAL NOT NULL
+                        )
+                    """)
+                    conn.executemany(
+                        "INSERT INTO llm_call_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Error flushing LLM stats: {e}")
+
+
+# Shared aggregator used by the gateway
+metrics = LLMMetrics(db_path=None if IS_VERCEL else STATS_DB)
+atexit.register(metrics.flush)
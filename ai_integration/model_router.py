@@ -0,0 +1,165 @@
+import os
+import time
+import threading
+from collections import deque, namedtuple
+
+# Model per tier, slowest to fastest; LLM_TIERS overrides them as "tier=model,tier=model"
+TIERS = {
+    'quality': 'gpt-4o',
+    'standard': os.getenv('LLM_DEFAULT_MODEL', 'gpt-3.5-turbo'),
+    'fast': 'gpt-4o-mini'
+}
+for _override in filter(None, os.getenv('LLM_TIERS', '').split(',')):
+    _tier, _, _model = _override.partition('=')
+    TIERS[_tier.strip()] = _model.strip()
+TIER_ORDER = ('quality', 'standard', 'fast')
+
+# Tasks whose latency target is at most this many seconds run in the 'short'
+# slot lane, so they never queue behind long generations
+SHORT_LANE_TARGET = float(os.getenv('LLM_SHORT_LANE_TARGET', 10))
+
+# Latency samples older than this are forgotten, so a tier that was too slow
+# gets tried again once its window empties
+WINDOW_SECONDS = float(os.getenv('LLM_ROUTER_WINDOW_SECONDS', 300))
+MIN_SAMPLES = int(os.getenv('LLM_ROUTER_MIN_SAMPLES', 10))
+PERCENTILE = 95
+
+Route = namedtuple('Route', ['tier', 'latency_target', 'max_tokens'])
+Selection = namedtuple('Selection', ['model', 'max_tokens', 'lane', 'tier', 'downgraded'])
+
+# Tier, p95 latency target in seconds and token budget per task (template name without version);
+# LLM_ROUTES overrides them as "task=tier:seconds:max_tokens,..."
+ROUTES = {
+    'typing_exercise': Route('fast', 6, 400),
+    'translation_batch': Route('fast', 8, 1850),
+    'writing_exercise': Route('standard', 10, 500),
+    'writing_feedback': Route('standard', 10, 500),
+    'journal_feedback': Route('standard', 10, 300),
+    'article_chunk_study_aids': Route('standard', 15, 400),
+    'youtube_chunk_study_aids': Route('standard', 15, 450),
+    'immersion_content': Route('standard', 20, 800),
+    'cultural_content': Route('standard', 20, 800),
+    'interactive_lesson': Route('standard', 25, 1000),
+    'subject_lesson': Route('standard', 25, 1000)
+}
+for _override in filter(None, os.getenv('LLM_ROUTES', '').split(',')):
+    _task, _, _spec = _override.partition('=')
+    _tier, _target, _tokens = _spec.split(':')
+    ROUTES[_task.strip()] = Route(_tier, float(_target), int(_tokens))
+
+
+def lane_for(route):
+    """Name the slot lane a route runs in ('short' or 'long')"""
+    return 'short' if route is not None and route.latency_target <= SHORT_LANE_TARGET else 'long'
+
+
+class ModelRouter:
+    """
+    Picks the model and token budget for each task.
+
+    Each task has a tier and a p95 latency target. While the recent p95 of
+    the task on its tier's model is over the target, calls go to the next
+    faster tier instead.
+    """
+
+    def __init__(self, routes=None, tiers=None, window=WINDOW_SECONDS, min_samples=MIN_SAMPLES):
+        self.routes = ROUTES if routes is None else routes
+        self.tiers = TIERS if tiers is None else tiers
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples = {}
+        self.counters = {'routed': 0, 'downgraded': 0, 'pinned': 0}
+
+    def select(self, task, model=None, max_tokens=None):
+        """
+        Choose the model for a call.
+
+        Args:
+            task (str): Template name without version (None for untemplated calls)
+            model (str, optional): A model the caller insists on; skips tier selection
+            max_tokens (int, optional): Tokens the caller asks for, capped by the task's budget
+
+        Returns:
+            Selection: model (None when the task has no route and no model was given),
+                max_tokens, lane, tier and whether the call was moved to a faster tier
+        """
+        route = self.routes.get(task)
+        lane = lane_for(route)
+        if route is None or model:
+            with self._lock:
+                self.counters['pinned' if model else 'routed'] += 1
+            return Selection(model, max_tokens, lane, None, False)
+
+        budget = min(max_tokens, route.max_tokens) if max_tokens else route.max_tokens
+        tiers = TIER_ORDER[TIER_ORDER.index(route.tier):]
+        tier = tiers[0]
+        for tier in tiers:
+            p95 = self.percentile(task, self.tiers[tier])
+            if p95 is None or p95 <= route.latency_target:
+                break
+
+        downgraded = tier != route.tier
+        with self._lock:
+            self.counters['routed'] += 1
+            self.counters['downgraded'] += 1 if downgraded else 0
+        return Selection(self.tiers[tier], budget, lane, tier, downgraded)
+
+    def observe(self, task, model, latency):
+        """
+        Record the latency of an upstream call.
+
+        Args:
+            task (str): Template name without version
+            model (str): The model that answered
+            latency (float): Wall time in seconds
+        """
+        if task not in self.routes:
+            return
+        with self._lock:
+            self._samples.setdefault((task, model), deque(maxlen=512)).append((time.monotonic(), latency))
+
+    def percentile(self, task, model, pct=PERCENTILE):
+        """
+        Get a latency percentile of a task on a model over the recent window.
+
+        Returns:
+            float: Seconds, or None with fewer than min_samples recent calls
+        """
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            samples = self._samples.get((task, model))
+            if not samples:
+                return None
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+            latencies = sorted(latency for _, latency in samples)
+        if len(latencies) < self.min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))]
+
+    def stats(self):
+        """
+        Get routing counters and the current choice for every task.
+
+        Returns:
+            dict: Counters plus, per task, its route, the selected tier and the recent p95 per model
+        """
+        tasks = {}
+        for task, route in sorted(self.routes.items()):
+            selected = TIER_ORDER[TIER_ORDER.index(route.tier):]
+            tasks[task] = {
+                'tier': route.tier,
+                'latency_target': route.latency_target,
+                'max_tokens': route.max_tokens,
+                'lane': lane_for(route),
+                'p95': {self.tiers[tier]: self.percentile(task, self.tiers[tier]) for tier in selected}
+            }
+        with self._lock:
+            counters = dict(self.counters)
+        counters['tasks'] = tasks
+        return counters
+
+
+# Shared router used by the gateway
+router = ModelRouter()
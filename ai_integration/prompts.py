@@ -0,0 +1,448 @@
+import os
+import json
+import random
+import textwrap
+import threading
+from string import Formatter
+
+
+class PromptTemplate:
+    """
+    A named, versioned prompt, compiled once when it is registered.
+
+    model pins the template to one model; without it the model router picks
+    the model for the task. similar_on names the free-text parameter (e.g.
+    the topic) by which a cached response may be reused for a similar, not
+    identical, request.
+    """
+
+    def __init__(self, name, version, text, params, max_tokens, model=None, cache=False, similar_on=None):
+        self.name = name
+        self.version = version
+        self.id = f"{name}:{version}"
+        self.text = textwrap.dedent(text).strip()
+        self.params = tuple(params)
+        self.max_tokens = max_tokens
+        self.model = model
+        self.cache = cache
+        self.similar_on = similar_on
+        if similar_on is not None and similar_on not in self.params:
+            raise ValueError(f"Template {self.id} matches on undeclared parameter '{similar_on}'")
+        self._parts = self._compile()
+
+    def _compile(self):
+        """Split the text into (literal, parameter) pairs and check them against the declared parameters"""
+        parts = []
+        used = set()
+        for literal, field, spec, conversion in Formatter().parse(self.text):
+            if spec or conversion:
+                raise ValueError(f"Template {self.id} uses a format spec or conversion on '{field}'")
+            if field is not None:
+                if field not in self.params:
+                    raise ValueError(f"Template {self.id} uses undeclared parameter '{field}'")
+                used.add(field)
+            parts.append((literal, field))
+
+        unused = set(self.params) - used
+        if unused:
+            raise ValueError(f"Template {self.id} declares unused parameters: {', '.join(sorted(unused))}")
+        return parts
+
+    def render(self, **params):
+        """
+        Fill in the template.
+
+        Args:
+            **params: A value for every declared parameter
+
+        Returns:
+            RenderedPrompt: The prompt text with the template it came from
+
+        Raises:
+            ValueError: If a parameter is missing or not declared
+        """
+        missing = set(self.params) - set(params)
+        extra = set(params) - set(self.params)
+        if missing or extra:
+            raise ValueError(
+                f"Template {self.id} expects {', '.join(self.params)}; "
+                f"missing: {', '.join(sorted(missing)) or '-'}, unexpected: {', '.join(sorted(extra)) or '-'}"
+            )
+
+        text = ''.join(
+            literal if field is None else literal + str(params[field])
+            for literal, field in self._parts
+        )
+        return RenderedPrompt(text, self, params)
+
+
+class RenderedPrompt:
+    """Prompt text ready to send, plus the template it was rendered from"""
+
+    def __init__(self, text, template, params=None):
+        self.text = text
+        self.template = template
+        self.params = params or {}
+
+    @property
+    def template_id(self):
+        """Template id and version, stored with every artifact generated from it"""
+        return self.template.id
+
+    def options(self, **overrides):
+        """
+        Build the gateway options for this prompt.
+
+        Args:
+            **overrides: Options that replace the template defaults (e.g. max_tokens)
+
+        Returns:
+            dict: Keyword arguments for complete(), complete_text() or stream_text()
+        """
+        options = {'template': self.template.id, 'max_tokens': self.template.max_tokens, 'use_cache': self.template.cache}
+        if self.template.model:
+            options['model'] = self.template.model
+        if self.template.similar_on:
+            # (exact parameters, free text) for the semantic cache
+            exact = {name: value for name, value in self.params.items() if name != self.template.similar_on}
+            options['semantic'] = (
+                json.dumps(exact, sort_keys=True, ensure_ascii=False),
+                str(self.params[self.template.similar_on])
+            )
+        options.update(overrides)
+        return options
+
+
+class PromptRegistry:
+    """All prompt templates, by name and version"""
+
+    def __init__(self, versions=None):
+        self._templates = {}
+        self._lock = threading.Lock()
+        self._weights = self._parse_versions(versions or '')
+
+    @staticmethod
+    def _parse_versions(spec):
+        """
+        Parse version selection rules.
+
+        "interactive_lesson=2" pins a version; "interactive_lesson=1:90,2:10"
+        splits traffic between versions by weight (for A/B tests).
+
+        Returns:
+            dict: Template name -> list of (version, weight)
+        """
+        weights = {}
+        for rule in filter(None, (part.strip() for part in spec.split(';'))):
+            name, _, choices = rule.partition('=')
+            weights[name.strip()] = [
+                (int(version), float(weight or 1))
+                for version, _, weight in (choice.partition(':') for choice in choices.split(','))
+            ]
+        return weights
+
+    def register(self, template):
+        """
+        Add a template.
+
+        Args:
+            template (PromptTemplate): The template to add
+
+        Raises:
+            ValueError: If the same name and version is already registered
+        """
+        with self._lock:
+            versions = self._templates.setdefault(template.name, {})
+            if template.version in versions:
+                raise ValueError(f"Template {template.id} is already registered")
+            versions[template.version] = template
+        return template
+
+    def get(self, name, version=None):
+        """
+        Look up a template.
+
+        Args:
+            name (str): The template name
+            version (int, optional): A specific version (defaults to the one selected for traffic)
+
+        Returns:
+            PromptTemplate: The template
+
+        Raises:
+            KeyError: If there is no such template
+        """
+        versions = self._templates.get(name)
+        if not versions:
+            raise KeyError(f"Unknown prompt template: {name}")
+        if version is not None:
+            if version not in versions:
+                raise KeyError(f"Unknown prompt template: {name}:{version}")
+            return versions[version]
+
+        choices = [(v, w) for v, w in self._weights.get(name, []) if v in versions]
+        if not choices:
+            return versions[max(versions)]
+        if len(choices) == 1:
+            return versions[choices[0][0]]
+        picked = random.choices([v for v, _ in choices], weights=[w for _, w in choices])[0]
+        return versions[picked]
+
+    def render(self, name, /, **params):
+        """
+        Select a template and fill it in.
+
+        Args:
+            name (str): The template name
+            **params: The template parameters
+
+        Returns:
+            RenderedPrompt: The prompt text with the template it came from
+        """
+        return self.get(name).render(**params)
+
+    def describe(self):
+        """
+        List every registered template.
+
+        Returns:
+            list: One dict per template with its id, parameters and defaults
+        """
+        return [
+            {
+                'id': template.id,
+                'name': template.name,
+                'version': template.version,
+                'params': list(template.params),
+                'max_tokens': template.max_tokens,
+                'model': template.model,
+                'cache': template.cache,
+                'similar_on': template.similar_on
+            }
+            for name in sorted(self._templates)
+            for template in sorted(self._templates[name].values(), key=lambda t: t.version)
+        ]
+
+
+# Shared registry; PROMPT_VERSIONS pins or splits versions,
+# e.g. "interactive_lesson=1:90,2:10;journal_feedback=2"
+prompts = PromptRegistry(os.getenv('PROMPT_VERSIONS', ''))
+
+prompts.register(PromptTemplate(
+    'interactive_lesson', 1,
+    """
+    Generate a {style}interactive language lesson for {level} level students learning {language} about {topic}.
+
+    Include the following sections:
+    1. Lesson Objectives (what the student will learn)
+    2. Vocabulary (10-15 key words/phrases with translations)
+    3. Grammar Points (explain 1-2 relevant grammar concepts)
+    4. Interactive Dialogue (a realistic conversation using the vocabulary and grammar)
+    5. Practice Exercises (3-5 exercises to reinforce learning)
+    6. Cultural Notes (relevant cultural context)
+    7. Task Challenge (a real-world task the student should complete using what they learned)
+
+    Format the response in a structured way with clear section headings.
+    """,
+    params=('style', 'level', 'language', 'topic'),
+    max_tokens=1000,
+    cache=True,
+    similar_on='topic'
+))
+
+prompts.register(PromptTemplate(
+    'subject_lesson', 1,
+    """
+    Generate a subject-based immersion lesson for {level} level students learning {language}.
+    The lesson should teach {subject} (specifically about {topic}) while using {language} as the medium of instruction.
+
+    Include the following sections:
+    1. Lesson Objectives (what the student will learn about {subject})
+    2. Key Terminology (10-15 subject-specific terms in {language} with translations)
+    3. Concept Explanation (explain the {topic} concepts in simple {language})
+    4. Examples (provide examples of the concepts with explanations)
+    5. Practice Problems (3-5 exercises related to {subject})
+    6. Language Focus (highlight key language structures used in this subject area)
+    7. Cultural Context (how this subject might be taught in countries where {language} is spoken)
+
+    Format the response in a structured way with clear section headings.
+    """,
+    params=('level', 'language', 'subject', 'topic'),
+    max_tokens=1000,
+    cache=True,
+    similar_on='topic'
+))
+
+prompts.register(PromptTemplate(
+    'writing_exercise', 1,
+    """
+    Generate a writing exercise for {level} level students learning {language}{topic_clause}.
+
+    Include the following:
+    1. A clear writing prompt or task
+    2. Any necessary vocabulary or phrases that might be helpful
+    3. Grammar points to focus on
+    4. A sample response (short example)
+    5. Word count target
+
+    Format the response in a structured way with clear sections.
+    """,
+    params=('level', 'language', 'topic_clause'),
+    max_tokens=500,
+    cache=True,
+    similar_on='topic_clause'
+))
+
+prompts.register(PromptTemplate(
+    'writing_feedback', 1,
+    """
+    Analyze the following writing submission in {language} and provide detailed feedback:{exercise_clause}
+
+    Submission:
+    {content}
+
+    Provide feedback in the following format:
+    1. Grammar corrections (list specific errors and corrections)
+    2. Vocabulary usage (suggest better word choices or additional vocabulary)
+    3. Structure and coherence (comment on the organization and flow)
+    4. Style and tone (provide suggestions for improvement)
+    5. Overall assessment (strengths and areas for improvement)
+    """,
+    params=('language', 'exercise_clause', 'content'),
+    max_tokens=500
+))
+
+prompts.register(PromptTemplate(
+    'typing_exercise', 1,
+    """
+    Generate a typing exercise for {difficulty} level students learning to type in {language} using {script_type} script.
+
+    Include the following:
+    1. A short paragraph (3-5 sentences) that includes common characters/symbols in this script
+    2. A list of the most challenging characters to type in this script
+    3. Tips for typing efficiently in this script
+
+    Format the response in a structured way with clear sections.
+    """,
+    params=('difficulty', 'language', 'script_type'),
+    max_tokens=400,
+    cache=True
+))
+
+prompts.register(PromptTemplate(
+    'journal_feedback', 1,
+    """
+    Analyze the following journal entry in {language} and provide feedback:
+
+    {content}
+
+    Provide feedback in the following format:
+    1. Grammar corrections
+    2. Vocabulary suggestions
+    3. Cultural insights
+    4. Overall fluency assessment
+    """,
+    params=('language', 'content'),
+    max_tokens=300
+))
+
+prompts.register(PromptTemplate(
+    'immersion_content', 1,
+    """
+    Generate {difficulty} level {content_type} in {language}{topic_clause} for language immersion.
+
+    The content should:
+    1. Be entirely in {language}
+    2. Be appropriate for {difficulty} level learners
+    3. Include natural, authentic language usage
+    4. Be engaging and culturally relevant
+    5. Be between 200-300 words
+
+    Also provide:
+    - A title in {language}
+    - A list of 5-10 key vocabulary words with their translations
+    - 3 comprehension questions in {language}
+    """,
+    params=('difficulty', 'content_type', 'language', 'topic_clause'),
+    max_tokens=800
+))
+
+prompts.register(PromptTemplate(
+    'article_chunk_study_aids', 1,
+    """
+    The following is part {part} of {parts} of a {content_type} in {language} titled "{title}".
+
+    {excerpt}
+
+    Based on this part only, provide:
+    1. Up to {vocabulary_count} key vocabulary words or phrases that appear in it, with their translations to English
+    2. Up to {question_count} comprehension questions in {language} that can be answered from it
+
+    Respond with only a JSON object:
+    {{"vocabulary": [{{"word": "word as it appears", "translation": "English translation"}}], "questions": ["question"]}}
+    """,
+    params=('part', 'parts', 'content_type', 'language', 'title', 'excerpt', 'vocabulary_count', 'question_count'),
+    max_tokens=400,
+    cache=True
+))
+
+prompts.register(PromptTemplate(
+    'youtube_chunk_study_aids', 1,
+    """
+    The following is part {part} of {parts}{span} of a transcript from a YouTube video in {language} titled "{title}".
+
+    {excerpt}
+
+    Based on this part only, provide:
+    1. Up to {vocabulary_count} key vocabulary words or phrases exactly as they appear in it, with their translations to English
+    2. Up to {question_count} comprehension questions in {language} that can be answered from it
+    3. A one-sentence summary of this part in English
+
+    Respond with only a JSON object:
+    {{"vocabulary": [{{"word": "word as it appears", "translation": "English translation"}}], "questions": ["question"], "summary": "summary"}}
+    """,
+    params=('part', 'parts', 'span', 'language', 'title', 'excerpt', 'vocabulary_count', 'question_count'),
+    max_tokens=450,
+    cache=True
+))
+
+prompts.register(PromptTemplate(
+    'cultural_content', 1,
+    """
+    Generate cultural immersion content about {cultural_aspect}{region_clause} for students learning {language}.
+
+    Include:
+    1. A title in {language}
+    2. An engaging description of the {cultural_aspect} (200-300 words) in {language}
+    3. Cultural vocabulary (10 terms with translations)
+    4. Cultural insights and context
+    5. How this cultural aspect relates to the language
+    6. A short activity or reflection question for students
+
+    Format the response in a structured way with clear section headings.
+    """,
+    params=('cultural_aspect', 'region_clause', 'language'),
+    max_tokens=800,
+    cache=True,
+    similar_on='cultural_aspect'
+))
+
+prompts.register(PromptTemplate(
+    'translation_batch', 1,
+    """
+    Translate and analyze each of the following words or phrases from {language} to English,
+    using the sentence given as context to pick the right meaning.
+
+    {items}
+
+    For each item provide:
+    1. Translation
+    2. Word type (noun, verb, adjective, adverb, phrase, other)
+    3. Brief notes about usage or connotations
+
+    Respond with only a JSON array containing one object per item, in any order:
+    [{{"index": 0, "translation": "English translation", "word_type": "part of speech", "notes": "brief usage notes"}}]
+    """,
+    params=('language', 'items'),
+    max_tokens=1850  # a full batch of 30 items; callers size it to the batch
+))
@@ -0,0 +1,225 @@
+import os
+import re
+import zlib
+import threading
+import numpy as np
+
+# Tasks (template names) that may reuse the response to a similar request, as
+# "task" or "task=threshold" separated by commas; an empty value turns it off
+DEFAULT_THRESHOLD = float(os.getenv('LLM_SEMANTIC_THRESHOLD', 0.8))
+ENABLED_TASKS = {}
+for _entry in filter(None, os.getenv('LLM_SEMANTIC_CACHE', 'interactive_lesson,subject_lesson,cultural_content').split(',')):
+    _task, _, _threshold = _entry.partition('=')
+    ENABLED_TASKS[_task.strip()] = float(_threshold) if _threshold else DEFAULT_THRESHOLD
+
+# Size of the hashed feature space and number of requests remembered per partition
+DIMENSIONS = int(os.getenv('LLM_SEMANTIC_DIMENSIONS', 4096))
+MAX_ENTRIES = int(os.getenv('LLM_SEMANTIC_MAX_ENTRIES', 5000))
+
+# Share of the vector given to whole words; the rest goes to character n-grams,
+# which match inflections ("order", "ordering", "orders")
+WORD_WEIGHT = 0.7
+
+STOPWORDS = {
+    'a', 'an', 'the', 'of', 'and', 'or', 'for', 'to', 'in', 'on', 'at', 'about', 'with', 'by', 'from', 'into',
+    'el', 'la', 'los', 'las', 'un', 'una', 'de', 'del', 'y', 'o', 'en', 'con', 'para', 'por', 'al'
+}
+
+
+def threshold_for(task):
+    """
+    Get the similarity threshold for a task.
+
+    Args:
+        task (str): Template name without version
+
+    Returns:
+        float: Minimum cosine similarity for reuse, or None if the task has not opted in
+    """
+    return ENABLED_TASKS.get(task)
+
+
+def _stem(word):
+    """Fold the commonest English and Spanish inflections (families -> family, ordering -> order)"""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 5 and word.endswith('ing'):
+        return word[:-3]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def _bucket(feature, dimensions):
+    """Hash a feature to a bucket and a sign (signed hashing keeps collisions from adding up)"""
+    h = zlib.crc32(feature.encode('utf-8'))
+    return h % dimensions, 1.0 if h & 0x80000000 else -1.0
+
+
+def vectorize(text, dimensions=DIMENSIONS):
+    """
+    Turn a request text into a unit vector of hashed word and character n-gram counts.
+
+    Word order is ignored, so "food ordering" and "ordering food" get the same vector.
+
+    Args:
+        text (str): The text to embed
+        dimensions (int): Size of the vector
+
+    Returns:
+        numpy.ndarray: float32 vector of length dimensions, or all zeros for empty text
+    """
+    words = [_stem(word) for word in re.findall(r"\w+", (text or '').lower()) if word not in STOPWORDS]
+    vector = np.zeros(dimensions, dtype=np.float32)
+
+    for features, weight in (
+        ([f"w:{word}" for word in words], WORD_WEIGHT),
+        ([f"c:{padded[i:i + 3]}" for padded in (f"<{word}>" for word in words) for i in range(len(padded) - 2)],
+         1.0 - WORD_WEIGHT)
+    ):
+        if not features:
+            continue
+        part = np.zeros(dimensions, dtype=np.float32)
+        for feature in features:
+            bucket, sign = _bucket(feature, dimensions)
+            part[bucket] += sign
+        norm = np.linalg.norm(part)
+        if norm:
+            vector += np.sqrt(weight) * part / norm
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class _Partition:
+    """Vectors of the requests that share every exact parameter, in a fixed-size ring"""
+
+    def __init__(self, dimensions, max_entries):
+        self.max_entries = max_entries
+        self.vectors = np.zeros((min(64, max_entries), dimensions), dtype=np.float32)
+        self.keys = []
+        self.next = 0
+
+    def add(self, vector, key):
+        if len(self.keys) < self.max_entries:
+            if len(self.keys) == len(self.vectors):
+                grown = np.zeros((min(len(self.vectors) * 2, self.max_entries), self.vectors.shape[1]), dtype=np.float32)
+                grown[:len(self.vectors)] = self.vectors
+                self.vectors = grown
+            self.vectors[len(self.keys)] = vector
+            self.keys.append(key)
+        else:
+            # Full: overwrite the oldest request
+            self.vectors[self.next] = vector
+            self.keys[self.next] = key
+            self.next = (self.next + 1) % self.max_entries
+
+    def best(self, vector):
+        if not self.keys:
+            return None, 0.0
+        similarities = self.vectors[:len(self.keys)] @ vector
+        i = int(np.argmax(similarities))
+        return self.keys[i], float(similarities[i])
+
+    def remove(self, key):
+        for i, existing in enumerate(self.keys):
+            if existing == key:
+                self.vectors[i] = 0.0
+                self.keys[i] = None
+
+
+class SemanticIndex:
+    """
+    In-process similarity index from request texts to response cache keys.
+
+    Requests only match within a partition: the same template, model,
+    generation parameters and exact prompt parameters (language, level...).
+    Within it, the free-text parameter (the topic) is compared by cosine
+    similarity of hashed n-gram vectors.
+    """
+
+    def __init__(self, dimensions=DIMENSIONS, max_entries=MAX_ENTRIES):
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._partitions = {}
+        self.counters = {'lookups': 0, 'hits': 0, 'misses': 0, 'stale': 0, 'added': 0}
+
+    def add(self, partition, text, key):
+        """
+        Remember the cache key of a response.
+
+        Args:
+            partition (str): Identifies the exact part of the request
+            text (str): The free-text part of the request
+            key (str): Response cache key
+        """
+        vector = vectorize(text, self.dimensions)
+        if not vector.any():
+            return
+        with self._lock:
+            entries = self._partitions.get(partition)
+            if entries is None:
+                entries = self._partitions[partition] = _Partition(self.dimensions, self.max_entries)
+            if key not in entries.keys:
+                entries.add(vector, key)
+                self.counters['added'] += 1
+
+    def lookup(self, partition, text, threshold):
+        """
+        Find the most similar earlier request.
+
+        Args:
+            partition (str): Identifies the exact part of the request
+            text (str): The free-text part of the request
+            threshold (float): Minimum cosine similarity (0-1)
+
+        Returns:
+            tuple: (cache key, similarity), or None if nothing is similar enough
+        """
+        vector = vectorize(text, self.dimensions)
+        with self._lock:
+            self.counters['lookups'] += 1
+            entries = self._partitions.get(partition)
+            key, similarity = entries.best(vector) if entries else (None, 0.0)
+            if key is None or similarity < threshold:
+                self.counters['misses'] += 1
+                return None
+            self.counters['hits'] += 1
+            return key, similarity
+
+    def discard(self, partition, key):
+        """
+        Forget a cache key whose response has been evicted from the cache.
+
+        Args:
+            partition (str): The partition the key was added to
+            key (str): Response cache key
+        """
+        with self._lock:
+            entries = self._partitions.get(partition)
+            if entries:
+                entries.remove(key)
+            self.counters['stale'] += 1
+            # The lookup that found the key did not produce a response after all
+            self.counters['hits'] -= 1
+            self.counters['misses'] += 1
+
+    def stats(self):
+        """
+        Get the index counters.
+
+        Returns:
+            dict: Counters plus the hit rate, enabled tasks and number of requests indexed
+        """
+        with self._lock:
+            stats = dict(self.counters)
+            stats['entries'] = sum(len(entries.keys) for entries in self._partitions.values())
+            stats['partitions'] = len(self._partitions)
+        stats['hit_rate'] = stats['hits'] / stats['lookups'] if stats['lookups'] else 0.0
+        stats['tasks'] = dict(ENABLED_TASKS)
+        return stats
+
+
+# Shared index used by the gateway
+index = SemanticIndex()
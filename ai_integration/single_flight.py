@@ -0,0 +1,148 @@
+import os
+import time
+import threading
+from ai_integration.llm_backends import LLMTimeoutError
+
+# File locks are only available on POSIX systems; elsewhere coalescing is per process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Directory for cross-process lock files (unset means coalesce within this process only)
+LOCK_DIR = os.getenv('LLM_SINGLE_FLIGHT_DIR')
+LOCK_POLL_INTERVAL = 0.05
+
+
+class _Call:
+    """An upstream call in progress that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running wait for it and receive the same result or
+    exception. With a lock directory, leaders in different processes also
+    serialize on a lock file, so a function that checks a shared store
+    (such as the disk cache) before doing the work only runs once per host.
+    """
+
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir if fcntl else None
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.counters = {'leaders': 0, 'followers': 0}
+
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key, fn, timeout=None):
+        """
+        Run fn once for all concurrent callers with the same key.
+
+        Args:
+            key (str): Canonical request key
+            fn (callable): Zero-argument function doing the work
+            timeout (float, optional): How long a follower waits for the leader
+
+        Returns:
+            The result of fn
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.counters['leaders'] += 1
+                leader = True
+            else:
+                self.counters['followers'] += 1
+                leader = False
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise LLMTimeoutError(f"Timed out waiting for in-flight request {key[:12]}")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(key, fn, timeout)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _run(self, key, fn, timeout):
+        """Run fn, holding the cross-process lock file for the key if configured"""
+        if not self.lock_dir:
+            return fn()
+
+        lock_path = os.path.join(self.lock_dir, f"{key}.lock")
+        deadline = time.monotonic() + timeout if timeout else None
+
+        while True:
+            lock_file = open(lock_path, 'a')
+            try:
+                self._acquire(lock_file, key, deadline)
+                # The previous holder removes the file when done; if it did while we
+                # waited, our lock is on a file nobody else will see, so start over
+                locked_path = os.fstat(lock_file.fileno()).st_ino == os.stat(lock_path).st_ino
+            except FileNotFoundError:
+                locked_path = False
+            except BaseException:
+                lock_file.close()
+                raise
+            if locked_path:
+                break
+            lock_file.close()
+
+        try:
+            return fn()
+        finally:
+            # Remove the file before unlocking, so each key leaves no file behind
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    @staticmethod
+    def _acquire(lock_file, key, deadline):
+        """Take the lock file, polling so that a stuck leader in another process cannot block us past the deadline"""
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                if deadline and time.monotonic() > deadline:
+                    raise LLMTimeoutError(f"Timed out waiting for lock on request {key[:12]}")
+                time.sleep(LOCK_POLL_INTERVAL)
+
+    def stats(self):
+        """
+        Get the coalescing counters.
+
+        Returns:
+            dict: Number of leader and follower calls and calls in flight
+        """
+        with self._lock:
+            stats = dict(self.counters)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+
+# Shared registry used by the gateway
+flights = SingleFlight(lock_dir=LOCK_DIR)
@@ -0,0 +1,168 @@
+import os
+import re
+import json
+import hashlib
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from ai_integration.llm_cache import LLMCache, IS_VERCEL
+from ai_integration.llm_gateway import complete_text
+from ai_integration.prompts import prompts
+from ai_integration.llm_metrics import current_route
+
+# Batch settings
+BATCH_SIZE = int(os.getenv('TRANSLATION_BATCH_SIZE', 30))
+MAX_PARALLEL_BATCHES = int(os.getenv('TRANSLATION_MAX_PARALLEL_BATCHES', 4))
+TOKENS_PER_ITEM = 60
+
+# Global translation cache, shared by single-word and batch translation
+TRANSLATION_CACHE_DIR = os.getenv('TRANSLATION_CACHE_DIR', os.path.join(os.path.dirname(__file__), 'translation_cache'))
+translation_cache = LLMCache(
+    cache_dir=None if IS_VERCEL else TRANSLATION_CACHE_DIR,
+    memory_entries=int(os.getenv('TRANSLATION_CACHE_MEMORY_ENTRIES', 20000)),
+    ttl=int(os.getenv('TRANSLATION_CACHE_TTL', 30 * 24 * 3600))
+)
+
+
+def normalize_word(word):
+    """Normalize a word or phrase so that trivially different spellings share a cache entry"""
+    word = unicodedata.normalize('NFC', word or '')
+    word = re.sub(r'\s+', ' ', word).strip().lower()
+    return word.strip('.,;:!?¡¿"\'()«»')
+
+
+def context_hash(context):
+    """Hash the sentence a word appeared in (empty contexts share one hash)"""
+    context = re.sub(r'\s+', ' ', unicodedata.normalize('NFC', context or '')).strip().lower()
+    return hashlib.sha1(context.encode('utf-8')).hexdigest()[:16]
+
+
+def translation_key(language, word, context):
+    """
+    Build the global cache key for a translation.
+
+    Args:
+        language (str): The source language
+        word (str): The word or phrase
+        context (str): The sentence the word appeared in
+
+    Returns:
+        str: Cache key for (language, normalized word, context hash)
+    """
+    raw = f"{language.lower()}\0{normalize_word(word)}\0{context_hash(context)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _batch_prompt(batch, language):
+    """Render the prompt for a batch of (word, context) pairs"""
+    items = [
+        {'index': i, 'word': item['word'], 'context': item.get('context') or ''}
+        for i, item in enumerate(batch)
+    ]
+    return prompts.render('translation_batch', language=language, items=json.dumps(items, ensure_ascii=False))
+
+
+def _parse_batch(text):
+    """Extract the JSON array from a model response"""
+    start = text.find('[')
+    end = text.rfind(']')
+    if start == -1 or end == -1:
+        raise ValueError("No JSON array in translation response")
+    return json.loads(text[start:end + 1])
+
+
+def _translate_batch(batch, language, route=None):
+    """
+    Translate one batch of unique items with a single model call.
+
+    Returns:
+        list: One result dict (or None if the model skipped it) per batch item
+    """
+    prompt = _batch_prompt(batch, language)
+    response = complete_text(prompt.text, **prompt.options(max_tokens=TOKENS_PER_ITEM * len(batch) + 50), route=route)
+
+    results = [None] * len(batch)
+    for row in _parse_batch(response):
+        index = row.get('index')
+        translation = row.get('translation')
+        # An empty translation counts as skipped, so it is retried rather than cached
+        if isinstance(index, int) and 0 <= index < len(batch) and isinstance(translation, str) and translation.strip():
+            results[index] = {
+                'translation': translation,
+                'word_type': row.get('word_type'),
+                'notes': row.get('notes')
+            }
+    return results
+
+
+def translate_words(items, language='Spanish'):
+    """
+    Translate many words at once, packing cache misses into as few model calls as possible.
+
+    Args:
+        items (list): Dicts with a 'word' and an optional 'context'
+        language (str): The source language
+
+    Returns:
+        list: One result per input item, in input order, each with the word,
+            translation, word_type, notes, a cached flag and an error if it failed
+    """
+    results = [None] * len(items)
+    pending = {}
+
+    # Serve what we can from the cache, and collapse duplicate misses
+    for i, item in enumerate(items):
+        key = translation_key(language, item.get('word'), item.get('context'))
+        hit = translation_cache.get(key)
+        if hit is not None:
+            results[i] = dict(hit, word=item.get('word'), cached=True)
+        else:
+            pending.setdefault(key, {'item': item, 'positions': []})['positions'].append(i)
+
+    keys = list(pending)
+    batches = [keys[i:i + BATCH_SIZE] for i in range(0, len(keys), BATCH_SIZE)]
+
+    # Worker threads have no request context, so charge the calls to the caller's route
+    route = current_route()
+
+    def run(batch_keys):
+        try:
+            return _translate_batch([pending[key]['item'] for key in batch_keys], language, route)
+        except Exception as e:
+            print(f"Error translating batch: {e}")
+            return [None] * len(batch_keys)
+
+    # Batches are independent, so send them concurrently
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_BATCHES, len(batches))) as executor:
+            batch_results = list(executor.map(run, batches))
+    else:
+        batch_results = []
+
+    for batch_keys, translated in zip(batches, batch_results):
+        for key, result in zip(batch_keys, translated):
+            entry = pending[key]
+            if result is not None:
+                translation_cache.set(key, result)
+            for position in entry['positions']:
+                word = items[position].get('word')
+                if result is None:
+                    results[position] = {'word': word, 'error': 'Translation failed', 'cached': False}
+                else:
+                    results[position] = dict(result, word=word, cached=False)
+
+    return results
+
+
+def translate_word(word, context=None, language='Spanish'):
+    """
+    Translate a single word through the shared batch path and cache.
+
+    Args:
+        word (str): The word or phrase
+        context (str, optional): The sentence the word appeared in
+        language (str): The source language
+
+    Returns:
+        dict: The translation result (see translate_words)
+    """
+    return translate_words([{'word': word, 'context': context}], language)[0]
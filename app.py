@@ -1,18 +1,21 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory, url_for, redirect
+from flask import Flask, request, jsonify, render_template, send_from_directory, url_for, redirect, Response, stream_with_context
 from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_login import login_required, current_user
 import os
 import json
+import time
 import secrets
 import datetime
 from dotenv import load_dotenv
 
 # Import module functions
 from ai_integration.API_Integration import generate_lesson
-from journaling.journal import create_journal_entry, get_journal_entries
+from journaling.journal import create_journal_entry, get_journal_entries, get_journal_entry, wait_for_feedback
 from writing_exercises.exercises import generate_writing_exercise, check_writing, get_typing_exercise
-from lessons.lesson_generator import generate_interactive_lesson, generate_subject_based_lesson, get_recent_lessons
+from writing_exercises.precheck import precheck
+from lessons.lesson_generator import generate_interactive_lesson, generate_subject_based_lesson, get_recent_lessons, stream_interactive_lesson, stream_subject_based_lesson
+from lessons.catalog import record_request as record_lesson_request, get_catalog_lesson
 from immersion.content import get_immersion_content, import_external_content, process_youtube_transcript, get_cultural_immersion_content
 from ai_integration.n8n_integration import (
     trigger_lesson_workflow, 
@@ -24,14 +27,30 @@ from ai_integration.n8n_integration import (
 
 # Import authentication and database models
 from models import db, User, SavedWord, JournalEntry, Lesson, LessonProgress, LearningPhase, ImmersionSession, ContentSource
-from auth import auth_bp, login_manager, mail
+from auth import auth_bp, login_manager, mail, admin_required
 
 # Import subscription module
 from subscriptions import init_app as init_subscription
+from subscriptions.rate_limits import rate_limited
+
+# Import the lesson and journal stores
+from lessons.store import init_app as init_lesson_store
+from journaling.store import init_app as init_journal_store
+from journaling.journal import start_feedback_recovery
 
 # Load environment variables
 load_dotenv('ai_integration/ai_integration.env')
 
+# Journal entries per page of GET /api/journal
+JOURNAL_PAGE_SIZE = 10
+MAX_JOURNAL_PAGE_SIZE = 100
+
+# Maximum number of words accepted by the batch translation endpoint
+MAX_TRANSLATION_BATCH = 200
+
+# How long a journal feedback stream waits for the background worker
+JOURNAL_FEEDBACK_STREAM_SECONDS = 60
+
 # Create Flask app
 app = Flask(__name__, static_folder='static', template_folder='templates')
 # Enable CORS for all routes with specific settings for the Next.js frontend
@@ -74,6 +93,13 @@ app.register_blueprint(auth_bp, url_prefix='/auth')
 # Initialize subscription module
 init_subscription(app)
 
+# Initialize the lesson and journal stores
+init_lesson_store(app)
+init_journal_store(app)
+
+# Finish journal feedback that a previous process left pending
+start_feedback_recovery()
+
 # Create database tables
 @app.before_first_request
 def create_tables():
@@ -486,53 +512,120 @@ def update_familiarity():
 
 @app.route('/api/vocabulary/translate', methods=['POST'])
 @login_required
+@rate_limited('translation')
 def translate_word():
     data = request.json
     word = data.get('word')
     context = data.get('context')
     language = data.get('language', 'Spanish')
     
-    # Use OpenAI to translate and analyze the word
-    prompt = f"""
-    Translate and analyze the following word or phrase from {language} to English:
+    if not _valid_translation_item(data):
+        return jsonify({'success': False, 'message': 'word must be a non-empty string'}), 400
     
-    Word/Phrase: "{word}"
-    Context: "{context}"
+    # Use the shared translation cache and batch path
+    from ai_integration.translation import translate_word as translate
+    result = translate(word, context, language)
     
-    Provide:
-    1. Translation
-    2. Word type (noun, verb, adjective, adverb, phrase, other)
-    3. Brief notes about usage or connotations
-    
-    Format your response as JSON:
-    {{
-        "translation": "English translation",
-        "word_type": "part of speech",
-        "notes": "brief usage notes"
-    }}
-    """
-    
-    try:
-        # Call OpenAI API
-        from ai_integration.API_Integration import generate_response
-        response = generate_response(prompt)
-        
-        # Parse JSON response
-        import json
-        result = json.loads(response)
-        
-        return jsonify({
-            'success': True,
-            'translation': result.get('translation'),
-            'word_type': result.get('word_type'),
-            'notes': result.get('notes')
-        })
-    except Exception as e:
-        print(f"Error translating word: {e}")
+    if result.get('error'):
+        print(f"Error translating word: {result['error']}")
         return jsonify({
             'success': False,
             'message': 'Error translating word'
         }), 500
+    
+    return jsonify({
+        'success': True,
+        'translation': result.get('translation'),
+        'word_type': result.get('word_type'),
+        'notes': result.get('notes')
+    })
+
+def _valid_translation_item(item):
+    """Whether a translation request item has a non-blank word and, if any, a text context"""
+    return (
+        isinstance(item, dict)
+        and isinstance(item.get('word'), str) and item['word'].strip() != ''
+        and isinstance(item.get('context') or '', str)
+    )
+
+def _translation_batch_cost():
+    """Tokens a batch translation costs: one per word"""
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else None
+    return min(len(items), MAX_TRANSLATION_BATCH) if isinstance(items, list) else 1
+
+@app.route('/api/vocabulary/translate_batch', methods=['POST'])
+@login_required
+@rate_limited('translation', cost=_translation_batch_cost)
+def translate_batch():
+    """Translate many (word, context) pairs with as few model calls as possible"""
+    data = request.json
+    items = data.get('items', [])
+    language = data.get('language', 'Spanish')
+    
+    # Validate the batch
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'message': 'items must be a non-empty list'}), 400
+    
+    if len(items) > MAX_TRANSLATION_BATCH:
+        return jsonify({
+            'success': False,
+            'message': f'At most {MAX_TRANSLATION_BATCH} items can be translated per request'
+        }), 400
+    
+    if not all(_valid_translation_item(item) for item in items):
+        return jsonify({'success': False, 'message': 'Every item needs a word, given as a string'}), 400
+    
+    from ai_integration.translation import translate_words
+    results = translate_words(items, language)
+    
+    return jsonify({
+        'success': True,
+        'results': results,
+        'failed': sum(1 for result in results if result.get('error'))
+    })
+
+# Model call accounting (tokens, latency and cost per endpoint)
+@app.route('/api/admin/llm_stats', methods=['GET'])
+@admin_required
+def llm_stats():
+    from ai_integration.llm_metrics import metrics
+    from ai_integration.llm_cache import cache
+    from ai_integration.semantic_cache import index as semantic_index
+    from ai_integration import llm_gateway
+    from subscriptions.rate_limits import limiter
+    
+    rows = metrics.snapshot()
+    return jsonify({
+        'success': True,
+        'stats': rows,
+        'totals': {
+            'calls': sum(row['calls'] for row in rows),
+            'errors': sum(row['errors'] for row in rows),
+            'prompt_tokens': sum(row['prompt_tokens'] for row in rows),
+            'completion_tokens': sum(row['completion_tokens'] for row in rows),
+            'cost': sum(row['cost'] for row in rows)
+        },
+        'cache': cache.stats(),
+        'semantic_cache': semantic_index.stats(),
+        'resilience': llm_gateway.stats(),
+        'rate_limits': limiter.stats()
+    })
+
+# Registered prompt templates
+@app.route('/api/admin/prompts', methods=['GET'])
+@admin_required
+def prompt_templates():
+    from ai_integration.prompts import prompts
+    return jsonify({'success': True, 'templates': prompts.describe()})
+
+# LLM response cache statistics
+@app.route('/api/admin/llm_cache', methods=['GET'])
+@admin_required
+def llm_cache_stats():
+    from ai_integration.llm_cache import cache
+    from ai_integration.single_flight import flights
+    return jsonify({'success': True, 'stats': cache.stats(), 'single_flight': flights.stats()})
 
 # Content Source Routes
 @app.route('/api/content/sources', methods=['GET'])
@@ -602,6 +695,7 @@ def create_content_source():
 # Basic Lesson Generation (using OpenAI directly)
 @app.route('/api/generate_lesson', methods=['POST'])
 @login_required
+@rate_limited('generation')
 def api_generate_lesson():
     data = request.json
     language = data.get('language', 'Spanish')
@@ -619,19 +713,30 @@ def api_generate_lesson():
 # Interactive Lesson Generation
 @app.route('/api/interactive_lesson', methods=['POST'])
 @login_required
+@rate_limited('generation')
 def interactive_lesson_api():
     data = request.json
-    lesson = generate_interactive_lesson(
-        language=data.get('language', 'Spanish'),
-        level=data.get('level', 'beginner'),
-        topic=data.get('topic', 'greetings'),
-        task_based=data.get('task_based', True)
-    )
+    language = data.get('language', 'Spanish')
+    level = data.get('level', 'beginner')
+    topic = data.get('topic', 'greetings')
+    task_based = data.get('task_based', True)
+    
+    # Serve a pre-generated lesson for popular requests, generate live for the long tail
+    record_lesson_request(language, level, topic, task_based)
+    lesson = get_catalog_lesson(language, level, topic, task_based)
+    if lesson is None:
+        lesson = generate_interactive_lesson(
+            language=language,
+            level=level,
+            topic=topic,
+            task_based=task_based
+        )
     return jsonify({'success': True, 'lesson': lesson})
 
 # Subject-Based Lesson Generation
 @app.route('/api/subject_lesson', methods=['POST'])
 @login_required
+@rate_limited('generation')
 def subject_lesson_api():
     data = request.json
     lesson = generate_subject_based_lesson(
@@ -642,13 +747,80 @@ def subject_lesson_api():
     )
     return jsonify({'success': True, 'lesson': lesson})
 
+def sse_response(events):
+    """Send (event, data) pairs to the client as Server-Sent Events"""
+    def generate():
+        # Flush headers immediately so the client sees the first byte before the model answers
+        yield ": stream opened\n\n"
+        for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def stream_params():
+    """Read generation parameters from a JSON body (POST) or the query string (GET, for EventSource)"""
+    data = dict(request.args)
+    if request.method == 'POST':
+        data.update(request.get_json(silent=True) or {})
+    if isinstance(data.get('task_based'), str):
+        data['task_based'] = data['task_based'].lower() not in ('false', '0', 'no')
+    return data
+
+# Interactive Lesson Generation (streaming)
+@app.route('/api/interactive_lesson/stream', methods=['GET', 'POST'])
+@login_required
+@rate_limited('generation')
+def interactive_lesson_stream_api():
+    data = stream_params()
+    language = data.get('language', 'Spanish')
+    level = data.get('level', 'beginner')
+    topic = data.get('topic', 'greetings')
+    task_based = data.get('task_based', True)
+    
+    # A pre-generated lesson is sent whole as the final event
+    record_lesson_request(language, level, topic, task_based)
+    lesson = get_catalog_lesson(language, level, topic, task_based)
+    if lesson is not None:
+        return sse_response([('lesson', lesson)])
+    
+    events = stream_interactive_lesson(
+        language=language,
+        level=level,
+        topic=topic,
+        task_based=task_based
+    )
+    return sse_response(events)
+
+# Subject-Based Lesson Generation (streaming)
+@app.route('/api/subject_lesson/stream', methods=['GET', 'POST'])
+@login_required
+@rate_limited('generation')
+def subject_lesson_stream_api():
+    data = stream_params()
+    events = stream_subject_based_lesson(
+        language=data.get('language', 'Spanish'),
+        level=data.get('level', 'beginner'),
+        subject=data.get('subject', 'mathematics'),
+        topic=data.get('topic', 'basic arithmetic')
+    )
+    return sse_response(events)
+
 # Get Recent Lessons
 @app.route('/api/lessons', methods=['GET'])
 def get_lessons_api():
     limit = request.args.get('limit', 10, type=int)
     # Remove login_required for testing
     try:
-        lessons = get_recent_lessons(limit)
+        lessons = get_recent_lessons(
+            limit,
+            language=request.args.get('language'),
+            level=request.args.get('level'),
+            topic=request.args.get('topic')
+        )
         return jsonify({'success': True, 'lessons': lessons})
     except Exception as e:
         print(f"Error fetching lessons: {e}")
@@ -691,18 +863,59 @@ def get_lesson_by_id_api(lesson_id):
 # Journal Entry
 @app.route('/api/journal', methods=['POST', 'GET'])
 @login_required
+@rate_limited('feedback', methods=('POST',))
 def journal_api():
+    user_id = current_user.id
     if request.method == 'POST':
         data = request.json
-        entry = create_journal_entry(data.get('content'), data.get('language', 'Spanish'))
-        return jsonify({'success': True, 'entry': entry})
+        entry = create_journal_entry(data.get('content'), data.get('language', 'Spanish'), user_id=user_id)
+        # Saved now; feedback follows at /api/journal/<id> or /api/journal/<id>/stream
+        response = jsonify({'success': True, 'entry': entry})
+        response.status_code = 202
+        response.headers['Location'] = url_for('journal_entry_api', entry_id=entry['id'])
+        return response
     else:
-        entries = get_journal_entries()
-        return jsonify({'success': True, 'entries': entries})
+        # Newest first; pass next_cursor back as ?cursor= for the following page
+        limit = min(max(request.args.get('limit', JOURNAL_PAGE_SIZE, type=int), 1), MAX_JOURNAL_PAGE_SIZE)
+        try:
+            entries, next_cursor = get_journal_entries(user_id, limit=limit, cursor=request.args.get('cursor'))
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        return jsonify({'success': True, 'entries': entries, 'next_cursor': next_cursor})
+
+# Journal entry with its feedback status (for polling)
+@app.route('/api/journal/<entry_id>', methods=['GET'])
+@login_required
+def journal_entry_api(entry_id):
+    entry = get_journal_entry(entry_id, user_id=current_user.id)
+    if not entry:
+        return jsonify({'success': False, 'message': 'Journal entry not found'}), 404
+    return jsonify({'success': True, 'entry': entry})
+
+# Journal feedback (streaming): 'status' events while pending, then the finished 'entry'
+@app.route('/api/journal/<entry_id>/stream', methods=['GET'])
+@login_required
+def journal_feedback_stream_api(entry_id):
+    user_id = current_user.id
+    entry = get_journal_entry(entry_id, user_id=user_id)
+    if not entry:
+        return jsonify({'success': False, 'message': 'Journal entry not found'}), 404
+    
+    def events():
+        current = entry
+        deadline = time.monotonic() + JOURNAL_FEEDBACK_STREAM_SECONDS
+        while current.get('feedback_status') == 'pending' and time.monotonic() < deadline:
+            yield 'status', {'feedback_status': 'pending'}
+            wait_for_feedback(entry_id, timeout=5)
+            current = get_journal_entry(entry_id, user_id=user_id) or current
+        yield 'entry', current
+    
+    return sse_response(events())
 
 # Writing Exercise
 @app.route('/api/writing_exercise', methods=['POST'])
 @login_required
+@rate_limited('generation')
 def writing_exercise_api():
     data = request.json
     exercise = generate_writing_exercise(
@@ -715,6 +928,7 @@ def writing_exercise_api():
 # Check Writing
 @app.route('/api/check_writing', methods=['POST'])
 @login_required
+@rate_limited('feedback')
 def check_writing_api():
     data = request.json
     feedback = check_writing(
@@ -724,9 +938,34 @@ def check_writing_api():
     )
     return jsonify({'success': True, 'feedback': feedback})
 
+# Local pre-check only (answers in milliseconds, without a model call)
+@app.route('/api/check_writing/precheck', methods=['POST'])
+@login_required
+def precheck_writing_api():
+    data = request.json
+    result = precheck(data.get('content') or '', data.get('language', 'Spanish'))
+    return jsonify({'success': True, 'precheck': result})
+
+# Check Writing (streaming): pre-check results first, then the full feedback
+@app.route('/api/check_writing/stream', methods=['GET', 'POST'])
+@login_required
+@rate_limited('feedback')
+def check_writing_stream_api():
+    data = stream_params()
+    content = data.get('content') or ''
+    language = data.get('language', 'Spanish')
+    
+    def events():
+        result = precheck(content, language)
+        yield 'precheck', result
+        yield 'feedback', check_writing(content, language, data.get('exercise_id'), precheck_result=result)
+    
+    return sse_response(events())
+
 # Typing Exercise
 @app.route('/api/typing_exercise', methods=['GET'])
 @login_required
+@rate_limited('generation')
 def typing_exercise_api():
     language = request.args.get('language', 'Spanish')
     script_type = request.args.get('script_type', 'standard')
@@ -738,6 +977,7 @@ def typing_exercise_api():
 # Immersion Content
 @app.route('/api/immersion_content', methods=['GET'])
 @login_required
+@rate_limited('generation')
 def immersion_content_api():
     language = request.args.get('language', 'Spanish')
     content_type = request.args.get('type')
@@ -811,6 +1051,7 @@ def get_content_by_id(content_id):
 # Cultural Immersion Content
 @app.route('/api/cultural_content', methods=['GET'])
 @login_required
+@rate_limited('generation')
 def cultural_content_api():
     language = request.args.get('language', 'Spanish')
     cultural_aspect = request.args.get('aspect', 'traditions')
@@ -876,10 +1117,21 @@ def get_bookmarked_content():
         from models import ContentBookmark, db
         from immersion.content import get_content_by_id
         
+        from models import ContentProgress
+        
         # Get user's bookmarks
         bookmarks = ContentBookmark.query.filter_by(user_id=current_user.id).all()
         bookmark_ids = [bookmark.content_id for bookmark in bookmarks]
         
+        # Get progress on all of them in one query
+        progress_by_id = {
+            record.content_id: record.progress
+            for record in ContentProgress.query.filter(
+                ContentProgress.user_id == current_user.id,
+                ContentProgress.content_id.in_(bookmark_ids)
+            )
+        } if bookmark_ids else {}
+        
         # Get content for each bookmark
         bookmarked_content = []
         for content_id in bookmark_ids:
@@ -890,15 +1142,8 @@ def get_bookmarked_content():
                     continue
                 if content_type and content.get('type') != content_type:
                     continue
-                    
-                # Get progress
-                from models import ContentProgress
-                progress = ContentProgress.query.filter_by(
-                    user_id=current_user.id,
-                    content_id=content_id
-                ).first()
                 
-                content['progress'] = progress.progress if progress else 0
+                content['progress'] = progress_by_id.get(content_id, 0)
                 content['is_bookmarked'] = True
                 bookmarked_content.append(content)
         
@@ -1013,6 +1258,7 @@ def mark_content_complete(content_id):
 # Import External Content
 @app.route('/api/import_content', methods=['POST'])
 @login_required
+@rate_limited('generation')
 def import_content_api():
     data = request.json
     content_obj = import_external_content(
@@ -1027,13 +1273,15 @@ def import_content_api():
 # Process YouTube Transcript
 @app.route('/api/process_youtube', methods=['POST'])
 @login_required
+@rate_limited('generation')
 def process_youtube_api():
     data = request.json
     content_obj = process_youtube_transcript(
         transcript_text=data.get('transcript'),
         video_id=data.get('video_id'),
         title=data.get('title'),
-        language=data.get('language', 'Spanish')
+        language=data.get('language', 'Spanish'),
+        segments=data.get('segments')
     )
     return jsonify({'success': True, 'content': content_obj})
 
@@ -4,6 +4,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from itsdangerous import URLSafeTimedSerializer
 from flask_mail import Mail, Message
 import datetime
+import functools
 import os
 from models import db, User
 
@@ -23,6 +24,21 @@ auth_bp = Blueprint('auth', __name__)
 def load_user(user_id):
     return User.query.get(int(user_id))
 
+def admin_required(view):
+    """
+    Restrict a view to administrators (see models.ADMIN_EMAILS).
+    
+    Anonymous users are sent to log in; other users get a 403 response.
+    """
+    @functools.wraps(view)
+    def wrapped(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return login_manager.unauthorized()
+        if not getattr(current_user, 'is_admin', False):
+            return jsonify({'success': False, 'message': 'Administrator access required'}), 403
+        return view(*args, **kwargs)
+    return wrapped
+
 # Routes
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
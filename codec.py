@@ -0,0 +1,104 @@
+import os
+import re
+import json
+import zlib
+from collections import Counter
+
+# zlib compression level for stored documents (1 fastest - 9 smallest)
+LEVEL = int(os.getenv('CODEC_LEVEL', 6))
+
+# zlib only looks back 32KB, so a larger dictionary would not help
+DICTIONARY_BYTES = 32 * 1024
+
+# JSON keys, and words with the punctuation and space that follow them
+_TOKEN = re.compile(r'"\w+":|\w+[^\w"]{0,2}', re.UNICODE)
+
+
+def dumps(value):
+    """Encode a document as compact UTF-8 JSON"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def train_dictionary(samples, size=DICTIONARY_BYTES):
+    """
+    Build a shared compression dictionary from sample documents.
+
+    Picks the words, phrases and JSON keys found in the most samples, so
+    each document can refer to them instead of spelling them out.
+
+    Args:
+        samples (list): Encoded sample documents (bytes)
+        size (int): Maximum dictionary size in bytes
+
+    Returns:
+        bytes: The dictionary, or b'' if the samples share nothing
+    """
+    counts = Counter()
+    for sample in samples:
+        tokens = _TOKEN.findall(sample.decode('utf-8', errors='ignore'))
+        phrases = set(tokens)
+        phrases.update(a + b for a, b in zip(tokens, tokens[1:]))
+        phrases.update(a + b + c for a, b, c in zip(tokens, tokens[1:], tokens[2:]))
+        counts.update(phrases)
+
+    scored = sorted(
+        ((count * len(phrase.encode('utf-8')), phrase) for phrase, count in counts.items() if count > 1),
+        reverse=True
+    )
+    chosen = []
+    total = 0
+    for _, phrase in scored:
+        encoded = phrase.encode('utf-8')
+        if total + len(encoded) > size:
+            continue
+        chosen.append(encoded)
+        total += len(encoded)
+    # zlib finds matches near the end of the dictionary most cheaply, so the best phrases go last
+    return b''.join(reversed(chosen))
+
+
+class Codec:
+    """
+    zlib compression primed with shared dictionaries.
+
+    New data is compressed with the newest dictionary. zlib records which
+    dictionary a stream needs, so data compressed with an older one still
+    decompresses as long as that dictionary is known.
+    """
+
+    def __init__(self, dictionaries=(), level=LEVEL):
+        self.level = level
+        self.dictionary = b''
+        self._dictionaries = {}
+        for dictionary in dictionaries:
+            self.add_dictionary(dictionary)
+
+    def add_dictionary(self, dictionary):
+        """Make a dictionary known, and the one used from now on"""
+        if dictionary:
+            self._dictionaries[zlib.adler32(dictionary)] = dictionary
+            self.dictionary = dictionary
+
+    def compress(self, data):
+        if self.dictionary:
+            compressor = zlib.compressobj(self.level, zdict=self.dictionary)
+        else:
+            compressor = zlib.compressobj(self.level)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data):
+        """
+        Decompress data made by compress().
+
+        Raises:
+            KeyError: If the data needs a dictionary this codec does not know
+        """
+        # The FDICT bit of the zlib header means the dictionary's Adler-32 follows
+        if len(data) > 6 and data[1] & 0x20:
+            dictionary_id = int.from_bytes(data[2:6], 'big')
+            if dictionary_id not in self._dictionaries:
+                raise KeyError(f"Unknown compression dictionary {dictionary_id:08x}")
+            decompressor = zlib.decompressobj(zdict=self._dictionaries[dictionary_id])
+        else:
+            decompressor = zlib.decompressobj()
+        return decompressor.decompress(data) + decompressor.flush()
@@ -0,0 +1,65 @@
+import os
+import time
+import threading
+import secrets
+
+# Crockford's base32, as used by ULIDs (no I, L, O or U)
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+RANDOM_BITS = 80
+TIME_CHARS = 10
+ID_CHARS = 26
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+
+def _reset_after_fork():
+    """Forget the last id in a forked child, so it never continues the parent's sequence"""
+    global _lock, _last_ms, _last_random
+    _lock = threading.Lock()
+    _last_ms = -1
+    _last_random = 0
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        value, remainder = divmod(value, 32)
+        chars.append(ALPHABET[remainder])
+    return ''.join(reversed(chars))
+
+
+def new_id(prefix=''):
+    """
+    Generate a unique, time-ordered id (a ULID).
+
+    The first 10 characters encode the time in milliseconds and the other 16
+    are random, so ids from different threads, processes and hosts do not
+    collide and sort by creation time. Ids made in the same millisecond in
+    one process increase by one, so they keep their order too.
+
+    Args:
+        prefix (str): Text put before the id (e.g. "subject_")
+
+    Returns:
+        str: The prefix followed by 26 characters
+    """
+    global _last_ms, _last_random
+    now_ms = time.time_ns() // 1_000_000
+    with _lock:
+        if now_ms <= _last_ms and _last_random + 1 < 2 ** RANDOM_BITS:
+            # Same millisecond (or the clock went back): continue the sequence
+            now_ms = _last_ms
+            _last_random += 1
+        else:
+            _last_random = secrets.randbits(RANDOM_BITS)
+        _last_ms = now_ms
+        random_part = _last_random
+    return prefix + _encode(now_ms, TIME_CHARS) + _encode(random_part, ID_CHARS - TIME_CHARS)
+
@@ -1,24 +1,67 @@
 import json
 import os
+import atexit
 import datetime
 import re
-from openai import OpenAI
+from ai_integration.llm_gateway import complete_text
+from ai_integration.prompts import prompts
 from ai_integration.API_Integration import generate_lesson
+from immersion.study_aids import generate_study_aids, generate_transcript_study_aids, parse_transcript
+from ids import new_id
+from segment_store import SegmentStore
+from write_behind import WriteBehindStore
+from memory_store import MemoryStore
 
 # Use in-memory storage for Vercel deployment
 # Check if running on Vercel
 IS_VERCEL = os.environ.get('VERCEL') == '1'
 
-# In-memory storage for content when on Vercel
-CONTENT_MEMORY = {}
+# Bounded in-memory storage for content when on Vercel
+CONTENT_MEMORY = MemoryStore()
 
 # Local directory for content when running locally
 CONTENT_DIR = os.path.join(os.path.dirname(__file__), 'content')
 if not IS_VERCEL:
     os.makedirs(CONTENT_DIR, exist_ok=True)
 
-# Initialize OpenAI client
-client = OpenAI()
+# Generated content is appended to a segment store, off the request thread, rather than written one file per item
+CONTENT_STORE_DIR = os.getenv('CONTENT_STORE_DIR', os.path.join(CONTENT_DIR, 'segments'))
+content_store = None if IS_VERCEL else WriteBehindStore(SegmentStore(CONTENT_STORE_DIR))
+if content_store:
+    atexit.register(content_store.flush)
+
+def index_content_files(directory):
+    """
+    Map the ids of content saved as one <id>.json file each to their paths.
+    
+    Args:
+        directory (str): Directory with the content files
+        
+    Returns:
+        dict: Content ID to file path
+    """
+    with os.scandir(directory) as entries:
+        return {
+            entry.name[:-len('.json')]: entry.path
+            for entry in entries
+            if entry.name.endswith('.json') and entry.is_file()
+        }
+
+# Content saved before the segment store; no new files are added, so the index is built once
+CONTENT_FILES = {} if IS_VERCEL else index_content_files(CONTENT_DIR)
+
+def save_content(content_obj):
+    """
+    Store a generated content item under its id.
+    
+    Args:
+        content_obj (dict): The content item
+    """
+    if IS_VERCEL:
+        # Store in memory when on Vercel
+        CONTENT_MEMORY.put(content_obj['id'], content_obj)
+    else:
+        content_store.put(content_obj['id'], content_obj)
 
 def get_immersion_content(language='Spanish', content_type=None, topic=None, difficulty=None):
     """
@@ -52,36 +95,20 @@ def get_immersion_content(language='Spanish', content_type=None, topic=None, dif
     if not mock_content or (not content_type and not topic and not difficulty):
         try:
             # Generate a unique ID for the content
-            content_id = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+            content_id = new_id()
             
             # Create the prompt for the AI
-            topic_str = f" about {topic}" if topic else ""
             difficulty_level = difficulty if difficulty else 'intermediate'
             content_type_str = content_type if content_type and content_type != 'all' else 'article'
-            
-            prompt = f"""
-            Generate {difficulty_level} level {content_type_str} in {language}{topic_str} for language immersion.
-            
-            The content should:
-            1. Be entirely in {language}
-            2. Be appropriate for {difficulty_level} level learners
-            3. Include natural, authentic language usage
-            4. Be engaging and culturally relevant
-            5. Be between 200-300 words
-            
-            Also provide:
-            - A title in {language}
-            - A list of 5-10 key vocabulary words with their translations
-            - 3 comprehension questions in {language}
-            """
-            
-            response = client.completions.create(
-                model="gpt-3.5-turbo-instruct",  # Updated model name
-                prompt=prompt,
-                max_tokens=800
+            prompt = prompts.render(
+                'immersion_content',
+                difficulty=difficulty_level,
+                content_type=content_type_str,
+                language=language,
+                topic_clause=f" about {topic}" if topic else ""
             )
             
-            raw_content = response.choices[0].text.strip()
+            raw_content = complete_text(prompt.text, **prompt.options())
             
             # Parse the content to extract title, body, vocabulary, and questions
             title_match = re.search(r'^(.+?)(?:\n|$)', raw_content)
@@ -99,19 +126,11 @@ def get_immersion_content(language='Spanish', content_type=None, topic=None, dif
                 'description': f"AI-generated {content_type_str} in {language} for {difficulty_level} level learners",
                 'duration': '5 min read',
                 'content': raw_content,
+                'prompt_template': prompt.template_id,
                 'progress': 0
             }
             
-            if IS_VERCEL:
-                # Store in memory when on Vercel
-                CONTENT_MEMORY[content_id] = content_obj
-            else:
-                # Save the content to a file when running locally
-                filename = f"{content_id}.json"
-                filepath = os.path.join(CONTENT_DIR, filename)
-                
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(content_obj, f, ensure_ascii=False, indent=2)
+            save_content(content_obj)
             
             # Add the new content to the list
             mock_content.append(content_obj)
@@ -253,29 +272,12 @@ def import_external_content(content, title, language='Spanish', content_type='ar
         dict: The imported content object
     """
     # Generate a unique ID for the content
-    content_id = f"imported_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
-    
-    # Generate vocabulary and questions using AI
-    prompt = f"""
-    The following is a {content_type} in {language} titled "{title}".
-    
-    {content[:500]}...
-    
-    Based on this content, provide:
-    1. A list of 10 key vocabulary words with their translations to English
-    2. 5 comprehension questions in {language}
-    
-    Format your response with clear sections for vocabulary and questions.
-    """
+    content_id = new_id('imported_')
     
     try:
-        response = client.completions.create(
-            model="gpt-3.5-turbo-instruct",  # Updated model name
-            prompt=prompt,
-            max_tokens=500
-        )
-        
-        ai_additions = response.choices[0].text.strip()
+        # Generate vocabulary and questions over the whole text; failed chunks are
+        # skipped, so the imported text is saved even if the model is unavailable
+        study_aids = generate_study_aids(content, title, language=language, content_type=content_type)
         
         # Create the content object
         content_obj = {
@@ -285,20 +287,15 @@ def import_external_content(content, title, language='Spanish', content_type='ar
             'content_type': content_type,
             'source': source,
             'content': content,
-            'ai_additions': ai_additions,
+            'ai_additions': study_aids['text'],
+            'vocabulary': study_aids['vocabulary'],
+            'questions': study_aids['questions'],
+            'chunks': study_aids['chunks'],
+            'prompt_template': study_aids['template'],
             'timestamp': datetime.datetime.now().isoformat()
         }
         
-        if IS_VERCEL:
-            # Store in memory when on Vercel
-            CONTENT_MEMORY[content_id] = content_obj
-        else:
-            # Save the content to a file when running locally
-            filename = f"{content_id}.json"
-            filepath = os.path.join(CONTENT_DIR, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(content_obj, f, ensure_ascii=False, indent=2)
+        save_content(content_obj)
         
         return content_obj
     
@@ -309,44 +306,41 @@ def import_external_content(content, title, language='Spanish', content_type='ar
             'message': 'Failed to import content'
         }
 
-def process_youtube_transcript(transcript_text, video_id, title, language='Spanish'):
+def process_youtube_transcript(transcript_text, video_id, title, language='Spanish', segments=None):
     """
     Process a YouTube video transcript for language learning.
     
     Args:
-        transcript_text (str): The transcript text
+        transcript_text (str): The transcript text, optionally with timestamps as copied from YouTube
         video_id (str): The YouTube video ID
         title (str): The title of the video
         language (str): The language of the transcript
+        segments (list, optional): Timed captions, each a dict with 'start' (seconds),
+            'text' and optionally 'duration'; used instead of transcript_text
         
     Returns:
         dict: The processed transcript
     """
     # Generate a unique ID for the content
-    content_id = f"youtube_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
-    
-    # Generate vocabulary and questions using AI
-    prompt = f"""
-    The following is a transcript from a YouTube video in {language} titled "{title}".
-    
-    {transcript_text[:500]}...
-    
-    Based on this transcript, provide:
-    1. A list of 10 key vocabulary words with their translations to English
-    2. 5 comprehension questions in {language}
-    3. A brief summary of the content in English (2-3 sentences)
-    
-    Format your response with clear sections for vocabulary, questions, and summary.
-    """
+    content_id = new_id('youtube_')
     
     try:
-        response = client.completions.create(
-            model="gpt-3.5-turbo-instruct",  # Updated model name
-            prompt=prompt,
-            max_tokens=500
-        )
+        if segments:
+            segments = [
+                {
+                    'start': float(segment['start']) if segment.get('start') is not None else None,
+                    'duration': segment.get('duration'),
+                    'text': str(segment.get('text') or '').strip()
+                }
+                for segment in segments
+            ]
+            segments = [segment for segment in segments if segment['text']]
+        else:
+            segments = parse_transcript(transcript_text)
         
-        ai_additions = response.choices[0].text.strip()
+        # Generate vocabulary, questions and a timed summary over the whole transcript;
+        # failed chunks are skipped, so the transcript is saved even if the model is unavailable
+        study_aids = generate_transcript_study_aids(segments, title, language=language)
         
         # Create the content object
         content_obj = {
@@ -355,21 +349,18 @@ def process_youtube_transcript(transcript_text, video_id, title, language='Spani
             'language': language,
             'content_type': 'youtube_transcript',
             'video_id': video_id,
-            'transcript': transcript_text,
-            'ai_additions': ai_additions,
+            'transcript': '\n'.join(segment['text'] for segment in segments),
+            'segments': study_aids['segments'],
+            'ai_additions': study_aids['text'],
+            'vocabulary': study_aids['vocabulary'],
+            'questions': study_aids['questions'],
+            'sections': study_aids['sections'],
+            'chunks': study_aids['chunks'],
+            'prompt_template': study_aids['template'],
             'timestamp': datetime.datetime.now().isoformat()
         }
         
-        if IS_VERCEL:
-            # Store in memory when on Vercel
-            CONTENT_MEMORY[content_id] = content_obj
-        else:
-            # Save the content to a file when running locally
-            filename = f"{content_id}.json"
-            filepath = os.path.join(CONTENT_DIR, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(content_obj, f, ensure_ascii=False, indent=2)
+        save_content(content_obj)
         
         return content_obj
     
@@ -390,7 +381,7 @@ def get_content_by_id(content_id):
     Returns:
         dict: The content object or None if not found
     """
-    # Convert to string if it's an integer
+    # Convert to string if it's an integer; ids are matched exactly
     content_id = str(content_id)
     
     try:
@@ -402,12 +393,15 @@ def get_content_by_id(content_id):
             if content_id in ['1', '2', '3', '4']:
                 return get_mock_content(content_id)
                 
-            # Try to retrieve from file when running locally
-            for filename in os.listdir(CONTENT_DIR):
-                if filename.startswith(content_id) or content_id in filename:
-                    filepath = os.path.join(CONTENT_DIR, filename)
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        return json.load(f)
+            content = content_store.get(content_id)
+            if content is not None:
+                return content
+                
+            # Content saved before the segment store, one file per item
+            filepath = CONTENT_FILES.get(content_id)
+            if filepath:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    return json.load(f)
             
             # If not found, return None
             return None
@@ -541,32 +535,18 @@ def get_cultural_immersion_content(language='Spanish', cultural_aspect='traditio
         dict: The cultural immersion content
     """
     # Generate a unique ID for the content
-    content_id = f"cultural_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
+    content_id = new_id('cultural_')
     
     # Create the prompt for the AI
-    region_str = f" in {region}" if region else ""
-    prompt = f"""
-    Generate cultural immersion content about {cultural_aspect} {region_str} for students learning {language}.
-    
-    Include:
-    1. A title in {language}
-    2. An engaging description of the {cultural_aspect} (200-300 words) in {language}
-    3. Cultural vocabulary (10 terms with translations)
-    4. Cultural insights and context
-    5. How this cultural aspect relates to the language
-    6. A short activity or reflection question for students
-    
-    Format the response in a structured way with clear section headings.
-    """
+    prompt = prompts.render(
+        'cultural_content',
+        cultural_aspect=cultural_aspect,
+        region_clause=f" in {region}" if region else "",
+        language=language
+    )
     
     try:
-        response = client.completions.create(
-            model="gpt-3.5-turbo-instruct",  # Updated model name
-            prompt=prompt,
-            max_tokens=800
-        )
-        
-        content = response.choices[0].text.strip()
+        content = complete_text(prompt.text, **prompt.options())
         
         # Parse the title
         title_match = re.search(r'^(.+?)(?:\n|$)', content)
@@ -580,19 +560,11 @@ def get_cultural_immersion_content(language='Spanish', cultural_aspect='traditio
             'cultural_aspect': cultural_aspect,
             'region': region,
             'content': content,
+            'prompt_template': prompt.template_id,
             'timestamp': datetime.datetime.now().isoformat()
         }
         
-        if IS_VERCEL:
-            # Store in memory when on Vercel
-            CONTENT_MEMORY[content_id] = content_obj
-        else:
-            # Save the content to a file when running locally
-            filename = f"{content_id}.json"
-            filepath = os.path.join(CONTENT_DIR, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(content_obj, f, ensure_ascii=False, indent=2)
+        save_content(content_obj)
         
         return content_obj
     
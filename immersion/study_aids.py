@@ -0,0 +1,378 @@
+import os
+import re
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from ai_integration.llm_gateway import complete_text
+from ai_integration.prompts import prompts
+from ai_integration.llm_metrics import current_route
+from ai_integration.translation import normalize_word
+
+# Chunking settings (can be tuned per deployment through the environment)
+CHUNK_CHARS = int(os.getenv('STUDY_AIDS_CHUNK_CHARS', 3000))
+# Very long texts get larger chunks rather than more calls
+MAX_CHUNKS = int(os.getenv('STUDY_AIDS_MAX_CHUNKS', 24))
+MAX_PARALLEL_CHUNKS = int(os.getenv('STUDY_AIDS_MAX_PARALLEL_CHUNKS', 6))
+
+# What each chunk is asked for, and what the merged result keeps
+VOCABULARY_PER_CHUNK = 8
+QUESTIONS_PER_CHUNK = 3
+MAX_VOCABULARY = 25
+MAX_QUESTIONS = 10
+# Start times kept per vocabulary word of a transcript
+MAX_OCCURRENCES = 5
+
+_SENTENCE_END = re.compile(r'(?<=[.!?…])\s+')
+# A transcript line starting with a timestamp: m:ss or h:mm:ss
+_TIMESTAMP = re.compile(r'^(?:(\d+):)?(\d{1,2}):(\d{2})\b\s*(.*)$')
+
+
+def _pieces(paragraph, size):
+    """Split a paragraph longer than size at sentence ends, or at spaces for run-on sentences"""
+    pieces = []
+    for sentence in _SENTENCE_END.split(paragraph):
+        while len(sentence) > size:
+            cut = sentence.rfind(' ', 0, size)
+            cut = cut if cut > 0 else size
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            pieces.append(sentence)
+    return pieces
+
+
+def split_into_chunks(text, chunk_chars=CHUNK_CHARS, max_chunks=MAX_CHUNKS):
+    """
+    Split a text into paragraph-aligned chunks.
+
+    Paragraphs are packed together up to chunk_chars; a paragraph longer
+    than that is split at sentence ends.
+
+    Args:
+        text (str): The full text
+        chunk_chars (int): Target chunk size in characters
+        max_chunks (int): Chunks are made larger when the text would need more than this
+
+    Returns:
+        list: The chunks, in text order
+    """
+    text = (text or '').strip()
+    if not text:
+        return []
+
+    size = max(chunk_chars, math.ceil(len(text) / max_chunks))
+    # Blank lines separate paragraphs; texts without any use single line breaks
+    separator = r'\n\s*\n' if re.search(r'\n\s*\n', text) else r'\n'
+    paragraphs = [p.strip() for p in re.split(separator, text) if p.strip()]
+
+    chunks = []
+    current = []
+    length = 0
+    for paragraph in paragraphs:
+        for piece in ([paragraph] if len(paragraph) <= size else _pieces(paragraph, size)):
+            if current and length + len(piece) + 2 > size:
+                chunks.append('\n\n'.join(current))
+                current, length = [], 0
+            current.append(piece)
+            length += len(piece) + 2
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+
+def _clock(seconds):
+    """Format a start time as m:ss or h:mm:ss"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def parse_transcript(text):
+    """
+    Turn a pasted transcript into timed segments.
+
+    Understands the layout of YouTube's "Show transcript" panel, where each
+    caption follows its timestamp (m:ss or h:mm:ss) on the same or the next
+    line. Text without timestamps becomes one untimed segment per line.
+
+    Args:
+        text (str): The transcript
+
+    Returns:
+        list: Segments, each a dict with 'start' (seconds, or None) and 'text'
+    """
+    segments = []
+    for line in (text or '').splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        match = _TIMESTAMP.match(line)
+        if match:
+            hours, minutes, seconds, rest = match.groups()
+            start = int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)
+            segments.append({'start': float(start), 'text': rest.strip()})
+        elif segments and not segments[-1]['text'] and segments[-1]['start'] is not None:
+            segments[-1]['text'] = line
+        else:
+            segments.append({'start': None, 'text': line})
+    return [segment for segment in segments if segment['text']]
+
+
+def window_segments(segments, chunk_chars=CHUNK_CHARS, max_chunks=MAX_CHUNKS):
+    """
+    Group consecutive transcript segments into chunks of about chunk_chars.
+
+    Args:
+        segments (list): Segments with 'start' and 'text'
+        chunk_chars (int): Target chunk size in characters
+        max_chunks (int): Chunks are made larger when the transcript would need more than this
+
+    Returns:
+        list: Lists of segments, in transcript order
+    """
+    total = sum(len(segment['text']) + 1 for segment in segments)
+    size = max(chunk_chars, math.ceil(total / max_chunks)) if segments else chunk_chars
+
+    # A segment goes to the window its first character falls in, so there are
+    # never more than max_chunks windows
+    windows = []
+    last = -1
+    offset = 0
+    for segment in segments:
+        index = offset // size
+        if index > last:
+            windows.append([])
+            last = index
+        windows[-1].append(segment)
+        offset += len(segment['text']) + 1
+    return windows
+
+
+def _occurrences(word, segments):
+    """Start times of the segments a word or phrase appears in"""
+    pattern = re.compile(r'(?<!\w)' + re.escape(normalize_word(word)) + r'(?!\w)')
+    return [
+        segment['start'] for segment in segments
+        if segment['start'] is not None and pattern.search(segment['text'].lower())
+    ]
+
+
+def _parse_chunk(text):
+    """Extract the vocabulary, questions and summary from a chunk response"""
+    start = text.find('{')
+    end = text.rfind('}')
+    if start == -1 or end == -1:
+        raise ValueError("No JSON object in study aids response")
+    data = json.loads(text[start:end + 1])
+
+    vocabulary = [
+        {'word': str(item['word']).strip(), 'translation': str(item.get('translation') or '').strip()}
+        for item in data.get('vocabulary') or []
+        if isinstance(item, dict) and item.get('word')
+    ]
+    questions = [str(question).strip() for question in data.get('questions') or [] if str(question).strip()]
+    return {'vocabulary': vocabulary, 'questions': questions, 'summary': str(data.get('summary') or '').strip()}
+
+
+def merge_study_aids(parts):
+    """
+    Merge the study aids of every chunk (the reduce step).
+
+    Vocabulary found in several chunks ranks first, then words in text order;
+    questions are taken from each chunk in turn, so every part of the text is
+    asked about.
+
+    Args:
+        parts (list): Per chunk, a dict with 'vocabulary' and 'questions' (None for failed chunks)
+
+    Returns:
+        dict: The merged 'vocabulary' and 'questions'
+    """
+    words = {}
+    for index, part in enumerate(filter(None, parts)):
+        for item in part['vocabulary']:
+            key = normalize_word(item['word'])
+            if not key:
+                continue
+            entry = words.setdefault(key, {'item': item, 'count': 0, 'first': index})
+            entry['count'] += 1
+            if not entry['item']['translation']:
+                entry['item'] = item
+    ranked = sorted(words.values(), key=lambda entry: (-entry['count'], entry['first']))
+    vocabulary = [entry['item'] for entry in ranked[:MAX_VOCABULARY]]
+
+    questions = []
+    seen = set()
+    queues = [list(part['questions']) for part in parts if part]
+    while queues and len(questions) < MAX_QUESTIONS:
+        for queue in queues:
+            if queue and len(questions) < MAX_QUESTIONS:
+                question = queue.pop(0)
+                key = normalize_word(question)
+                if key not in seen:
+                    seen.add(key)
+                    questions.append(question)
+        queues = [queue for queue in queues if queue]
+
+    return {'vocabulary': vocabulary, 'questions': questions}
+
+
+def format_study_aids(aids):
+    """Render merged study aids as the text shown with imported content"""
+    if not aids['vocabulary'] and not aids['questions']:
+        return ""
+    lines = ["Vocabulary:"]
+    for i, item in enumerate(aids['vocabulary'], 1):
+        at = f" ({_clock(item['start'])})" if item.get('start') is not None else ""
+        lines.append(f"{i}. {item['word']} - {item['translation']}{at}")
+    lines += ["", "Comprehension questions:"]
+    lines += [f"{i}. {question}" for i, question in enumerate(aids['questions'], 1)]
+    if aids.get('sections'):
+        lines += ["", "Summary:"]
+        lines += [
+            f"[{_clock(section['start'])}] {section['summary']}" if section['start'] is not None else section['summary']
+            for section in aids['sections']
+        ]
+    return '\n'.join(lines)
+
+
+def _run_chunks(prompt_list):
+    """
+    Send the prompt of every chunk concurrently (the map step).
+
+    Returns:
+        list: The parsed response per chunk, or None for chunks that failed
+    """
+    # Worker threads have no request context, so charge the calls to the caller's route
+    route = current_route()
+
+    def run(prompt):
+        try:
+            return _parse_chunk(complete_text(prompt.text, **prompt.options(), route=route))
+        except Exception as e:
+            print(f"Error generating study aids for a chunk: {e}")
+            return None
+
+    if not prompt_list:
+        return []
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_CHUNKS, len(prompt_list))) as executor:
+        return list(executor.map(run, prompt_list))
+
+
+def generate_study_aids(text, title, language='Spanish', content_type='article'):
+    """
+    Build vocabulary and questions covering a whole text.
+
+    The text is split into chunks that are sent to the model concurrently
+    (map), and their results are merged (reduce), so a long article takes
+    about as long as its slowest chunk.
+
+    Args:
+        text (str): The full text
+        title (str): The title of the text
+        language (str): The language of the text
+        content_type (str): Type of content (article, news, book excerpt, etc.)
+
+    Returns:
+        dict: 'vocabulary', 'questions', the formatted 'text', the number of
+            'chunks' and of 'failed_chunks', and the 'template' used
+    """
+    chunks = split_into_chunks(text)
+    prompt_list = [
+        prompts.render(
+            'article_chunk_study_aids',
+            part=i,
+            parts=len(chunks),
+            content_type=content_type,
+            language=language,
+            title=title,
+            excerpt=chunk,
+            vocabulary_count=VOCABULARY_PER_CHUNK,
+            question_count=QUESTIONS_PER_CHUNK
+        )
+        for i, chunk in enumerate(chunks, 1)
+    ]
+
+    parts = _run_chunks(prompt_list)
+    aids = merge_study_aids(parts)
+    aids['text'] = format_study_aids(aids)
+    aids['chunks'] = len(chunks)
+    aids['failed_chunks'] = parts.count(None)
+    aids['template'] = prompt_list[0].template_id if prompt_list else None
+    return aids
+
+
+def generate_transcript_study_aids(segments, title, language='Spanish'):
+    """
+    Build vocabulary, questions and a timed summary covering a whole transcript.
+
+    Segments are windowed into at most MAX_PARALLEL_CHUNKS chunks, so even a
+    long video is processed in a single round of concurrent calls. Every
+    vocabulary word is located in the segments it appears in, so the client
+    can seek the video to it.
+
+    Args:
+        segments (list): Segments with 'start' (seconds, or None) and 'text'
+        title (str): The title of the video
+        language (str): The language of the transcript
+
+    Returns:
+        dict: 'vocabulary' (each word with its first 'start' and its 'occurrences'),
+            'questions', 'sections' (start and English summary per chunk), 'segments'
+            (each with the vocabulary words it contains), the formatted 'text',
+            the number of 'chunks' and of 'failed_chunks', and the 'template' used
+    """
+    windows = window_segments(segments, max_chunks=MAX_PARALLEL_CHUNKS)
+    timed = [segment for segment in segments if segment['start'] is not None]
+    end_time = timed[-1]['start'] if timed else None
+
+    prompt_list = []
+    for i, window in enumerate(windows, 1):
+        starts = [segment['start'] for segment in window if segment['start'] is not None]
+        prompt_list.append(prompts.render(
+            'youtube_chunk_study_aids',
+            part=i,
+            parts=len(windows),
+            language=language,
+            title=title,
+            span=f" ({_clock(starts[0])} to {_clock(starts[-1])} of {_clock(end_time)})" if starts else "",
+            excerpt='\n'.join(segment['text'] for segment in window),
+            vocabulary_count=VOCABULARY_PER_CHUNK,
+            question_count=QUESTIONS_PER_CHUNK
+        ))
+
+    parts = _run_chunks(prompt_list)
+    aids = merge_study_aids(parts)
+
+    # Locate each word in the whole transcript, not only the chunk it was picked from
+    words_by_start = {}
+    for item in aids['vocabulary']:
+        occurrences = _occurrences(item['word'], segments)
+        item['start'] = occurrences[0] if occurrences else None
+        item['occurrences'] = occurrences[:MAX_OCCURRENCES]
+        for start in occurrences:
+            words_by_start.setdefault(start, []).append(item['word'])
+
+    aids['sections'] = [
+        {'start': window[0]['start'], 'summary': part['summary']}
+        for window, part in zip(windows, parts)
+        if part and part['summary']
+    ]
+    aids['segments'] = []
+    for i, segment in enumerate(segments):
+        following = segments[i + 1]['start'] if i + 1 < len(segments) else None
+        aids['segments'].append({
+            'start': segment['start'],
+            'duration': segment.get('duration') or (
+                following - segment['start'] if segment['start'] is not None and following is not None else None
+            ),
+            'text': segment['text'],
+            'vocabulary': words_by_start.get(segment['start'], []) if segment['start'] is not None else []
+        })
+
+    aids['text'] = format_study_aids(aids)
+    aids['chunks'] = len(windows)
+    aids['failed_chunks'] = parts.count(None)
+    aids['template'] = prompt_list[0].template_id if prompt_list else None
+    return aids
@@ -1,37 +1,55 @@
-import json
 import os
+import time
 import datetime
-import openai
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ai_integration.llm_gateway import complete_text
+from ai_integration.prompts import prompts
 from ai_integration.API_Integration import generate_lesson
+from writing_exercises.precheck import precheck, summarize
+from ids import new_id
+from journaling import store
+from memory_store import MemoryStore
 
 # Use in-memory storage for Vercel deployment
 # Check if running on Vercel
 IS_VERCEL = os.environ.get('VERCEL') == '1'
 
-# In-memory storage for journal entries when on Vercel
-JOURNAL_ENTRIES = []
+# Bounded in-memory storage for journal entries when on Vercel, grouped by
+# the user who wrote each entry
+JOURNAL_ENTRIES = MemoryStore()
 
-# Local directory for journal entries when running locally
-JOURNAL_DIR = os.path.join(os.path.dirname(__file__), 'entries')
-if not IS_VERCEL:
-    os.makedirs(JOURNAL_DIR, exist_ok=True)
+# Background workers computing AI feedback, so saving an entry never waits on the model
+FEEDBACK_WORKERS = int(os.getenv('JOURNAL_FEEDBACK_WORKERS', 2))
+_feedback_pool = ThreadPoolExecutor(max_workers=FEEDBACK_WORKERS, thread_name_prefix='journal-feedback')
 
-def create_journal_entry(content, language='Spanish'):
+# Entries still pending after this many seconds were left behind by a process
+# that stopped (feedback calls have a far shorter deadline)
+STALE_FEEDBACK_SECONDS = int(os.getenv('JOURNAL_STALE_FEEDBACK_SECONDS', 120))
+
+# Entry id -> Event set once this process has finished the entry's feedback
+_feedback_events = {}
+_feedback_lock = threading.Lock()
+
+def create_journal_entry(content, language='Spanish', user_id=None):
     """
-    Create a new journal entry and save it to a JSON file or in-memory storage.
+    Create a new journal entry and save it to the database or in-memory storage.
+    
+    The entry is saved and returned right away with a 'pending' feedback
+    status and the local pre-check results; AI feedback is computed by a
+    background worker and written to the entry when ready (see
+    get_journal_entry and wait_for_feedback).
     
     Args:
         content (str): The content of the journal entry
         language (str): The language of the journal entry
+        user_id (int): The user writing the entry
         
     Returns:
-        dict: The created journal entry with AI feedback
+        dict: The created journal entry, with pre-check results but without feedback yet
     """
     # Generate a unique ID for the entry
-    entry_id = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-    
-    # Get AI feedback on the entry
-    feedback = get_ai_feedback(content, language)
+    entry_id = new_id()
     
     # Create the entry object
     entry = {
@@ -39,63 +57,168 @@ def create_journal_entry(content, language='Spanish'):
         'content': content,
         'language': language,
         'timestamp': datetime.datetime.now().isoformat(),
-        'feedback': feedback
+        'feedback': None,
+        'feedback_status': 'pending',
+        'precheck': precheck(content, language)
     }
     
+    save_journal_entry(entry, user_id)
+    
+    with _feedback_lock:
+        _feedback_events[entry_id] = threading.Event()
+    _feedback_pool.submit(_complete_feedback, dict(entry), user_id)
+    
+    return entry
+
+def save_journal_entry(entry, user_id=None):
+    """
+    Persist a journal entry, replacing any earlier version of it.
+    
+    Args:
+        entry (dict): The journal entry
+        user_id (int): The user who wrote it
+    """
     if IS_VERCEL:
         # Store in memory when on Vercel
-        JOURNAL_ENTRIES.append(entry)
+        JOURNAL_ENTRIES.put(entry['id'], entry, group=user_id)
     else:
-        # Save the entry to a file when running locally
-        filename = f"{entry_id}.json"
-        filepath = os.path.join(JOURNAL_DIR, filename)
+        # Save the entry to the journal table when running locally
+        store.save(entry, user_id)
+
+def _complete_feedback(entry, user_id=None):
+    """Compute feedback for a saved entry and store it (runs on a feedback worker)"""
+    try:
+        entry['feedback'] = _request_feedback(entry['content'], entry['language'])
+        entry['feedback_status'] = 'ready'
+    except Exception as e:
+        print(f"Error getting AI feedback: {e}")
+        entry['feedback'] = _error_feedback(entry.get('precheck'))
+        entry['feedback_status'] = 'failed'
+    
+    try:
+        save_journal_entry(entry, user_id)
+    finally:
+        with _feedback_lock:
+            event = _feedback_events.pop(entry['id'], None)
+        if event:
+            event.set()
+
+def resume_pending_feedback(older_than=STALE_FEEDBACK_SECONDS):
+    """
+    Queue feedback again for entries a stopped process left pending.
+    
+    Each entry is claimed in the journal table first, so when several worker
+    processes recover at once every entry is queued by only one of them.
+    Entries in memory (on Vercel) are lost with the process, so only the
+    journal table is checked.
+    
+    Args:
+        older_than (float): Only entries nobody has claimed for this many seconds
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(entry, f, ensure_ascii=False, indent=2)
+    Returns:
+        int: Number of entries queued
+    """
+    if IS_VERCEL:
+        return 0
     
-    return entry
+    cutoff = datetime.datetime.now() - datetime.timedelta(seconds=older_than)
+    try:
+        stale = store.pending(cutoff)
+    except Exception as e:
+        print(f"Error finding pending journal feedback: {e}")
+        return 0
+    
+    resumed = 0
+    for entry, user_id in stale:
+        try:
+            if not store.claim(entry['id'], cutoff):
+                # Another process took it on first
+                continue
+        except Exception as e:
+            print(f"Error claiming journal feedback: {e}")
+            continue
+        with _feedback_lock:
+            _feedback_events[entry['id']] = threading.Event()
+        _feedback_pool.submit(_complete_feedback, entry, user_id)
+        resumed += 1
+    return resumed
+
+def start_feedback_recovery(older_than=STALE_FEEDBACK_SECONDS):
+    """
+    Resume abandoned feedback at startup.
+    
+    Runs once now and once more after older_than seconds, when entries left
+    pending just before the restart have become stale too.
+    """
+    resume_pending_feedback(older_than)
+    timer = threading.Timer(older_than, resume_pending_feedback, args=(older_than,))
+    timer.daemon = True
+    timer.start()
 
-def get_journal_entries(limit=10):
+def get_journal_entry(entry_id, user_id=None):
     """
-    Get the most recent journal entries.
+    Get a single journal entry.
     
     Args:
-        limit (int): Maximum number of entries to return
+        entry_id (str): The ID of the entry
+        user_id (int, optional): Only return the entry if this user wrote it
         
     Returns:
-        list: List of journal entries
+        dict: The journal entry, or None if not found
     """
     if IS_VERCEL:
-        # Return from in-memory storage when on Vercel
-        # Sort by timestamp (newest first) and limit
-        sorted_entries = sorted(
-            JOURNAL_ENTRIES, 
-            key=lambda x: x.get('timestamp', ''), 
-            reverse=True
-        )
-        return sorted_entries[:limit]
+        if user_id is not None and JOURNAL_ENTRIES.group(entry_id) != user_id:
+            return None
+        return JOURNAL_ENTRIES.get(entry_id)
+    
+    return store.get(entry_id, user_id)
+
+def wait_for_feedback(entry_id, timeout):
+    """
+    Wait until an entry's feedback may have changed.
+    
+    Returns as soon as this process finishes the feedback; entries handled
+    by another worker process are re-checked after a short sleep.
+    
+    Args:
+        entry_id (str): The ID of the entry
+        timeout (float): Maximum number of seconds to wait
+    """
+    with _feedback_lock:
+        event = _feedback_events.get(entry_id)
+    if event:
+        event.wait(timeout)
     else:
-        # Return from file system when running locally
-        entries = []
-        
-        # Check if the directory exists
-        if not os.path.exists(JOURNAL_DIR):
-            return entries
-        
-        # Get all JSON files in the directory
-        files = [f for f in os.listdir(JOURNAL_DIR) if f.endswith('.json')]
-        
-        # Sort files by name (which is based on timestamp)
-        files.sort(reverse=True)
+        time.sleep(min(timeout, 1.0))
+
+def get_journal_entries(user_id, limit=10, cursor=None):
+    """
+    Get a user's journal entries, newest first, one page at a time.
+    
+    Args:
+        user_id (int): The user whose entries to return
+        limit (int): Maximum number of entries to return
+        cursor (str, optional): The next_cursor of the previous page
         
-        # Load the entries
-        for filename in files[:limit]:
-            filepath = os.path.join(JOURNAL_DIR, filename)
-            with open(filepath, 'r', encoding='utf-8') as f:
-                entry = json.load(f)
-                entries.append(entry)
+    Returns:
+        tuple: (entries, next_cursor); next_cursor is None on the last page
         
-        return entries
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if IS_VERCEL:
+        # Return from in-memory storage when on Vercel; the cursor is the id
+        # of the last entry on the previous page, where the listing resumes
+        try:
+            entries = JOURNAL_ENTRIES.recent(limit + 1, group=user_id, before=cursor)
+        except KeyError:
+            # That entry was dropped since; ids are time-ordered, so walk
+            # the user's entries from the newest instead
+            entries = JOURNAL_ENTRIES.recent(limit + 1, group=user_id, match=lambda entry: entry['id'] < cursor)
+        return entries[:limit], entries[limit - 1]['id'] if len(entries) > limit else None
+    else:
+        # Return from the journal table when running locally
+        return store.page(user_id, limit=limit, cursor=cursor)
 
 def get_ai_feedback(content, language):
     """
@@ -108,43 +231,34 @@ def get_ai_feedback(content, language):
     Returns:
         dict: Feedback including grammar corrections and suggestions
     """
-    prompt = f"""
-    Analyze the following journal entry in {language} and provide feedback:
-    
-    {content}
-    
-    Provide feedback in the following format:
-    1. Grammar corrections
-    2. Vocabulary suggestions
-    3. Cultural insights
-    4. Overall fluency assessment
-    """
-    
     try:
-        response = openai.Completion.create(
-            model="text-davinci-003",
-            prompt=prompt,
-            max_tokens=300
-        )
-        
-        feedback_text = response.choices[0].text.strip()
-        
-        # Parse the feedback into sections
-        sections = feedback_text.split('\n\n')
-        
-        feedback = {
-            'grammar': sections[0] if len(sections) > 0 else "No grammar feedback available.",
-            'vocabulary': sections[1] if len(sections) > 1 else "No vocabulary suggestions available.",
-            'cultural': sections[2] if len(sections) > 2 else "No cultural insights available.",
-            'fluency': sections[3] if len(sections) > 3 else "No fluency assessment available."
-        }
-        
-        return feedback
+        return _request_feedback(content, language)
     except Exception as e:
         print(f"Error getting AI feedback: {e}")
-        return {
-            'grammar': "Error generating feedback.",
-            'vocabulary': "Error generating feedback.",
-            'cultural': "Error generating feedback.",
-            'fluency': "Error generating feedback."
-        }
+        return _error_feedback(precheck(content, language))
+
+def _request_feedback(content, language):
+    """Ask the model for feedback on an entry and split it into sections"""
+    prompt = prompts.render('journal_feedback', language=language, content=content)
+    
+    feedback_text = complete_text(prompt.text, **prompt.options())
+    
+    # Parse the feedback into sections
+    sections = feedback_text.split('\n\n')
+    
+    return {
+        'grammar': sections[0] if len(sections) > 0 else "No grammar feedback available.",
+        'vocabulary': sections[1] if len(sections) > 1 else "No vocabulary suggestions available.",
+        'cultural': sections[2] if len(sections) > 2 else "No cultural insights available.",
+        'fluency': sections[3] if len(sections) > 3 else "No fluency assessment available.",
+        'prompt_template': prompt.template_id
+    }
+
+def _error_feedback(precheck_result=None):
+    """Feedback for when the model fails, built from the pre-check results when there are any"""
+    return {
+        'grammar': summarize(precheck_result) if precheck_result and precheck_result['supported'] else "Error generating feedback.",
+        'vocabulary': "Error generating feedback.",
+        'cultural': "Error generating feedback.",
+        'fluency': "Error generating feedback."
+    }
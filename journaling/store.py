@@ -0,0 +1,199 @@
+import json
+import base64
+import datetime
+from contextlib import contextmanager
+from flask import has_app_context
+
+from models import db, JournalEntry, ensure_table
+
+# Journal entries live in the `journal_entries` table; a user's entries are
+# read through the (user_id, created_at, id) index one page at a time, so a
+# page costs the same however many entries the user has
+
+# App used when the store is called outside an app context (feedback workers)
+_app = None
+
+
+def init_app(app):
+    """Register the app and bring the journal table up to date"""
+    global _app
+    _app = app
+    with app.app_context():
+        try:
+            ensure_schema()
+        except Exception as e:
+            app.logger.error(f"Error preparing the journal table: {e}")
+
+
+@contextmanager
+def _context():
+    """Run inside the current app context, or the registered app's"""
+    if has_app_context():
+        yield
+        return
+    if _app is None:
+        raise RuntimeError("The journal store is not initialized; call journaling.store.init_app(app) first")
+    with _app.app_context():
+        yield
+
+
+def ensure_schema():
+    """
+    Create the journal table and its indexes, adding columns that older databases lack.
+
+    Returns:
+        list: Names of the columns that were added
+    """
+    with _context():
+        return ensure_table(JournalEntry)
+
+
+def encode_cursor(row):
+    """Opaque cursor pointing just past an entry"""
+    raw = json.dumps([row.created_at.isoformat(), row.id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Read a cursor made by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(created_at), int(row_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def save(entry, user_id):
+    """
+    Store a journal entry, replacing any earlier version of it.
+
+    Args:
+        entry (dict): The journal entry
+        user_id (int): The user who wrote it
+    """
+    with _context():
+        try:
+            row = JournalEntry.query.filter_by(entry_key=entry['id']).first()
+            if row is None:
+                row = JournalEntry(entry_key=entry['id'], user_id=user_id)
+                row.created_at = datetime.datetime.fromisoformat(entry['timestamp'])
+                if entry.get('feedback_status') == 'pending':
+                    # The process saving a new entry computes its feedback
+                    row.feedback_claimed_at = row.created_at
+            row.content = entry['content']
+            row.language = entry['language']
+            row.ai_feedback = json.dumps(entry['feedback'], ensure_ascii=False) if entry.get('feedback') is not None else None
+            row.feedback_status = entry.get('feedback_status')
+            row.precheck = entry.get('precheck')
+            db.session.add(row)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def get(entry_id, user_id=None):
+    """
+    Look up a journal entry by its id.
+
+    Args:
+        entry_id (str): The ID of the entry
+        user_id (int, optional): Only return the entry if this user wrote it
+
+    Returns:
+        dict: The journal entry, or None if not found
+    """
+    with _context():
+        query = JournalEntry.query.filter_by(entry_key=entry_id)
+        if user_id is not None:
+            query = query.filter_by(user_id=user_id)
+        row = query.first()
+        return row.to_entry() if row else None
+
+
+def _unclaimed_since(cutoff):
+    """Filter for pending entries no process has taken on since the cutoff"""
+    return db.and_(
+        JournalEntry.feedback_status == 'pending',
+        db.or_(
+            JournalEntry.feedback_claimed_at < cutoff,
+            db.and_(JournalEntry.feedback_claimed_at.is_(None), JournalEntry.created_at < cutoff)
+        )
+    )
+
+
+def pending(claimed_before):
+    """
+    List entries still waiting for feedback that no process has taken on lately.
+
+    Args:
+        claimed_before (datetime): Only entries last claimed (or, if never, created) before this time
+
+    Returns:
+        list: (entry, user_id) pairs, oldest first
+    """
+    with _context():
+        rows = JournalEntry.query.filter(_unclaimed_since(claimed_before)).order_by(JournalEntry.created_at).all()
+        return [(row.to_entry(), row.user_id) for row in rows]
+
+
+def claim(entry_id, claimed_before):
+    """
+    Take on the pending feedback of an entry, unless another process has done so since the cutoff.
+
+    The check and the claim are one UPDATE, so of several processes claiming
+    the same entry exactly one succeeds.
+
+    Args:
+        entry_id (str): The ID of the entry
+        claimed_before (datetime): The cutoff given to pending()
+
+    Returns:
+        bool: Whether this process now owns the entry's feedback
+    """
+    with _context():
+        try:
+            claimed = JournalEntry.query.filter(
+                JournalEntry.entry_key == entry_id,
+                _unclaimed_since(claimed_before)
+            ).update({'feedback_claimed_at': datetime.datetime.now()}, synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return claimed == 1
+
+
+def page(user_id, limit=10, cursor=None):
+    """
+    List a user's journal entries, newest first, one page at a time.
+
+    Args:
+        user_id (int): The user whose entries to list
+        limit (int): Maximum number of entries on the page
+        cursor (str, optional): The next_cursor of the previous page
+
+    Returns:
+        tuple: (entries, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    with _context():
+        query = JournalEntry.query.filter(JournalEntry.user_id == user_id)
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            query = query.filter(db.or_(
+                JournalEntry.created_at < created_at,
+                db.and_(JournalEntry.created_at == created_at, JournalEntry.id < row_id)
+            ))
+        # One extra row tells whether there is a next page
+        rows = query.order_by(JournalEntry.created_at.desc(), JournalEntry.id.desc()).limit(limit + 1).all()
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return [row.to_entry() for row in rows[:limit]], next_cursor
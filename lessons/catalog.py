@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import atexit
+import sqlite3
+import datetime
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+# Use in-memory storage for Vercel deployment
+# Check if running on Vercel
+IS_VERCEL = os.environ.get('VERCEL') == '1'
+
+# SQLite file holding request counts and pre-generated lessons (shared by the web workers and the cron job)
+CATALOG_DB = os.getenv('LESSON_CATALOG_DB', os.path.join(os.path.dirname(__file__), 'catalog.db'))
+
+# Touched whenever a lesson is published; request counts change the database
+# file all the time, so its own mtime says nothing about the catalog
+CATALOG_STAMP = f"{CATALOG_DB}.published"
+
+# Request counts are buffered and written in batches to keep the request path cheap
+FLUSH_EVERY_REQUESTS = 50
+FLUSH_EVERY_SECONDS = 30
+
+# How often workers check whether the cron job has published new catalog lessons
+RELOAD_INTERVAL = 60
+
+_lock = threading.Lock()
+_pending_counts = Counter()
+_last_flush = time.monotonic()
+
+_catalog = {}
+_catalog_loaded_at = None
+_catalog_mtime = None
+
+
+def request_key(language, level, topic, task_based=True):
+    """
+    Normalize a lesson request into its catalog key.
+
+    Args:
+        language (str): The target language
+        level (str): The difficulty level
+        topic (str): The topic of the lesson
+        task_based (bool): Whether the lesson is task-based
+
+    Returns:
+        tuple: (language, level, topic, task_based)
+    """
+    return (
+        (language or '').strip().title(),
+        (level or '').strip().lower(),
+        ' '.join((topic or '').lower().split()),
+        1 if task_based else 0
+    )
+
+
+@contextmanager
+def _connect():
+    """Open the catalog database in a transaction, creating the tables on first use"""
+    conn = sqlite3.connect(CATALOG_DB, timeout=10)
+    try:
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lesson_requests (
+                    language TEXT NOT NULL,
+                    level TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    task_based INTEGER NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    last_requested TEXT,
+                    PRIMARY KEY (language, level, topic, task_based)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lesson_catalog (
+                    language TEXT NOT NULL,
+                    level TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    task_based INTEGER NOT NULL,
+                    lesson TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    PRIMARY KEY (language, level, topic, task_based)
+                )
+            """)
+            yield conn
+    finally:
+        conn.close()
+
+
+def record_request(language, level, topic, task_based=True):
+    """
+    Count a lesson request so the pre-generation job knows what is popular.
+
+    Args:
+        language (str): The target language
+        level (str): The difficulty level
+        topic (str): The topic of the lesson
+        task_based (bool): Whether the lesson is task-based
+    """
+    if IS_VERCEL:
+        return
+
+    with _lock:
+        _pending_counts[request_key(language, level, topic, task_based)] += 1
+        due = (
+            sum(_pending_counts.values()) >= FLUSH_EVERY_REQUESTS
+            or time.monotonic() - _last_flush >= FLUSH_EVERY_SECONDS
+        )
+
+    if due:
+        flush_requests()
+
+
+def flush_requests():
+    """Write buffered request counts to the catalog database"""
+    global _last_flush
+
+    with _lock:
+        counts = dict(_pending_counts)
+        _pending_counts.clear()
+        _last_flush = time.monotonic()
+
+    if not counts:
+        return
+
+    now = datetime.datetime.utcnow().isoformat()
+    try:
+        with _connect() as conn:
+            conn.executemany("""
+                INSERT INTO lesson_requests (language, level, topic, task_based, count, last_requested)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (language, level, topic, task_based)
+                DO UPDATE SET count = count + excluded.count, last_requested = excluded.last_requested
+            """, [key + (count, now) for key, count in counts.items()])
+    except sqlite3.Error as e:
+        print(f"Error recording lesson requests: {e}")
+
+
+atexit.register(flush_requests)
+
+
+def top_requests(limit=50, min_count=2):
+    """
+    Get the most frequently requested lesson combinations.
+
+    Args:
+        limit (int): Maximum number of combinations to return
+        min_count (int): Ignore combinations requested fewer times than this
+
+    Returns:
+        list: Dicts with language, level, topic, task_based and count
+    """
+    flush_requests()
+    with _connect() as conn:
+        rows = conn.execute("""
+            SELECT language, level, topic, task_based, count FROM lesson_requests
+            WHERE count >= ? ORDER BY count DESC LIMIT ?
+        """, (min_count, limit)).fetchall()
+
+    return [
+        {'language': row[0], 'level': row[1], 'topic': row[2], 'task_based': bool(row[3]), 'count': row[4]}
+        for row in rows
+    ]
+
+
+def _reload_catalog():
+    """Reload the catalog into memory when a lesson has been published since the last load"""
+    global _catalog, _catalog_loaded_at, _catalog_mtime
+
+    _catalog_loaded_at = time.monotonic()
+    if not os.path.exists(CATALOG_DB):
+        return
+    try:
+        mtime = os.stat(CATALOG_STAMP).st_mtime_ns
+    except OSError:
+        # Nothing published since the stamp was introduced; load what is there once
+        mtime = 0
+    if mtime == _catalog_mtime:
+        return
+
+    try:
+        with _connect() as conn:
+            rows = conn.execute("SELECT language, level, topic, task_based, lesson FROM lesson_catalog").fetchall()
+    except sqlite3.Error as e:
+        print(f"Error loading lesson catalog: {e}")
+        return
+
+    _catalog = {tuple(row[:4]): json.loads(row[4]) for row in rows}
+    _catalog_mtime = mtime
+
+
+def get_catalog_lesson(language, level, topic, task_based=True):
+    """
+    Get a pre-generated lesson for a request, if the catalog has one.
+
+    Args:
+        language (str): The target language
+        level (str): The difficulty level
+        topic (str): The topic of the lesson
+        task_based (bool): Whether the lesson is task-based
+
+    Returns:
+        dict: The lesson object or None if it has not been pre-generated
+    """
+    if IS_VERCEL:
+        return None
+
+    with _lock:
+        if _catalog_loaded_at is None or time.monotonic() - _catalog_loaded_at >= RELOAD_INTERVAL:
+            _reload_catalog()
+        return _catalog.get(request_key(language, level, topic, task_based))
+
+
+def store_catalog_lesson(lesson):
+    """
+    Publish a pre-generated lesson to the catalog.
+
+    Args:
+        lesson (dict): A lesson from generate_interactive_lesson
+    """
+    key = request_key(lesson['language'], lesson['level'], lesson['topic'], lesson.get('task_based', True))
+    with _connect() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO lesson_catalog (language, level, topic, task_based, lesson, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, key + (json.dumps(lesson, ensure_ascii=False), datetime.datetime.utcnow().isoformat()))
+    with open(CATALOG_STAMP, 'a'):
+        os.utime(CATALOG_STAMP)
+
+
+def catalog_ages():
+    """
+    Get the creation time of every catalog lesson.
+
+    Returns:
+        dict: Catalog key -> datetime the lesson was generated
+    """
+    with _connect() as conn:
+        rows = conn.execute("SELECT language, level, topic, task_based, created_at FROM lesson_catalog").fetchall()
+    return {tuple(row[:4]): datetime.datetime.fromisoformat(row[4]) for row in rows}
@@ -1,22 +1,52 @@
 import json
 import os
 import datetime
-import openai
+from ai_integration.llm_gateway import complete_text, stream_text
+from ai_integration.prompts import prompts
 from ai_integration.API_Integration import generate_lesson
+from lessons import store
+from ids import new_id
+from memory_store import MemoryStore
 
 # Use in-memory storage for Vercel deployment
 # Check if running on Vercel
 IS_VERCEL = os.environ.get('VERCEL') == '1'
 
-# In-memory storage for lessons when on Vercel
-LESSONS_MEMORY = []
+# Bounded in-memory storage for lessons when on Vercel
+LESSONS_MEMORY = MemoryStore()
 
-# Local directory for lessons when running locally
+# Directory where lessons used to be saved as JSON files; lessons.migrate imports them
 LESSONS_DIR = os.path.join(os.path.dirname(__file__), 'generated')
-if not IS_VERCEL:
-    os.makedirs(LESSONS_DIR, exist_ok=True)
 
-def generate_interactive_lesson(language='Spanish', level='beginner', topic='greetings', task_based=True):
+def _interactive_lesson_prompt(language, level, topic, task_based):
+    """Render the prompt for an interactive lesson"""
+    return prompts.render(
+        'interactive_lesson',
+        style="task-based, purpose-driven " if task_based else "",
+        level=level,
+        language=language,
+        topic=topic
+    )
+
+def _subject_lesson_prompt(language, level, subject, topic):
+    """Render the prompt for a subject-based immersion lesson"""
+    return prompts.render('subject_lesson', level=level, language=language, subject=subject, topic=topic)
+
+def save_lesson(lesson):
+    """
+    Persist a generated lesson.
+    
+    Args:
+        lesson (dict): The lesson object to store
+    """
+    if IS_VERCEL:
+        # Store in memory when on Vercel
+        LESSONS_MEMORY.put(lesson['id'], lesson)
+    else:
+        # Save the lesson to the lessons table when running locally
+        store.save(lesson)
+
+def generate_interactive_lesson(language='Spanish', level='beginner', topic='greetings', task_based=True, cache=True):
     """
     Generate an interactive, task-based language lesson.
     
@@ -25,38 +55,19 @@ def generate_interactive_lesson(language='Spanish', level='beginner', topic='gre
         level (str): The difficulty level (beginner, intermediate, advanced)
         topic (str): The topic of the lesson
         task_based (bool): Whether to make the lesson task-based
+        cache (bool): Whether a cached (or similar cached) answer may be used
         
     Returns:
         dict: The generated lesson
     """
     # Generate a unique ID for the lesson
-    lesson_id = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    lesson_id = new_id()
     
     # Create the prompt for the AI
-    task_str = "task-based, purpose-driven " if task_based else ""
-    prompt = f"""
-    Generate a {task_str}interactive language lesson for {level} level students learning {language} about {topic}.
-    
-    Include the following sections:
-    1. Lesson Objectives (what the student will learn)
-    2. Vocabulary (10-15 key words/phrases with translations)
-    3. Grammar Points (explain 1-2 relevant grammar concepts)
-    4. Interactive Dialogue (a realistic conversation using the vocabulary and grammar)
-    5. Practice Exercises (3-5 exercises to reinforce learning)
-    6. Cultural Notes (relevant cultural context)
-    7. Task Challenge (a real-world task the student should complete using what they learned)
-    
-    Format the response in a structured way with clear section headings.
-    """
+    prompt = _interactive_lesson_prompt(language, level, topic, task_based)
     
     try:
-        response = openai.Completion.create(
-            model="text-davinci-003",
-            prompt=prompt,
-            max_tokens=1000
-        )
-        
-        content = response.choices[0].text.strip()
+        content = complete_text(prompt.text, **prompt.options(**({} if cache else {'use_cache': False, 'semantic': None})))
         
         # Create the lesson object
         lesson = {
@@ -66,19 +77,11 @@ def generate_interactive_lesson(language='Spanish', level='beginner', topic='gre
             'topic': topic,
             'task_based': task_based,
             'content': content,
+            'prompt_template': prompt.template_id,
             'timestamp': datetime.datetime.now().isoformat()
         }
         
-        if IS_VERCEL:
-            # Store in memory when on Vercel
-            LESSONS_MEMORY.append(lesson)
-        else:
-            # Save the lesson to a file when running locally
-            filename = f"{lesson_id}.json"
-            filepath = os.path.join(LESSONS_DIR, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(lesson, f, ensure_ascii=False, indent=2)
+        save_lesson(lesson)
         
         return lesson
     
@@ -103,33 +106,13 @@ def generate_subject_based_lesson(language='Spanish', level='beginner', subject=
         dict: The generated lesson
     """
     # Generate a unique ID for the lesson
-    lesson_id = f"subject_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
+    lesson_id = new_id('subject_')
     
     # Create the prompt for the AI
-    prompt = f"""
-    Generate a subject-based immersion lesson for {level} level students learning {language}.
-    The lesson should teach {subject} (specifically about {topic}) while using {language} as the medium of instruction.
-    
-    Include the following sections:
-    1. Lesson Objectives (what the student will learn about {subject})
-    2. Key Terminology (10-15 subject-specific terms in {language} with translations)
-    3. Concept Explanation (explain the {topic} concepts in simple {language})
-    4. Examples (provide examples of the concepts with explanations)
-    5. Practice Problems (3-5 exercises related to {subject})
-    6. Language Focus (highlight key language structures used in this subject area)
-    7. Cultural Context (how this subject might be taught in countries where {language} is spoken)
-    
-    Format the response in a structured way with clear section headings.
-    """
+    prompt = _subject_lesson_prompt(language, level, subject, topic)
     
     try:
-        response = openai.Completion.create(
-            model="text-davinci-003",
-            prompt=prompt,
-            max_tokens=1000
-        )
-        
-        content = response.choices[0].text.strip()
+        content = complete_text(prompt.text, **prompt.options())
         
         # Create the lesson object
         lesson = {
@@ -139,19 +122,11 @@ def generate_subject_based_lesson(language='Spanish', level='beginner', subject=
             'subject': subject,
             'topic': topic,
             'content': content,
+            'prompt_template': prompt.template_id,
             'timestamp': datetime.datetime.now().isoformat()
         }
         
-        if IS_VERCEL:
-            # Store in memory when on Vercel
-            LESSONS_MEMORY.append(lesson)
-        else:
-            # Save the lesson to a file when running locally
-            filename = f"{lesson_id}.json"
-            filepath = os.path.join(LESSONS_DIR, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(lesson, f, ensure_ascii=False, indent=2)
+        save_lesson(lesson)
         
         return lesson
     
@@ -162,47 +137,109 @@ def generate_subject_based_lesson(language='Spanish', level='beginner', subject=
             'message': 'Failed to generate subject-based lesson'
         }
 
-def get_recent_lessons(limit=10):
+def _stream_lesson(lesson, prompt):
+    """
+    Stream a lesson's content from the model and persist it once complete.
+    
+    Args:
+        lesson (dict): The lesson object without its content
+        prompt (RenderedPrompt): The rendered prompt for the AI
+        
+    Yields:
+        tuple: (event, data) pairs - 'token' events carry text chunks, the final
+            'lesson' event carries the saved lesson, and 'error' replaces it on failure
+    """
+    chunks = []
+    try:
+        for chunk in stream_text(prompt.text, **prompt.options()):
+            chunks.append(chunk)
+            yield 'token', chunk
+        
+        lesson['content'] = ''.join(chunks).strip()
+        lesson['prompt_template'] = prompt.template_id
+        lesson['timestamp'] = datetime.datetime.now().isoformat()
+        
+        save_lesson(lesson)
+        
+        yield 'lesson', lesson
+    
+    except Exception as e:
+        print(f"Error streaming lesson: {e}")
+        yield 'error', {
+            'error': str(e),
+            'message': 'Failed to generate lesson'
+        }
+
+def stream_interactive_lesson(language='Spanish', level='beginner', topic='greetings', task_based=True):
+    """
+    Streaming variant of generate_interactive_lesson.
+    
+    Args:
+        language (str): The target language
+        level (str): The difficulty level (beginner, intermediate, advanced)
+        topic (str): The topic of the lesson
+        task_based (bool): Whether to make the lesson task-based
+        
+    Yields:
+        tuple: (event, data) pairs, see _stream_lesson
+    """
+    lesson = {
+        'id': new_id(),
+        'language': language,
+        'level': level,
+        'topic': topic,
+        'task_based': task_based
+    }
+    prompt = _interactive_lesson_prompt(language, level, topic, task_based)
+    return _stream_lesson(lesson, prompt)
+
+def stream_subject_based_lesson(language='Spanish', level='beginner', subject='mathematics', topic='basic arithmetic'):
+    """
+    Streaming variant of generate_subject_based_lesson.
+    
+    Args:
+        language (str): The target language
+        level (str): The difficulty level (beginner, intermediate, advanced)
+        subject (str): The academic subject (mathematics, history, science, etc.)
+        topic (str): The specific topic within the subject
+        
+    Yields:
+        tuple: (event, data) pairs, see _stream_lesson
+    """
+    lesson = {
+        'id': new_id('subject_'),
+        'language': language,
+        'level': level,
+        'subject': subject,
+        'topic': topic
+    }
+    prompt = _subject_lesson_prompt(language, level, subject, topic)
+    return _stream_lesson(lesson, prompt)
+
+def get_recent_lessons(limit=10, language=None, level=None, topic=None):
     """
     Get the most recent lessons.
     
     Args:
         limit (int): Maximum number of lessons to return
+        language (str, optional): Only lessons in this language
+        level (str, optional): Only lessons of this level
+        topic (str, optional): Only lessons on this topic
         
     Returns:
         list: List of lessons
     """
     if IS_VERCEL:
-        # Return from in-memory storage when on Vercel
-        # Sort by timestamp (newest first) and limit
-        sorted_lessons = sorted(
-            LESSONS_MEMORY, 
-            key=lambda x: x.get('timestamp', ''), 
-            reverse=True
+        # Return from in-memory storage when on Vercel, newest first
+        return LESSONS_MEMORY.recent(
+            limit,
+            match=lambda lesson: (not language or lesson.get('language') == language)
+            and (not level or lesson.get('level') == level)
+            and (not topic or lesson.get('topic') == topic)
         )
-        return sorted_lessons[:limit]
     else:
-        # Return from file system when running locally
-        lessons = []
-        
-        # Check if the directory exists
-        if not os.path.exists(LESSONS_DIR):
-            return lessons
-        
-        # Get all JSON files in the directory
-        files = [f for f in os.listdir(LESSONS_DIR) if f.endswith('.json')]
-        
-        # Sort files by name (which is based on timestamp)
-        files.sort(reverse=True)
-        
-        # Load the lessons
-        for filename in files[:limit]:
-            filepath = os.path.join(LESSONS_DIR, filename)
-            with open(filepath, 'r', encoding='utf-8') as f:
-                lesson = json.load(f)
-                lessons.append(lesson)
-        
-        return lessons
+        # Return from the lessons table when running locally
+        return store.recent(limit, language=language, level=level, topic=topic)
 
 def get_lesson_by_id(lesson_id):
     """
@@ -216,28 +253,16 @@ def get_lesson_by_id(lesson_id):
     """
     if IS_VERCEL:
         # Find in memory when on Vercel
-        for lesson in LESSONS_MEMORY:
-            if lesson.get('id') == lesson_id:
-                return lesson
-        return None
+        return LESSONS_MEMORY.get(lesson_id)
     else:
-        # Try to find in file system when running locally
-        if not os.path.exists(LESSONS_DIR):
-            return None
+        lesson = store.get(lesson_id)
+        if lesson is not None:
+            return lesson
         
-        # First try direct filename match
-        filepath = os.path.join(LESSONS_DIR, f"{lesson_id}.json")
+        # Lessons saved as files before the table existed, until lessons.migrate imports them
+        filepath = os.path.join(LESSONS_DIR, f"{os.path.basename(lesson_id)}.json")
         if os.path.exists(filepath):
             with open(filepath, 'r', encoding='utf-8') as f:
                 return json.load(f)
         
-        # If not found, search through all files
-        for filename in os.listdir(LESSONS_DIR):
-            if filename.endswith('.json'):
-                filepath = os.path.join(LESSONS_DIR, filename)
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    lesson = json.load(f)
-                    if lesson.get('id') == lesson_id:
-                        return lesson
-        
         return None
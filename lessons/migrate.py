@@ -0,0 +1,46 @@
+"""
+Import generated lessons saved as JSON files into the lessons table.
+
+Run from the project root once after upgrading; it is safe to run again, since
+lessons that are already stored are skipped:
+
+    python -m lessons.migrate --dir lessons/generated --batch-size 500
+"""
+import argparse
+
+from lessons import store
+from lessons.lesson_generator import LESSONS_DIR
+
+
+def migrate(directory=LESSONS_DIR, batch_size=store.IMPORT_BATCH_SIZE):
+    """
+    Bring the lessons table up to date and import the lesson files.
+
+    Args:
+        directory (str): Directory with one <id>.json file per lesson
+        batch_size (int): Lessons written per transaction
+
+    Returns:
+        dict: Columns added to the table, and counts of imported, existing and unreadable files
+    """
+    added = store.ensure_schema()
+    summary = store.import_files(directory, batch_size=batch_size)
+    summary['columns_added'] = added
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import generated lesson files into the lessons table")
+    parser.add_argument('--dir', default=LESSONS_DIR, help="directory with the lesson JSON files")
+    parser.add_argument('--batch-size', type=int, default=store.IMPORT_BATCH_SIZE, help="lessons written per transaction")
+    args = parser.parse_args()
+
+    # The app configures the database and registers itself with the lesson store
+    import app  # noqa: F401
+
+    summary = migrate(directory=args.dir, batch_size=args.batch_size)
+    print(f"Done: {summary}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Pre-generate lessons for the most requested (language, level, topic) combinations.
+
+Run from the project root, e.g. from cron every night:
+
+    python -m lessons.pregenerate --top 50 --workers 4 --max-age-days 7
+"""
+import argparse
+import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from lessons.catalog import top_requests, store_catalog_lesson, catalog_ages, request_key
+from lessons.lesson_generator import generate_interactive_lesson
+
+
+def pregenerate(top=50, workers=4, min_count=2, max_age_days=7, refresh=False):
+    """
+    Generate catalog lessons for the hottest lesson requests.
+
+    Args:
+        top (int): Number of most requested combinations to cover
+        workers (int): Number of lessons generated in parallel
+        min_count (int): Skip combinations requested fewer times than this
+        max_age_days (int): Regenerate catalog lessons older than this
+        refresh (bool): Regenerate every combination even if it is fresh
+
+    Returns:
+        dict: Counts of generated, skipped and failed lessons
+    """
+    requests = top_requests(limit=top, min_count=min_count)
+    ages = catalog_ages()
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=max_age_days)
+
+    # Only generate combinations that are missing or stale
+    todo = []
+    for req in requests:
+        created_at = ages.get(request_key(req['language'], req['level'], req['topic'], req['task_based']))
+        if refresh or created_at is None or created_at < cutoff:
+            todo.append(req)
+
+    summary = {'requested': len(requests), 'generated': 0, 'skipped': len(requests) - len(todo), 'failed': 0}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                generate_interactive_lesson,
+                language=req['language'],
+                level=req['level'],
+                topic=req['topic'],
+                task_based=req['task_based'],
+                # A refreshed catalog lesson must be newly generated, not the cached one it replaces
+                cache=False
+            ): req
+            for req in todo
+        }
+
+        for future in as_completed(futures):
+            req = futures[future]
+            lesson = future.result()
+            if 'error' in lesson:
+                summary['failed'] += 1
+                print(f"Failed: {req['language']}/{req['level']}/{req['topic']}: {lesson['error']}")
+                continue
+
+            store_catalog_lesson(lesson)
+            summary['generated'] += 1
+            print(f"Generated: {req['language']}/{req['level']}/{req['topic']} ({req['count']} requests)")
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate lessons for popular requests")
+    parser.add_argument('--top', type=int, default=50, help="number of most requested combinations to cover")
+    parser.add_argument('--workers', type=int, default=4, help="lessons generated in parallel")
+    parser.add_argument('--min-count', type=int, default=2, help="minimum number of requests for a combination")
+    parser.add_argument('--max-age-days', type=int, default=7, help="regenerate catalog lessons older than this")
+    parser.add_argument('--refresh', action='store_true', help="regenerate every combination")
+    args = parser.parse_args()
+
+    # The app configures the database and registers itself with the lesson store
+    import app  # noqa: F401
+
+    summary = pregenerate(
+        top=args.top,
+        workers=args.workers,
+        min_count=args.min_count,
+        max_age_days=args.max_age_days,
+        refresh=args.refresh
+    )
+    print(f"Done: {summary}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import os
+import re
+import json
+import datetime
+from contextlib import contextmanager
+from flask import has_app_context
+
+from models import db, Lesson, ensure_table
+
+# Generated lessons live in the `lessons` table: lookups by id use the unique
+# index on lesson_key and listings the created_at indexes, so neither slows
+# down as the archive grows
+
+# App used when the store is called outside an app context (worker threads, cron jobs)
+_app = None
+
+# Lessons imported per transaction by import_files
+IMPORT_BATCH_SIZE = 500
+
+
+def init_app(app):
+    """Register the app and bring the lessons table up to date"""
+    global _app
+    _app = app
+    with app.app_context():
+        try:
+            ensure_schema()
+        except Exception as e:
+            app.logger.error(f"Error preparing the lessons table: {e}")
+
+
+@contextmanager
+def _context():
+    """Run inside the current app context, or the registered app's"""
+    if has_app_context():
+        yield
+        return
+    if _app is None:
+        raise RuntimeError("The lesson store is not initialized; call lessons.store.init_app(app) first")
+    with _app.app_context():
+        yield
+
+
+def ensure_schema():
+    """
+    Create the lessons table and its indexes, adding columns that older databases lack.
+
+    Returns:
+        list: Names of the columns that were added
+    """
+    with _context():
+        return ensure_table(Lesson)
+
+
+def _title(lesson):
+    """Title for a generated lesson: its own, else the first line of its content"""
+    if lesson.get('title'):
+        return lesson['title'][:200]
+    for line in (lesson.get('content') or '').splitlines():
+        line = re.sub(r'^[#*\s]+|[#*\s]+$', '', line)
+        if line:
+            return line[:200]
+    return f"{lesson.get('topic') or 'Lesson'} ({lesson.get('language', '')})"[:200]
+
+
+def _created_at(lesson, default=None):
+    """Creation time of a generated lesson, from its timestamp"""
+    try:
+        return datetime.datetime.fromisoformat(lesson['timestamp'])
+    except (KeyError, TypeError, ValueError):
+        return default or datetime.datetime.now()
+
+
+def _fill(row, lesson, created_at=None):
+    """Copy a generated lesson into a table row"""
+    row.lesson_key = str(lesson['id'])
+    row.title = _title(lesson)
+    row.language = lesson.get('language') or 'Spanish'
+    row.level = lesson.get('level') or 'beginner'
+    row.topic = (lesson.get('topic') or lesson.get('subject') or 'general')[:100]
+    row.content = lesson.get('content') or ''
+    row.created_at = _created_at(lesson, created_at)
+    row.data = {key: value for key, value in lesson.items() if key != 'content'}
+    return row
+
+
+def save(lesson):
+    """
+    Store a generated lesson, replacing any lesson with the same id.
+
+    Args:
+        lesson (dict): The lesson object from the generator
+    """
+    with _context():
+        try:
+            row = Lesson.query.filter_by(lesson_key=str(lesson['id'])).first() or Lesson()
+            db.session.add(_fill(row, lesson))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def get(lesson_id):
+    """
+    Look up a generated lesson by its id.
+
+    Returns:
+        dict: The lesson, or None if there is none with this id
+    """
+    with _context():
+        row = Lesson.query.filter_by(lesson_key=str(lesson_id)).first()
+        return row.to_generated_lesson() if row else None
+
+
+def recent(limit=10, language=None, level=None, topic=None):
+    """
+    List the newest generated lessons.
+
+    Args:
+        limit (int): Maximum number of lessons to return
+        language (str, optional): Only lessons in this language
+        level (str, optional): Only lessons of this level (requires language)
+        topic (str, optional): Only lessons on this topic (requires language and level)
+
+    Returns:
+        list: Lessons, newest first
+    """
+    with _context():
+        query = Lesson.query.filter(Lesson.lesson_key.isnot(None))
+        for column, value in ((Lesson.language, language), (Lesson.level, level), (Lesson.topic, topic)):
+            if value:
+                query = query.filter(column == value)
+        rows = query.order_by(Lesson.created_at.desc(), Lesson.id.desc()).limit(limit).all()
+        return [row.to_generated_lesson() for row in rows]
+
+
+def import_files(directory, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import lessons saved as JSON files, skipping ids that are already stored.
+
+    Args:
+        directory (str): Directory with one <id>.json file per lesson
+        batch_size (int): Lessons written per transaction
+
+    Returns:
+        dict: Counts of imported, existing and unreadable files
+    """
+    summary = {'imported': 0, 'existing': 0, 'failed': 0}
+    if not os.path.isdir(directory):
+        return summary
+
+    def flush(batch):
+        keys = [str(lesson['id']) for lesson, _ in batch]
+        stored = {key for (key,) in db.session.query(Lesson.lesson_key).filter(Lesson.lesson_key.in_(keys))}
+        new = {}
+        for lesson, mtime in batch:
+            key = str(lesson['id'])
+            if key in stored or key in new:
+                summary['existing'] += 1
+            else:
+                new[key] = _fill(Lesson(), lesson, created_at=mtime)
+        db.session.add_all(new.values())
+        db.session.commit()
+        summary['imported'] += len(new)
+
+    with _context():
+        batch = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    with open(entry.path, 'r', encoding='utf-8') as f:
+                        lesson = json.load(f)
+                    lesson.setdefault('id', entry.name[:-len('.json')])
+                except (OSError, ValueError, AttributeError) as e:
+                    print(f"Skipping {entry.name}: {e}")
+                    summary['failed'] += 1
+                    continue
+
+                batch.append((lesson, datetime.datetime.fromtimestamp(entry.stat().st_mtime)))
+                if len(batch) >= batch_size:
+                    flush(batch)
+                    batch = []
+        if batch:
+            flush(batch)
+    return summary
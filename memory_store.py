@@ -0,0 +1,170 @@
+import os
+import bisect
+import itertools
+import threading
+from collections import OrderedDict
+from codec import dumps
+
+# Memory each store may use for its items before the least recently used are dropped
+MAX_BYTES = int(os.getenv('MEMORY_STORE_MAX_BYTES', 32 * 1024 * 1024))
+
+
+class _Listing:
+    """Ids in the order they were first stored, by sequence number, so a listing can start anywhere"""
+
+    def __init__(self):
+        self.sequences = []
+        self.keys = []
+
+    def append(self, sequence, key):
+        self.sequences.append(sequence)
+        self.keys.append(key)
+
+    def remove(self, sequence):
+        i = bisect.bisect_left(self.sequences, sequence)
+        del self.sequences[i]
+        del self.keys[i]
+
+    def newest_first(self, before=None):
+        """Ids from newest to oldest, starting just before the given sequence number"""
+        end = len(self.keys) if before is None else bisect.bisect_left(self.sequences, before)
+        for i in range(end - 1, -1, -1):
+            yield self.keys[i]
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class MemoryStore:
+    """
+    Bounded in-memory store of JSON documents by id, for deployments without a disk.
+
+    Lookups by id are O(1). Items are also kept in the order they were first
+    stored, overall and per group (e.g. per user), so "newest first" listings
+    stop as soon as they have enough and a page can start right after the
+    last item of the previous one. Each item is charged the size of its
+    JSON; once the total passes max_bytes, the least recently used items are
+    dropped.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # id -> (item, size, group, sequence), least recently used first
+        self._items = OrderedDict()
+        # ids in the order they were first stored, overall and per group
+        self._sequence = itertools.count()
+        self._created = _Listing()
+        self._groups = {}
+        self.bytes = 0
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def put(self, key, value, group=None):
+        """
+        Store an item, replacing any earlier item with the same id.
+
+        A replaced item keeps its place in the listings and its group.
+
+        Args:
+            key (str): The item id
+            value (dict): The item; must be JSON serializable
+            group (optional): The group the item belongs to, such as its owner
+        """
+        size = len(dumps(value))
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous:
+                self.bytes -= previous[1]
+                group = previous[2] if group is None else group
+                sequence = previous[3]
+            else:
+                sequence = next(self._sequence)
+                self._created.append(sequence, key)
+                self._groups.setdefault(group, _Listing()).append(sequence, key)
+            self._items[key] = (value, size, group, sequence)
+            self.bytes += size
+
+            while self.bytes > self.max_bytes and len(self._items) > 1:
+                self._evict()
+
+    def _evict(self):
+        _, (_, size, group, sequence) = self._items.popitem(last=False)
+        self.bytes -= size
+        self._created.remove(sequence)
+        members = self._groups[group]
+        members.remove(sequence)
+        if not members:
+            del self._groups[group]
+        self.counters['evictions'] += 1
+
+    def get(self, key):
+        """
+        Fetch an item.
+
+        Args:
+            key (str): The item id
+
+        Returns:
+            dict: The item, or None if there is none with this id (or it was dropped)
+        """
+        with self._lock:
+            stored = self._items.get(key)
+            if stored is None:
+                self.counters['misses'] += 1
+                return None
+            self._items.move_to_end(key)
+            self.counters['hits'] += 1
+            return stored[0]
+
+    def group(self, key):
+        """The group an item was stored with, or None"""
+        with self._lock:
+            stored = self._items.get(key)
+            return stored[2] if stored else None
+
+    def recent(self, limit, group=None, match=None, before=None):
+        """
+        List the newest items.
+
+        Args:
+            limit (int): Maximum number of items to return
+            group (optional): Only items of this group
+            match (callable, optional): Only items for which this returns true
+            before (str, optional): Only items first stored before the item with this id
+
+        Returns:
+            list: Items, newest first
+
+        Raises:
+            KeyError: If there is no item with the id given as before (or it was dropped)
+        """
+        items = []
+        with self._lock:
+            listing = self._created if group is None else self._groups.get(group, _Listing())
+            start = None
+            if before is not None:
+                if before not in self._items:
+                    raise KeyError(before)
+                start = self._items[before][3]
+            for key in listing.newest_first(start):
+                if len(items) >= limit:
+                    break
+                value = self._items[key][0]
+                if match is None or match(value):
+                    items.append(value)
+        return items
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self):
+        """
+        Get the store's size and counters.
+
+        Returns:
+            dict: Items, bytes used and the limit, plus hit, miss and eviction counts
+        """
+        return dict(self.counters, items=len(self._items), bytes=self.bytes, max_bytes=self.max_bytes)
@@ -1,12 +1,16 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+import os
 import datetime
 import json
 from sqlalchemy.ext.mutable import MutableDict, MutableList
 
 db = SQLAlchemy()
 
+# Users with these email addresses (comma-separated) can use the admin pages and APIs
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv('ADMIN_EMAILS', '').split(',') if email.strip()}
+
 class User(UserMixin, db.Model):
     """User model for authentication and profile information"""
     __tablename__ = 'users'
@@ -52,6 +56,11 @@ class User(UserMixin, db.Model):
         """Check password against hash"""
         return check_password_hash(self.password_hash, password)
     
+    @property
+    def is_admin(self):
+        """Check if the user is an administrator (listed in ADMIN_EMAILS)"""
+        return bool(self.email) and self.email.lower() in ADMIN_EMAILS
+    
     def is_premium(self):
         """Check if user has an active premium subscription"""
         if self.subscription_tier != 'premium':
@@ -152,14 +161,24 @@ class SavedWord(db.Model):
 class JournalEntry(db.Model):
     """Model for user journal entries"""
     __tablename__ = 'journal_entries'
+    __table_args__ = (
+        # A user's entries, newest first (keyset pagination on created_at, id)
+        db.Index('ix_journal_entries_user_id_created_at', 'user_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
+    # Id of the entry as used by the API
+    entry_key = db.Column(db.String(64), unique=True, index=True, nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     language = db.Column(db.String(50), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     updated_at = db.Column(db.DateTime, onupdate=datetime.datetime.utcnow)
     ai_feedback = db.Column(db.Text, nullable=True)
+    feedback_status = db.Column(db.String(20), nullable=True)  # pending, ready, failed
+    # When a process last took on the pending feedback, so only one process works on it
+    feedback_claimed_at = db.Column(db.DateTime, nullable=True)
+    precheck = db.Column(db.JSON, nullable=True)
     
     def to_dict(self):
         """Convert journal entry to dictionary for API responses"""
@@ -171,12 +190,31 @@ class JournalEntry(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'ai_feedback': self.ai_feedback
         }
+    
+    def to_entry(self):
+        """Convert to the journal entry dictionary returned by the journal API"""
+        return {
+            'id': self.entry_key or str(self.id),
+            'content': self.content,
+            'language': self.language,
+            'timestamp': self.created_at.isoformat() if self.created_at else None,
+            'feedback': json.loads(self.ai_feedback) if self.ai_feedback else None,
+            'feedback_status': self.feedback_status,
+            'precheck': self.precheck
+        }
 
 class Lesson(db.Model):
     """Model for language lessons"""
     __tablename__ = 'lessons'
+    __table_args__ = (
+        # Recent lessons, overall and for one language, level and topic
+        db.Index('ix_lessons_created_at', 'created_at'),
+        db.Index('ix_lessons_language_level_topic_created_at', 'language', 'level', 'topic', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
+    # Id of a generated lesson as used by the API (e.g. "20250520100000" or "subject_20250520100000")
+    lesson_key = db.Column(db.String(64), unique=True, index=True, nullable=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
     language = db.Column(db.String(50), nullable=False)
@@ -185,6 +223,8 @@ class Lesson(db.Model):
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     is_premium = db.Column(db.Boolean, default=False)
+    # The generated lesson as returned by the generator, without its content
+    data = db.Column(db.JSON, nullable=True)
     
     # Relationships
     progress = db.relationship('LessonProgress', backref='lesson', lazy=True)
@@ -202,6 +242,12 @@ class Lesson(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'is_premium': self.is_premium
         }
+    
+    def to_generated_lesson(self):
+        """Convert a stored generated lesson back to the dictionary the lesson generator returned"""
+        lesson = dict(self.data or {})
+        lesson['content'] = self.content
+        return lesson
 
 class LessonProgress(db.Model):
     """Model for tracking user progress through lessons"""
@@ -347,3 +393,33 @@ class ContentProgress(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None
         }
+
+
+def ensure_table(model):
+    """
+    Create a model's table and indexes, adding the columns that older databases lack.
+    
+    db.create_all() only creates missing tables, so columns and indexes added
+    to an existing model are brought in here. Needs an app context.
+    
+    Args:
+        model: The model class
+        
+    Returns:
+        list: Names of the columns that were added
+    """
+    table = model.__table__
+    table.create(db.engine, checkfirst=True)
+    
+    existing = {column['name'] for column in db.inspect(db.engine).get_columns(table.name)}
+    added = []
+    with db.engine.begin() as conn:
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                conn.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                added.append(column.name)
+    
+    for index in table.indexes:
+        index.create(db.engine, checkfirst=True)
+    return added
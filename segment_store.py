@@ -0,0 +1,555 @@
+"""
+Append-only segment store for generated artifacts.
+
+Items are JSON documents kept by id in a few large segment files instead of
+one small file each, compressed with a dictionary trained on the store's own
+items. Run from the project root:
+
+    python segment_store.py import immersion/content/segments immersion/content
+    python segment_store.py train immersion/content/segments
+    python segment_store.py compact immersion/content/segments
+    python segment_store.py bench immersion/content/segments
+"""
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import random
+import struct
+import threading
+from codec import Codec, dumps, train_dictionary
+
+# File locks are only available on POSIX systems; elsewhere writers are serialized per process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# A new segment is started once the current one reaches this size
+SEGMENT_BYTES = int(os.getenv('SEGMENT_STORE_SEGMENT_BYTES', 64 * 1024 * 1024))
+
+# Compress stored items; set to 0 to store plain JSON
+COMPRESS = os.getenv('SEGMENT_STORE_COMPRESS', '1') == '1'
+# Number of stored items a compression dictionary is trained on
+TRAINING_SAMPLES = int(os.getenv('SEGMENT_STORE_TRAINING_SAMPLES', 2000))
+
+# Record header: value length, CRC-32 of key and value, key length, flags
+_HEADER = struct.Struct('>IIHB')
+_PUT = 0
+_DELETE = 1
+# Flag bit: the value is compressed
+_ZLIB = 2
+
+_SEGMENT_NAME = re.compile(r'^segment-(\d{6})\.log$')
+_DICTIONARY_NAME = re.compile(r'^dictionary-(\d{6})\.bin$')
+
+
+class SegmentStore:
+    """
+    Key-value store of JSON documents in append-only segment files.
+
+    Every put appends a length-prefixed record to the newest segment, and an
+    in-memory index maps each id to the offset of its latest record, so a get
+    is a single positional read. The index is rebuilt from the segments when
+    the store is opened, and follows records appended by other processes.
+    Superseded records are dropped by compact().
+    """
+
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES, compress=COMPRESS):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.compress = compress
+        os.makedirs(directory, exist_ok=True)
+        self.codec = Codec()
+        self._load_dictionaries()
+        self._lock = threading.RLock()
+        self._index = {}
+        self._deleted = {}
+        self._scanned = {}
+        self._readers = {}
+        self._writer = None
+        self.counters = {'puts': 0, 'gets': 0, 'misses': 0, 'reloads': 0, 'corrupt': 0, 'compactions': 0}
+        self._load()
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"segment-{segment:06d}.log")
+
+    def _segments(self):
+        return sorted(
+            int(match.group(1))
+            for match in map(_SEGMENT_NAME.match, os.listdir(self.directory))
+            if match
+        )
+
+    def _dictionaries(self):
+        return sorted(
+            int(match.group(1))
+            for match in map(_DICTIONARY_NAME.match, os.listdir(self.directory))
+            if match
+        )
+
+    def _load_dictionaries(self):
+        """Load the compression dictionaries; the newest compresses new items"""
+        for number in self._dictionaries():
+            with open(os.path.join(self.directory, f"dictionary-{number:06d}.bin"), 'rb') as f:
+                self.codec.add_dictionary(f.read())
+
+    def _close_files(self):
+        for fd in self._readers.values():
+            os.close(fd)
+        self._readers = {}
+        if self._writer:
+            os.close(self._writer[1])
+            self._writer = None
+
+    def _load(self):
+        """Rebuild the index from every segment"""
+        with self._lock:
+            self._close_files()
+            self._index = {}
+            self._deleted = {}
+            self._scanned = {}
+            for segment in self._segments():
+                self._scan(segment)
+            self._forget_dead_deletions()
+
+    def _forget_dead_deletions(self):
+        """
+        Forget the deletions recorded in the oldest segment.
+
+        Nothing older remains for them to hide, so compaction can drop them
+        and they need not be kept in memory.
+        """
+        if self._scanned:
+            oldest = min(self._scanned)
+            self._deleted = {key: location for key, location in self._deleted.items() if location[0] != oldest}
+
+    def _scan(self, segment, start=0):
+        """Index the records of a segment from an offset, stopping at an incomplete tail"""
+        try:
+            with open(self._path(segment), 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                offset = start
+                f.seek(offset)
+                while offset + _HEADER.size <= size:
+                    value_length, _, key_length, flags = _HEADER.unpack(f.read(_HEADER.size))
+                    length = _HEADER.size + key_length + value_length
+                    if offset + length > size:
+                        # A write in progress (or cut short by a crash)
+                        break
+                    key = f.read(key_length).decode('utf-8')
+                    f.seek(value_length, os.SEEK_CUR)
+                    self._track(key, flags, (segment, offset, length))
+                    offset += length
+        except FileNotFoundError:
+            return
+        self._scanned[segment] = offset
+
+    def _track(self, key, flags, location):
+        """Point the index at a key's latest record"""
+        if flags & _DELETE:
+            self._index.pop(key, None)
+            self._deleted[key] = location
+        else:
+            self._index[key] = location
+            self._deleted.pop(key, None)
+
+    def _refresh(self):
+        """Index records appended since the last scan, including new segments started by other processes"""
+        with self._lock:
+            segment = max(self._scanned) if self._scanned else 0
+            while True:
+                path = self._path(segment)
+                if segment and os.path.exists(path) and (
+                    segment not in self._scanned or os.path.getsize(path) > self._scanned[segment]
+                ):
+                    self._scan(segment, self._scanned.get(segment, 0))
+                if not os.path.exists(self._path(segment + 1)):
+                    break
+                segment += 1
+
+    def _reader(self, segment):
+        fd = self._readers.get(segment)
+        if fd is None:
+            fd = self._readers[segment] = os.open(self._path(segment), os.O_RDONLY)
+        return fd
+
+    def _read(self, key, location):
+        """Read and check the record at a location; None if it is not the key's record"""
+        segment, offset, length = location
+        try:
+            # Under the lock, so the descriptor cannot be closed by a reload or compaction mid-read
+            with self._lock:
+                record = os.pread(self._reader(segment), length, offset)
+        except FileNotFoundError:
+            return None
+        if len(record) != length:
+            return None
+        value_length, crc, key_length, flags = _HEADER.unpack_from(record)
+        body = record[_HEADER.size:]
+        if flags & _DELETE or body[:key_length] != key.encode('utf-8') or zlib.crc32(body) != crc:
+            return None
+        return json.loads(self._decode(body[key_length:], flags))
+
+    def _decode(self, data, flags):
+        """The JSON of a stored value"""
+        if not flags & _ZLIB:
+            return data
+        try:
+            return self.codec.decompress(data)
+        except KeyError:
+            # Compressed with a dictionary another process has trained since we loaded ours
+            self._load_dictionaries()
+            return self.codec.decompress(data)
+
+    def _encode(self, data):
+        """Compress a value's JSON when that makes it smaller; returns (value, flags)"""
+        if self.compress:
+            compressed = self.codec.compress(data)
+            if len(compressed) < len(data):
+                return compressed, _PUT | _ZLIB
+        return data, _PUT
+
+    def get(self, key):
+        """
+        Fetch an item.
+
+        Args:
+            key (str): The item id
+
+        Returns:
+            dict: The item, or None if there is none with this id
+        """
+        self.counters['gets'] += 1
+        location = self._index.get(key)
+        if location is None:
+            self._refresh()
+            location = self._index.get(key)
+            if location is None:
+                self.counters['misses'] += 1
+                return None
+
+        value = self._read(key, location)
+        if value is None:
+            if not self._replaced(location[0]):
+                # The record itself is damaged; reloading would not help
+                self.counters['corrupt'] += 1
+                print(f"Damaged record for {key} in {self._path(location[0])}")
+                return None
+            # The segment was compacted by another process; offsets have moved
+            self.counters['reloads'] += 1
+            self._load()
+            location = self._index.get(key)
+            value = self._read(key, location) if location else None
+        return value
+
+    def _replaced(self, segment):
+        """Whether a segment file was replaced or removed since this store opened it"""
+        with self._lock:
+            try:
+                current = os.stat(self._path(segment)).st_ino
+            except FileNotFoundError:
+                return True
+            fd = self._readers.get(segment)
+            return fd is None or os.fstat(fd).st_ino != current
+
+    def __contains__(self, key):
+        if key not in self._index:
+            self._refresh()
+        return key in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def keys(self):
+        """Ids of all items, in no particular order"""
+        self._refresh()
+        return list(self._index)
+
+    def put(self, key, value):
+        """
+        Store an item, replacing any earlier item with the same id.
+
+        Args:
+            key (str): The item id
+            value (dict): The item; must be JSON serializable
+        """
+        self.put_many([(key, value)])
+
+    def put_many(self, items, sync=False):
+        """
+        Store several items with a single write.
+
+        Args:
+            items (list): (id, item) pairs
+            sync (bool): Flush the segment to disk before returning
+        """
+        records = [(key,) + self._encode(dumps(value)) for key, value in items]
+        self._append(records, sync)
+        self.counters['puts'] += len(records)
+
+    def delete(self, key):
+        """Remove an item"""
+        self._append([(key, b'', _DELETE)])
+
+    def _locked(self):
+        """Lock the store against writers in other processes"""
+        lock_file = open(os.path.join(self.directory, 'LOCK'), 'a')
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    @staticmethod
+    def _record(key, data, flags):
+        encoded_key = key.encode('utf-8')
+        body = encoded_key + data
+        return _HEADER.pack(len(data), zlib.crc32(body), len(encoded_key), flags) + body
+
+    def _append(self, records, sync=False):
+        encoded = [(key, flags, self._record(key, data, flags)) for key, data, flags in records]
+        batch_length = sum(len(record) for _, _, record in encoded)
+
+        with self._lock:
+            lock_file = self._locked()
+            try:
+                self._refresh()
+                segment = max(self._scanned) if self._scanned else 1
+                size = self._scanned.get(segment, 0)
+                if size and size + batch_length > self.segment_bytes:
+                    segment += 1
+                    size = 0
+                path = self._path(segment)
+                if size and os.path.getsize(path) > size:
+                    # With the lock held nobody is writing, so bytes past the last
+                    # complete record are a torn write; cut them before appending
+                    os.truncate(path, size)
+                if not self._writer or self._writer[0] != segment:
+                    if self._writer:
+                        os.close(self._writer[1])
+                    self._writer = (segment, os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644))
+
+                os.write(self._writer[1], b''.join(record for _, _, record in encoded))
+                if sync:
+                    os.fsync(self._writer[1])
+                for key, flags, record in encoded:
+                    self._track(key, flags, (segment, size, len(record)))
+                    size += len(record)
+                self._scanned[segment] = size
+            finally:
+                lock_file.close()
+
+    def _reencode(self, record):
+        """Rewrite a record with the current compression dictionary"""
+        value_length, _, key_length, flags = _HEADER.unpack_from(record)
+        if flags & _DELETE:
+            return record
+        key = record[_HEADER.size:_HEADER.size + key_length]
+        data, flags = self._encode(self._decode(record[_HEADER.size + key_length:], flags))
+        return self._record(key.decode('utf-8'), data, flags)
+
+    def seal(self):
+        """Start a new segment, so that everything written so far can be compacted"""
+        with self._lock:
+            lock_file = self._locked()
+            try:
+                self._refresh()
+                segment = max(self._scanned) if self._scanned else 0
+                if self._scanned.get(segment):
+                    open(self._path(segment + 1), 'ab').close()
+                    self._refresh()
+            finally:
+                lock_file.close()
+
+    def compact(self, reencode=False):
+        """
+        Rewrite the sealed segments (all but the newest) keeping only the latest record of each id.
+
+        The merged records replace the newest sealed segment, so they still
+        sort before records appended since, and the older segments are removed.
+
+        Args:
+            reencode (bool): Also compress the records again with the current dictionary
+
+        Returns:
+            dict: Number of segments merged and bytes before and after
+        """
+        with self._lock:
+            lock_file = self._locked()
+            try:
+                self._load()
+                segments = self._segments()
+                sealed = segments[:-1]
+                if not sealed:
+                    return {'segments': 0, 'bytes_before': 0, 'bytes_after': 0}
+
+                before = sum(os.path.getsize(self._path(segment)) for segment in sealed)
+                target = sealed[-1]
+                tmp_path = self._path(target) + '.tmp'
+                # Deletions are kept too, so an item never comes back if a crash
+                # leaves the older segments in place
+                live = sorted(
+                    location
+                    for location in list(self._index.values()) + list(self._deleted.values())
+                    if location[0] in sealed
+                )
+                with open(tmp_path, 'wb') as out:
+                    for segment, offset, length in live:
+                        record = os.pread(self._reader(segment), length, offset)
+                        out.write(self._reencode(record) if reencode else record)
+                    out.flush()
+                    os.fsync(out.fileno())
+                    after = out.tell()
+
+                self._close_files()
+                os.replace(tmp_path, self._path(target))
+                for segment in sealed[:-1]:
+                    os.remove(self._path(segment))
+                self._load()
+                self.counters['compactions'] += 1
+                return {'segments': len(sealed), 'bytes_before': before, 'bytes_after': after}
+            finally:
+                lock_file.close()
+
+    def train(self, samples=TRAINING_SAMPLES):
+        """
+        Train a compression dictionary on stored items and recompress everything with it.
+
+        Args:
+            samples (int): Maximum number of items to train on
+
+        Returns:
+            dict: Dictionary size and the compaction summary
+        """
+        keys = self.keys()
+        chosen = random.sample(keys, min(samples, len(keys)))
+        dictionary = train_dictionary([dumps(self.get(key)) for key in chosen])
+        if not dictionary:
+            return {'dictionary_bytes': 0}
+
+        with self._lock:
+            lock_file = self._locked()
+            try:
+                numbers = self._dictionaries()
+                path = os.path.join(self.directory, f"dictionary-{(numbers[-1] if numbers else 0) + 1:06d}.bin")
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(dictionary)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(path + '.tmp', path)
+                self.codec.add_dictionary(dictionary)
+            finally:
+                lock_file.close()
+
+        self.seal()
+        return {'dictionary_bytes': len(dictionary), 'compaction': self.compact(reencode=True)}
+
+    def import_directory(self, directory):
+        """
+        Import items saved as one JSON file each, skipping ids that are already stored.
+
+        Args:
+            directory (str): Directory with one <id>.json file per item
+
+        Returns:
+            dict: Counts of imported, existing and unreadable files
+        """
+        summary = {'imported': 0, 'existing': 0, 'failed': 0}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json') or not entry.is_file():
+                    continue
+                key = entry.name[:-len('.json')]
+                if key in self:
+                    summary['existing'] += 1
+                    continue
+                try:
+                    with open(entry.path, 'r', encoding='utf-8') as f:
+                        self.put(key, json.load(f))
+                    summary['imported'] += 1
+                except (OSError, ValueError) as e:
+                    print(f"Skipping {entry.name}: {e}")
+                    summary['failed'] += 1
+        return summary
+
+    def stats(self):
+        """
+        Get the store's size and counters.
+
+        Returns:
+            dict: Items, segments and bytes on disk, plus operation counters
+        """
+        segments = self._segments()
+        return dict(
+            self.counters,
+            items=len(self._index),
+            segments=len(segments),
+            dictionaries=len(self._dictionaries()),
+            bytes=sum(os.path.getsize(self._path(segment)) for segment in segments)
+        )
+
+
+def benchmark(store, limit=TRAINING_SAMPLES):
+    """
+    Compare the size and speed of storage encodings on a store's items.
+
+    Args:
+        store (SegmentStore): The store to sample
+        limit (int): Maximum number of items to measure
+
+    Returns:
+        dict: Bytes per encoding, compression and decompression MB/s, and get() calls per second
+    """
+    keys = store.keys()[:limit]
+    values = [store.get(key) for key in keys]
+    compact = [dumps(value) for value in values]
+    raw_bytes = sum(len(data) for data in compact)
+
+    results = {
+        'items': len(values),
+        'indented_json_bytes': sum(len(json.dumps(value, ensure_ascii=False, indent=2).encode('utf-8')) for value in values),
+        'compact_json_bytes': raw_bytes,
+        'zlib_bytes': sum(len(zlib.compress(data, store.codec.level)) for data in compact)
+    }
+
+    start = time.perf_counter()
+    compressed = [store.codec.compress(data) for data in compact]
+    compress_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for data in compressed:
+        store.codec.decompress(data)
+    decompress_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for key in keys:
+        store.get(key)
+    get_seconds = time.perf_counter() - start
+
+    results.update({
+        'dictionary_bytes': len(store.codec.dictionary),
+        'zlib_dictionary_bytes': sum(len(data) for data in compressed),
+        'compress_mb_per_second': raw_bytes / compress_seconds / 1e6 if compress_seconds else None,
+        'decompress_mb_per_second': raw_bytes / decompress_seconds / 1e6 if decompress_seconds else None,
+        'gets_per_second': len(keys) / get_seconds if get_seconds else None
+    })
+    return results
+
+
+def main(argv):
+    if len(argv) == 3 and argv[0] == 'import':
+        print(f"Done: {SegmentStore(argv[1]).import_directory(argv[2])}")
+    elif len(argv) == 2 and argv[0] == 'train':
+        print(f"Done: {SegmentStore(argv[1]).train()}")
+    elif len(argv) == 2 and argv[0] == 'compact':
+        print(f"Done: {SegmentStore(argv[1]).compact()}")
+    elif len(argv) == 2 and argv[0] == 'bench':
+        for name, value in benchmark(SegmentStore(argv[1])).items():
+            print(f"{name:>26}: {value:,.1f}" if isinstance(value, float) else f"{name:>26}: {value}")
+    else:
+        print("Usage: segment_store.py import <store dir> <json dir> | train <store dir> | compact <store dir> | bench <store dir>")
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,264 @@
+import os
+import math
+import time
+import sqlite3
+import threading
+import functools
+from collections import namedtuple
+from flask import jsonify, make_response, request
+from flask_login import current_user
+
+from subscriptions.stripe_integration import DEFAULT_PLANS
+
+# Use in-memory buckets only for Vercel deployment (read-only file system)
+# Check if running on Vercel
+IS_VERCEL = os.environ.get('VERCEL') == '1'
+
+# Limiter settings (can be tuned per deployment through the environment)
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') == '1'
+# 'memory' keeps buckets per process; 'sqlite' shares them between the workers on a host
+RATE_LIMIT_STORE = os.getenv('RATE_LIMIT_STORE', 'memory')
+RATE_LIMIT_DB = os.getenv('RATE_LIMIT_DB', os.path.join(os.path.dirname(__file__), 'rate_limits.db'))
+
+# Plan used for users without an active subscription
+DEFAULT_PLAN = 'free'
+
+# Full buckets are dropped every this many requests, since a missing bucket counts as full
+PRUNE_EVERY = 1000
+
+Decision = namedtuple('Decision', ['allowed', 'limit', 'remaining', 'retry_after'])
+
+
+def plan_limits(plan_name):
+    """
+    Get the AI rate limits of a plan.
+
+    Args:
+        plan_name (str): Name of a plan in DEFAULT_PLANS
+
+    Returns:
+        dict: Endpoint class -> {'per_hour', 'burst'}; per_hour -1 means unlimited
+    """
+    plans = {plan['name']: plan for plan in DEFAULT_PLANS}
+    plan = plans.get(plan_name) or plans[DEFAULT_PLAN]
+    return plan['features'].get('ai_rate_limits', {})
+
+
+def _refill(tokens, updated, now, rate, capacity):
+    """Tokens in a bucket after refilling at rate tokens per second since updated"""
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+def _decide(tokens, rate, capacity, cost):
+    """
+    Take cost tokens from a bucket if it has them.
+
+    Returns:
+        tuple: (Decision, tokens left in the bucket)
+    """
+    if tokens >= cost:
+        tokens -= cost
+        return Decision(True, capacity, int(tokens), 0), tokens
+    retry_after = math.ceil((cost - tokens) / rate) if rate > 0 else 3600
+    return Decision(False, capacity, int(tokens), max(1, retry_after)), tokens
+
+
+class MemoryBucketStore:
+    """Token buckets kept in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._takes = 0
+
+    def take(self, key, rate, capacity, cost, now):
+        """
+        Take tokens from a bucket, creating it full on first use.
+
+        Args:
+            key (str): Identifies the bucket
+            rate (float): Refill rate in tokens per second
+            capacity (float): Bucket size (the allowed burst)
+            cost (float): Tokens the request needs
+            now (float): Current time in seconds
+
+        Returns:
+            Decision: Whether the request may go ahead, and when to retry if not
+        """
+        with self._lock:
+            tokens, updated, _, _ = self._buckets.get(key, (capacity, now, rate, capacity))
+            decision, tokens = _decide(_refill(tokens, updated, now, rate, capacity), rate, capacity, cost)
+            self._buckets[key] = (tokens, now, rate, capacity)
+
+            self._takes += 1
+            if self._takes % PRUNE_EVERY == 0:
+                self._prune(now)
+            return decision
+
+    def _prune(self, now):
+        for key, (tokens, updated, rate, capacity) in list(self._buckets.items()):
+            if _refill(tokens, updated, now, rate, capacity) >= capacity:
+                del self._buckets[key]
+
+
+class SQLiteBucketStore:
+    """Token buckets in a SQLite file, shared by every worker process on the host"""
+
+    def __init__(self, db_path=RATE_LIMIT_DB):
+        self.db_path = db_path
+        self._takes = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+        return conn
+
+    def take(self, key, rate, capacity, cost, now):
+        """Take tokens from a bucket (see MemoryBucketStore.take)"""
+        conn = self._connect()
+        try:
+            # Lock the database for the read-modify-write, so workers never both spend the same token
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            decision, tokens = _decide(_refill(tokens, updated, now, rate, capacity), rate, capacity, cost)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens, now)
+            )
+
+            self._takes += 1
+            if self._takes % PRUNE_EVERY == 0:
+                # A day without requests refills every bucket in every plan
+                conn.execute("DELETE FROM rate_buckets WHERE updated < ?", (now - 86400,))
+            conn.execute("COMMIT")
+            return decision
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+
+class RateLimiter:
+    """Per-user token buckets for each class of AI endpoint, sized by the user's plan"""
+
+    def __init__(self, store, clock=time.time):
+        self.store = store
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.counters = {'allowed': 0, 'limited': 0}
+
+    def check(self, subject, plan_name, endpoint_class, cost=1):
+        """
+        Spend tokens for a request.
+
+        Args:
+            subject (str): Who is making the request (user id, or address for anonymous requests)
+            plan_name (str): The subject's plan
+            endpoint_class (str): Class of endpoint ('generation', 'feedback', 'translation')
+            cost (int): Tokens the request needs
+
+        Returns:
+            Decision: Whether the request may go ahead, and when to retry if not
+        """
+        limit = plan_limits(plan_name).get(endpoint_class)
+        if limit is None or limit['per_hour'] < 0:
+            return Decision(True, None, None, 0)
+
+        decision = self.store.take(
+            f"{subject}:{endpoint_class}",
+            limit['per_hour'] / 3600.0,
+            limit['burst'],
+            cost,
+            self.clock()
+        )
+        with self._lock:
+            self.counters['allowed' if decision.allowed else 'limited'] += 1
+        return decision
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+
+def _user_plan(user):
+    """Name the plan that sets a user's limits"""
+    subscription = getattr(user, 'subscription', None)
+    try:
+        if subscription is not None and subscription.plan and subscription.is_active():
+            return subscription.plan.name
+    except TypeError:
+        # Subscriptions without a period end are not active
+        pass
+    if getattr(user, 'is_premium', None) and user.is_premium():
+        return 'premium'
+    return DEFAULT_PLAN
+
+
+def _subject():
+    """Identify the caller: the user id when logged in, the client address otherwise"""
+    if current_user and getattr(current_user, 'is_authenticated', False):
+        return f"user:{current_user.get_id()}", _user_plan(current_user)
+    return f"addr:{request.remote_addr}", DEFAULT_PLAN
+
+
+def rate_limited(endpoint_class, methods=None, cost=None):
+    """
+    Limit a view with the caller's token bucket for an endpoint class.
+
+    Requests over the limit get a 429 response with a Retry-After header.
+    Apply below @login_required so the user is known.
+
+    Args:
+        endpoint_class (str): Class of endpoint ('generation', 'feedback', 'translation')
+        methods (tuple, optional): Only limit these HTTP methods (defaults to all)
+        cost (callable, optional): Returns the tokens the current request needs,
+            e.g. the number of words in a batch (defaults to 1)
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(*args, **kwargs):
+            if not RATE_LIMIT_ENABLED or (methods and request.method not in methods):
+                return view(*args, **kwargs)
+
+            subject, plan_name = _subject()
+            tokens = max(1, int(cost())) if cost else 1
+            decision = limiter.check(subject, plan_name, endpoint_class, cost=tokens)
+            if not decision.allowed and tokens > decision.limit:
+                # Would never fit in the bucket, however long the caller waits
+                return jsonify({
+                    'success': False,
+                    'message': f'At most {int(decision.limit)} items can be processed per request on your plan'
+                }), 400
+            if not decision.allowed:
+                response = jsonify({
+                    'success': False,
+                    'message': 'Too many requests, please try again later',
+                    'retry_after': decision.retry_after
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = str(decision.retry_after)
+                response.headers['X-RateLimit-Limit'] = str(decision.limit)
+                response.headers['X-RateLimit-Remaining'] = '0'
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if decision.limit is not None:
+                response.headers['X-RateLimit-Limit'] = str(decision.limit)
+                response.headers['X-RateLimit-Remaining'] = str(decision.remaining)
+            return response
+        return wrapped
+    return decorator
+
+
+# Shared limiter used by the app
+limiter = RateLimiter(
+    SQLiteBucketStore() if RATE_LIMIT_STORE == 'sqlite' and not IS_VERCEL else MemoryBucketStore()
+)
@@ -29,7 +29,13 @@ DEFAULT_PLANS = [
             'advanced_grammar': False,
             'enhanced_vocabulary': False,
             'audio_generation': False,
-            'offline_access': False
+            'offline_access': False,
+            # Token buckets per class of AI endpoint: refill per hour and burst size
+            'ai_rate_limits': {
+                'generation': {'per_hour': 20, 'burst': 5},
+                'feedback': {'per_hour': 30, 'burst': 5},
+                'translation': {'per_hour': 300, 'burst': 30}
+            }
         }
     },
     {
@@ -44,7 +50,12 @@ DEFAULT_PLANS = [
             'advanced_grammar': True,
             'enhanced_vocabulary': True,
             'audio_generation': True,
-            'offline_access': True
+            'offline_access': True,
+            'ai_rate_limits': {
+                'generation': {'per_hour': 120, 'burst': 15},
+                'feedback': {'per_hour': 200, 'burst': 15},
+                'translation': {'per_hour': 2000, 'burst': 100}
+            }
         }
     },
     {
@@ -60,7 +71,12 @@ DEFAULT_PLANS = [
             'enhanced_vocabulary': True,
             'audio_generation': True,
             'offline_access': True,
-            'priority_support': True
+            'priority_support': True,
+            'ai_rate_limits': {
+                'generation': {'per_hour': 120, 'burst': 15},
+                'feedback': {'per_hour': 200, 'burst': 15},
+                'translation': {'per_hour': 2000, 'burst': 100}
+            }
         }
     }
 ]
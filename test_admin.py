@@ -0,0 +1,50 @@
+import unittest
+from unittest import mock
+from flask import Flask, jsonify
+import models
+from auth import admin_required, auth_bp, login_manager
+from models import User
+
+USERS = {
+    '1': User(id=1, email='Admin@Example.com', username='admin', password_hash='x'),
+    '2': User(id=2, email='learner@example.com', username='learner', password_hash='x')
+}
+
+class AdminRequiredTestCase(unittest.TestCase):
+    """Test case for restricting admin APIs to administrators"""
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.secret_key = 'test'
+        login_manager.init_app(app)
+        app.register_blueprint(auth_bp, url_prefix='/auth')
+        self.loader = mock.patch.object(login_manager, '_user_callback', USERS.get)
+        self.loader.start()
+
+        @app.route('/api/admin/stats')
+        @admin_required
+        def stats():
+            return jsonify({'success': True})
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.loader.stop()
+
+    def login(self, user_id):
+        with self.client.session_transaction() as session:
+            session['_user_id'] = user_id
+
+    def test_only_admins(self):
+        """Test that anonymous users and learners are turned away and admins let in"""
+        with mock.patch.object(models, 'ADMIN_EMAILS', {'admin@example.com'}):
+            self.assertEqual(self.client.get('/api/admin/stats').status_code, 302)
+
+            self.login('2')
+            self.assertEqual(self.client.get('/api/admin/stats').status_code, 403)
+
+            self.login('1')
+            self.assertEqual(self.client.get('/api/admin/stats').status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from immersion import content
+from segment_store import SegmentStore
+
+class ContentLookupTestCase(unittest.TestCase):
+    """Test case for looking up immersion content by id"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.previous = (content.content_store, content.CONTENT_FILES)
+        content.content_store = SegmentStore(os.path.join(self.tmp, 'segments'))
+
+        for content_id in ['imported_20250101120000', 'youtube_20250102120000']:
+            with open(os.path.join(self.tmp, f"{content_id}.json"), 'w', encoding='utf-8') as f:
+                json.dump({'id': content_id, 'source': 'file'}, f)
+        content.CONTENT_FILES = content.index_content_files(self.tmp)
+
+    def tearDown(self):
+        content.content_store, content.CONTENT_FILES = self.previous
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_exact_lookup(self):
+        """Test that new content, old files and mock content are found by their exact id only"""
+        content.save_content({'id': 'cultural_01J0000000AAAAAAAAAAAAAAAA', 'title': 'Fiesta'})
+
+        self.assertEqual(content.get_content_by_id('cultural_01J0000000AAAAAAAAAAAAAAAA')['title'], 'Fiesta')
+        self.assertEqual(content.get_content_by_id('youtube_20250102120000')['source'], 'file')
+        self.assertEqual(content.get_content_by_id(1)['id'], 1)
+        # Parts of ids used to match the first file that contained them
+        self.assertIsNone(content.get_content_by_id('20250101'))
+        self.assertIsNone(content.get_content_by_id('5'))
+        self.assertIsNone(content.get_content_by_id('cultural_'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from ids import new_id
+
+def make_ids(count):
+    return [new_id() for _ in range(count)]
+
+class IdsTestCase(unittest.TestCase):
+    """Test case for the shared artifact id generator"""
+
+    def test_format_and_order(self):
+        """Test that ids sort in creation order, even within one millisecond"""
+        ids = make_ids(5000)
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertTrue(all(len(artifact_id) == 26 for artifact_id in ids))
+        self.assertTrue(new_id('subject_').startswith('subject_'))
+
+    def test_unique_across_threads_and_processes(self):
+        """Test that concurrent threads and forked workers never produce the same id"""
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            thread_ids = [i for batch in executor.map(make_ids, [2000] * 8) for i in batch]
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            process_ids = [i for batch in executor.map(make_ids, [2000] * 4) for i in batch]
+        all_ids = thread_ids + process_ids
+        self.assertEqual(len(set(all_ids)), len(all_ids))
+
+if __name__ == '__main__':
+    unittest.main()
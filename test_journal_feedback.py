@@ -0,0 +1,136 @@
+import os
+import time
+import datetime
+import shutil
+import tempfile
+import threading
+import unittest
+from flask import Flask
+from models import db
+from journaling import journal, store
+from ai_integration.llm_backends import LLMError, get_backend, set_backend
+
+class SlowBackend:
+    """Backend that answers after a delay, or fails"""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.release = threading.Event()
+        self.prompts = []
+
+    def complete(self, request, timeout):
+        self.prompts.append(request['prompt'])
+        self.release.wait(5)
+        time.sleep(self.delay)
+        if self.fail:
+            raise LLMError('upstream unavailable')
+        return {'text': 'Gramática\n\nVocabulario\n\nCultura\n\nFluidez', 'prompt_tokens': 1, 'completion_tokens': 1}
+
+class JournalFeedbackTestCase(unittest.TestCase):
+    """Test case for saving journal entries before their feedback is ready"""
+
+    def setUp(self):
+        self.previous_backend = get_backend()
+        self.previous_app = store._app
+        self.tmp = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(self.tmp, 'journal.db')}"
+        db.init_app(self.app)
+        store.init_app(self.app)
+
+    def tearDown(self):
+        set_backend(self.previous_backend)
+        store._app = self.previous_app
+        with self.app.app_context():
+            db.engine.dispose()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def wait_until_done(self, entry_id):
+        for _ in range(50):
+            entry = journal.get_journal_entry(entry_id)
+            if entry['feedback_status'] != 'pending':
+                return entry
+            journal.wait_for_feedback(entry_id, timeout=0.1)
+        self.fail('feedback never finished')
+
+    def test_entry_saved_before_feedback(self):
+        """Test that the entry is returned and stored while the model is still working"""
+        backend = SlowBackend()
+        set_backend(backend)
+
+        entry = journal.create_journal_entry('Hoy fui al mercado.', 'Spanish', user_id=1)
+        self.assertEqual(entry['feedback_status'], 'pending')
+        self.assertIsNone(entry['feedback'])
+        self.assertEqual(journal.get_journal_entry(entry['id'])['content'], 'Hoy fui al mercado.')
+
+        backend.release.set()
+        entry = self.wait_until_done(entry['id'])
+        self.assertEqual(entry['feedback_status'], 'ready')
+        self.assertEqual(entry['feedback']['vocabulary'], 'Vocabulario')
+
+    def test_failed_feedback(self):
+        """Test that a model failure marks the entry as failed"""
+        backend = SlowBackend(fail=True)
+        backend.release.set()
+        set_backend(backend)
+
+        entry = journal.create_journal_entry('Tambien fui al mercado.', 'Spanish', user_id=1)
+        self.assertEqual(entry['precheck']['issues'][0]['suggestion'], 'También')
+        entry = self.wait_until_done(entry['id'])
+        self.assertEqual(entry['feedback_status'], 'failed')
+        # The local checks stand in for the model feedback
+        self.assertIn('También', entry['feedback']['grammar'])
+
+    def test_resume_after_restart(self):
+        """Test that entries left pending by a stopped process get their feedback, and recent ones are left alone"""
+        backend = SlowBackend()
+        backend.release.set()
+        set_backend(backend)
+
+        old = datetime.datetime.now() - datetime.timedelta(minutes=10)
+        for entry_id, timestamp in (('stale', old), ('recent', datetime.datetime.now())):
+            journal.save_journal_entry({
+                'id': entry_id, 'content': 'Ayer llovió.', 'language': 'Spanish', 'timestamp': timestamp.isoformat(),
+                'feedback': None, 'feedback_status': 'pending', 'precheck': None
+            }, user_id=1)
+
+        self.assertEqual(journal.resume_pending_feedback(older_than=60), 1)
+        self.assertEqual(self.wait_until_done('stale')['feedback_status'], 'ready')
+        self.assertEqual(journal.get_journal_entry('recent')['feedback_status'], 'pending')
+
+    def test_concurrent_recovery_claims_each_entry_once(self):
+        """Test that workers recovering at the same time queue every stale entry only once"""
+        backend = SlowBackend()
+        backend.release.set()
+        set_backend(backend)
+
+        old = (datetime.datetime.now() - datetime.timedelta(minutes=10)).isoformat()
+        entry_ids = [f"left-{i}" for i in range(10)]
+        for entry_id in entry_ids:
+            journal.save_journal_entry({
+                'id': entry_id, 'content': f"Entrada {entry_id}.", 'language': 'Spanish', 'timestamp': old,
+                'feedback': None, 'feedback_status': 'pending', 'precheck': None
+            }, user_id=1)
+
+        start = threading.Barrier(2)
+        queued = []
+
+        def recover():
+            start.wait()
+            queued.append(journal.resume_pending_feedback(older_than=60))
+
+        workers = [threading.Thread(target=recover) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(sum(queued), len(entry_ids))
+        for entry_id in entry_ids:
+            self.assertEqual(self.wait_until_done(entry_id)['feedback_status'], 'ready')
+        self.assertEqual(len(backend.prompts), len(entry_ids))
+        self.assertEqual(journal.resume_pending_feedback(older_than=60), 0)
+
+if __name__ == '__main__':
+    unittest.main()
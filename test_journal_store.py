@@ -0,0 +1,84 @@
+import os
+import shutil
+import datetime
+import tempfile
+import unittest
+from flask import Flask
+from models import db
+from journaling import store
+
+class JournalStoreTestCase(unittest.TestCase):
+    """Test case for per-user journal storage and keyset pagination"""
+
+    def setUp(self):
+        self.previous_app = store._app
+        self.tmp = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(self.tmp, 'journal.db')}"
+        db.init_app(self.app)
+        store.init_app(self.app)
+
+        start = datetime.datetime(2025, 1, 1)
+        for i in range(25):
+            # Entries 10 and 11 share a timestamp, so pages must break ties by id
+            created_at = start + datetime.timedelta(minutes=min(i, 10) if i <= 11 else i)
+            store.save(self.entry(f"e{i:02d}", created_at), user_id=1)
+        store.save(self.entry('other', start), user_id=2)
+
+    def tearDown(self):
+        store._app = self.previous_app
+        with self.app.app_context():
+            db.engine.dispose()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def entry(self, entry_id, created_at):
+        return {
+            'id': entry_id,
+            'content': f"Entrada {entry_id}",
+            'language': 'Spanish',
+            'timestamp': created_at.isoformat(),
+            'feedback': None,
+            'feedback_status': 'pending',
+            'precheck': {'issues': []}
+        }
+
+    def test_pages(self):
+        """Test that cursors walk a user's entries newest first without gaps or repeats"""
+        seen = []
+        cursor = None
+        pages = 0
+        while True:
+            entries, cursor = store.page(1, limit=10, cursor=cursor)
+            seen += [entry['id'] for entry in entries]
+            pages += 1
+            if cursor is None:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+        self.assertEqual(seen[0], 'e24')
+        self.assertNotIn('other', seen)
+
+        with self.assertRaises(ValueError):
+            store.page(1, cursor='not-a-cursor')
+
+    def test_feedback_and_owner(self):
+        """Test that feedback is stored with the entry and entries stay with their owner"""
+        entry = store.get('e03')
+        entry['feedback'] = {'grammar': 'Bien'}
+        entry['feedback_status'] = 'ready'
+        store.save(entry, user_id=1)
+
+        self.assertEqual(store.get('e03', user_id=1)['feedback'], {'grammar': 'Bien'})
+        self.assertEqual(store.get('e03', user_id=1)['timestamp'], '2025-01-01T00:03:00')
+        self.assertIsNone(store.get('e03', user_id=2))
+
+        with self.app.app_context():
+            plan = db.session.execute(db.text(
+                "EXPLAIN QUERY PLAN SELECT * FROM journal_entries WHERE user_id = 1 "
+                "ORDER BY created_at DESC, id DESC LIMIT 11"
+            )).fetchall()
+        self.assertIn('ix_journal_entries_user_id_created_at', ' '.join(str(row) for row in plan))
+
+if __name__ == '__main__':
+    unittest.main()
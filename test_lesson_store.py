@@ -0,0 +1,97 @@
+import os
+import json
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from flask import Flask
+from models import db
+from lessons import store
+
+class LessonStoreTestCase(unittest.TestCase):
+    """Test case for the indexed lesson store"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp, 'lessons.db')
+        self.previous_app = store._app
+
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{self.db_path}"
+        db.init_app(self.app)
+
+    def tearDown(self):
+        store._app = self.previous_app
+        with self.app.app_context():
+            db.engine.dispose()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def lesson(self, lesson_id, timestamp, **fields):
+        return dict({
+            'id': lesson_id,
+            'language': 'Spanish',
+            'level': 'beginner',
+            'topic': 'greetings',
+            'task_based': True,
+            'content': f"# Lesson {lesson_id}\nHola",
+            'prompt_template': 'interactive_lesson:1',
+            'timestamp': timestamp
+        }, **fields)
+
+    def test_save_get_and_recent(self):
+        """Test lookups by id and newest-first listings with filters, outside a request"""
+        store.init_app(self.app)
+        store.save(self.lesson('20250101000000', '2025-01-01T00:00:00'))
+        store.save(self.lesson('20250103000000', '2025-01-03T00:00:00', level='advanced'))
+        store.save(self.lesson('subject_20250102000000', '2025-01-02T00:00:00', subject='math', topic='sums'))
+
+        lesson = store.get('20250101000000')
+        self.assertEqual(lesson, self.lesson('20250101000000', '2025-01-01T00:00:00'))
+        self.assertIsNone(store.get('missing'))
+
+        ids = [lesson['id'] for lesson in store.recent(10)]
+        self.assertEqual(ids, ['20250103000000', 'subject_20250102000000', '20250101000000'])
+        self.assertEqual([lesson['id'] for lesson in store.recent(1)], ['20250103000000'])
+        filtered = store.recent(10, language='Spanish', level='beginner', topic='greetings')
+        self.assertEqual([lesson['id'] for lesson in filtered], ['20250101000000'])
+
+        # Saving the same id again replaces the lesson
+        store.save(self.lesson('20250101000000', '2025-01-01T00:00:00', content='Nuevo'))
+        self.assertEqual(store.get('20250101000000')['content'], 'Nuevo')
+        self.assertEqual(len(store.recent(10)), 3)
+
+    def test_migrate_old_table_and_files(self):
+        """Test that an old lessons table gets the new columns and lesson files are imported once"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE lessons (
+                id INTEGER PRIMARY KEY, title VARCHAR(200) NOT NULL, description TEXT,
+                language VARCHAR(50) NOT NULL, level VARCHAR(20) NOT NULL, topic VARCHAR(100) NOT NULL,
+                content TEXT NOT NULL, created_at DATETIME, is_premium BOOLEAN
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+        files = os.path.join(self.tmp, 'generated')
+        os.makedirs(files)
+        for i in range(5):
+            lesson = self.lesson(f"2025010{i + 1}000000", f"2025-01-0{i + 1}T00:00:00")
+            with open(os.path.join(files, f"{lesson['id']}.json"), 'w', encoding='utf-8') as f:
+                json.dump(lesson, f)
+        with open(os.path.join(files, 'broken.json'), 'w') as f:
+            f.write('{')
+
+        store._app = self.app
+        self.assertEqual(sorted(store.ensure_schema()), ['data', 'lesson_key'])
+        self.assertEqual(store.import_files(files, batch_size=2), {'imported': 5, 'existing': 0, 'failed': 1})
+        self.assertEqual(store.import_files(files, batch_size=2), {'imported': 0, 'existing': 5, 'failed': 1})
+
+        self.assertEqual(store.recent(1)[0]['id'], '20250105000000')
+        self.assertEqual(store.get('20250103000000')['timestamp'], '2025-01-03T00:00:00')
+        with self.app.app_context():
+            indexes = {row[1] for row in db.session.execute(db.text("PRAGMA index_list('lessons')"))}
+        self.assertTrue({'ix_lessons_created_at', 'ix_lessons_lesson_key'} <= indexes)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import time
+import shutil
+import tempfile
+import unittest
+from ai_integration.llm_backends import RecordingBackend, ReplayBackend, LLMError, LLMTimeoutError, parse_latency
+
+class FakeBackend:
+    """Backend standing in for the OpenAI API"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, request, timeout):
+        self.calls += 1
+        return {'text': f"Hola, {request['prompt']}", 'prompt_tokens': 5, 'completion_tokens': 3}
+
+    def stream(self, request, timeout):
+        self.calls += 1
+        yield 'Hola, ', None
+        yield request['prompt'], None
+        yield '', (5, 3)
+
+class LLMBackendsTestCase(unittest.TestCase):
+    """Test case for recording and replaying model responses"""
+
+    def setUp(self):
+        self.fixture_dir = tempfile.mkdtemp()
+        self.request = {
+            'model': 'gpt-3.5-turbo',
+            'prompt': 'mundo',
+            'system_prompt': None,
+            'max_tokens': 50,
+            'temperature': None
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.fixture_dir, ignore_errors=True)
+
+    def test_record_then_replay(self):
+        """Test that a recorded response is replayed without calling the model"""
+        fake = FakeBackend()
+        recorded = RecordingBackend(fake, fixture_dir=self.fixture_dir).complete(self.request, timeout=5)
+
+        replay = ReplayBackend(fixture_dir=self.fixture_dir, latency='none')
+        self.assertEqual(replay.complete(self.request, timeout=5), recorded)
+        self.assertEqual(fake.calls, 1)
+
+    def test_replay_on_another_tier(self):
+        """Test that a response recorded on one model is replayed when the router picks another"""
+        recorded = RecordingBackend(FakeBackend(), fixture_dir=self.fixture_dir).complete(self.request, timeout=5)
+
+        replay = ReplayBackend(fixture_dir=self.fixture_dir, latency='none')
+        self.assertEqual(replay.complete(dict(self.request, model='gpt-4o-mini'), timeout=5), recorded)
+
+    def test_record_then_replay_stream(self):
+        """Test that a recorded stream is replayed as chunks with its usage"""
+        recorder = RecordingBackend(FakeBackend(), fixture_dir=self.fixture_dir)
+        list(recorder.stream(self.request, timeout=5))
+
+        events = list(ReplayBackend(fixture_dir=self.fixture_dir, latency='none').stream(self.request, timeout=5))
+        self.assertEqual(''.join(text for text, _ in events), 'Hola, mundo')
+        self.assertEqual(events[-1][1], (5, 3))
+
+    def test_replay_miss(self):
+        """Test that unrecorded requests fail, or get a synthetic answer when asked to"""
+        with self.assertRaises(LLMError):
+            ReplayBackend(fixture_dir=self.fixture_dir, latency='none').complete(self.request, timeout=5)
+
+        synthetic = ReplayBackend(fixture_dir=self.fixture_dir, latency='none', on_miss='synthetic')
+        response = synthetic.complete(self.request, timeout=5)
+        self.assertTrue(response['text'])
+        self.assertEqual(response, synthetic.complete(self.request, timeout=5))
+
+    def test_replay_latency(self):
+        """Test that replay sleeps for the synthetic latency and respects the deadline"""
+        RecordingBackend(FakeBackend(), fixture_dir=self.fixture_dir).complete(self.request, timeout=5)
+
+        started = time.monotonic()
+        ReplayBackend(fixture_dir=self.fixture_dir, latency='fixed:0.1').complete(self.request, timeout=5)
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+
+        with self.assertRaises(LLMTimeoutError):
+            ReplayBackend(fixture_dir=self.fixture_dir, latency='fixed:0.2').complete(self.request, timeout=0.05)
+
+    def test_parse_latency(self):
+        """Test the latency distribution specs"""
+        self.assertEqual(parse_latency('none')(1.2), 0.0)
+        self.assertEqual(parse_latency('recorded')(1.2), 1.2)
+        self.assertEqual(parse_latency('fixed:0.5')(None), 0.5)
+        self.assertTrue(0.1 <= parse_latency('uniform:0.1,0.2')(None) <= 0.2)
+        self.assertGreaterEqual(parse_latency('normal:0.1,1')(None), 0.0)
+        self.assertGreater(parse_latency('lognormal:0,0.5')(None), 0.0)
+        with self.assertRaises(ValueError):
+            parse_latency('pareto:1')
+
+if __name__ == '__main__':
+    unittest.main()
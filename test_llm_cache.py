@@ -0,0 +1,63 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from ai_integration.llm_cache import LLMCache, make_key
+
+class LLMCacheTestCase(unittest.TestCase):
+    """Test case for the two-tier LLM response cache"""
+
+    def setUp(self):
+        """Create a cache backed by a temporary directory"""
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = LLMCache(cache_dir=self.cache_dir, memory_entries=2, ttl=60, max_bytes=10000)
+        self.value = {'text': 'Hola', 'model': 'gpt-3.5-turbo', 'latency': 1.5, 'prompt_tokens': 10, 'completion_tokens': 5}
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_key_depends_on_every_input(self):
+        """Test that the key changes with template, model, params and prompt"""
+        base = make_key('lesson:1', 'gpt-3.5-turbo', {'max_tokens': 100}, 'prompt')
+        self.assertEqual(base, make_key('lesson:1', 'gpt-3.5-turbo', {'max_tokens': 100}, 'prompt'))
+        self.assertNotEqual(base, make_key('lesson:2', 'gpt-3.5-turbo', {'max_tokens': 100}, 'prompt'))
+        self.assertNotEqual(base, make_key('lesson:1', 'gpt-4', {'max_tokens': 100}, 'prompt'))
+        self.assertNotEqual(base, make_key('lesson:1', 'gpt-3.5-turbo', {'max_tokens': 200}, 'prompt'))
+        self.assertNotEqual(base, make_key('lesson:1', 'gpt-3.5-turbo', {'max_tokens': 100}, 'other'))
+
+    def test_memory_and_disk_hits(self):
+        """Test that entries evicted from memory are served from disk"""
+        self.assertIsNone(self.cache.get('a' * 64))
+        for key in ('a' * 64, 'b' * 64, 'c' * 64):
+            self.cache.set(key, self.value)
+
+        self.assertEqual(self.cache.get('c' * 64)['text'], 'Hola')
+        self.assertEqual(self.cache.get('a' * 64)['text'], 'Hola')
+
+        stats = self.cache.stats()
+        self.assertEqual(stats['memory_hits'], 1)
+        self.assertEqual(stats['disk_hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['saved_tokens'], 30)
+
+    def test_expired_entries_are_stale(self):
+        """Test that disk entries older than the TTL are misses but can still be served stale"""
+        key = 'd' * 64
+        self.cache.set(key, self.value)
+        self.cache._memory.clear()
+
+        old = time.time() - 120
+        os.utime(self.cache._path(key), (old, old))
+        self.assertIsNone(self.cache.get(key))
+        self.assertEqual(self.cache.get(key, allow_stale=True), self.value)
+
+    def test_disk_size_limit(self):
+        """Test that the disk tier is evicted back under its byte budget"""
+        big = dict(self.value, text='x' * 3000)
+        for i in range(6):
+            self.cache.set(f"{i:064d}", big)
+        self.assertLessEqual(self.cache._scan_size(), 10000)
+
+if __name__ == '__main__':
+    unittest.main()
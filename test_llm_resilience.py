@@ -0,0 +1,127 @@
+import time
+import shutil
+import tempfile
+import unittest
+from ai_integration import llm_cache, llm_gateway
+from ai_integration.llm_cache import LLMCache
+from ai_integration.llm_backends import LLMError, get_backend, set_backend
+from ai_integration.circuit_breaker import CircuitBreaker, breakers
+
+class FlakyBackend:
+    """Backend that fails, or answers slowly, on demand"""
+
+    def __init__(self, fail=False, delays=None):
+        self.fail = fail
+        self.delays = list(delays or [])
+        self.calls = 0
+
+    def complete(self, request, timeout):
+        self.calls += 1
+        delay = self.delays.pop(0) if self.delays else 0
+        time.sleep(delay)
+        if self.fail:
+            raise LLMError('upstream unavailable')
+        return {'text': f"answer after {delay}s", 'prompt_tokens': 1, 'completion_tokens': 1}
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    """Test case for the circuit breaker state machine"""
+
+    def test_trips_and_recovers(self):
+        """Test that the breaker opens after repeated failures and closes after a good trial call"""
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.1)
+        for _ in range(3):
+            self.assertTrue(breaker.allow())
+            breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.15)
+        self.assertEqual(breaker.state, 'half_open')
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_failed_trial_reopens(self):
+        """Test that a failed half-open trial opens the breaker again"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+        breaker.record_failure()
+        time.sleep(0.15)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertEqual(breaker.stats()['trips'], 2)
+
+class GatewayResilienceTestCase(unittest.TestCase):
+    """Test case for hedging and degraded serving in the gateway"""
+
+    def setUp(self):
+        self.previous_backend = get_backend()
+        self.previous_cache = llm_cache.cache
+        self.cache_dir = tempfile.mkdtemp()
+        llm_cache.cache = LLMCache(cache_dir=self.cache_dir, ttl=60)
+        self.model = f"test-model-{id(self)}"
+
+    def tearDown(self):
+        set_backend(self.previous_backend)
+        llm_cache.cache = self.previous_cache
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_hedge_answers_first(self):
+        """Test that a hedged request wins when the first one is stuck"""
+        backend = FlakyBackend(delays=[1.0, 0.0])
+        set_backend(backend)
+        request = llm_gateway._request('hola', 10, self.model, None, None)
+
+        started = time.monotonic()
+        response = llm_gateway._hedged(request, timeout=5, hedge_after=0.05)
+        self.assertEqual(response['text'], 'answer after 0.0s')
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(backend.calls, 2)
+
+    def test_error_without_stale_entry(self):
+        """Test that a failing call with nothing cached raises, so the caller can degrade"""
+        set_backend(FlakyBackend(fail=True))
+        with self.assertRaises(LLMError):
+            llm_gateway.complete('hola', model=self.model, template='test:1', use_cache=True, hedge=False)
+
+    def test_stale_entry_served_while_breaker_open(self):
+        """Test that an expired cache entry is served once the breaker has tripped"""
+        set_backend(FlakyBackend())
+        llm_gateway.complete('hola', model=self.model, template='test:1', use_cache=True, hedge=False)
+
+        # Expire the entry, then make the model fail until the breaker opens
+        llm_cache.cache.ttl = -1
+        llm_cache.cache._memory.clear()
+        set_backend(FlakyBackend(fail=True))
+        breaker = breakers.get(self.model)
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+        response = llm_gateway.complete('hola', model=self.model, template='test:1', use_cache=True, hedge=False)
+        self.assertTrue(response.cached)
+        self.assertEqual(response.text, 'answer after 0s')
+
+        with self.assertRaises(llm_gateway.LLMUnavailableError):
+            llm_gateway.complete('adiós', model=self.model, hedge=False)
+
+    def test_stream_while_breaker_open(self):
+        """Test that a stream serves an expired cache entry, or raises, once the breaker has tripped"""
+        set_backend(FlakyBackend())
+        llm_gateway.complete('hola', model=self.model, template='test:1', use_cache=True, hedge=False)
+
+        llm_cache.cache.ttl = -1
+        llm_cache.cache._memory.clear()
+        set_backend(FlakyBackend(fail=True))
+        breaker = breakers.get(self.model)
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+        chunks = list(llm_gateway.stream_text('hola', model=self.model, template='test:1', use_cache=True))
+        self.assertEqual(chunks, ['answer after 0s'])
+
+        with self.assertRaises(llm_gateway.LLMUnavailableError):
+            list(llm_gateway.stream_text('adiós', model=self.model, template='test:1', use_cache=True))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from memory_store import MemoryStore
+from journaling import journal
+from ids import new_id
+
+class MemoryStoreTestCase(unittest.TestCase):
+    """Test case for the bounded in-memory store used on Vercel"""
+
+    def test_lru_eviction_by_size(self):
+        """Test that memory stays under the limit by dropping the least recently used items"""
+        store = MemoryStore(max_bytes=1000)
+        for i in range(100):
+            store.put(f"item_{i:03d}", {'text': 'x' * 80})
+            # Kept in use, so never the least recently used
+            store.get('item_000')
+
+        self.assertLessEqual(store.bytes, 1000)
+        self.assertLess(len(store), 100)
+        self.assertEqual(store.get('item_000'), {'text': 'x' * 80})
+        self.assertIsNone(store.get('item_001'))
+        self.assertEqual(store.get('item_099'), {'text': 'x' * 80})
+        self.assertGreater(store.stats()['evictions'], 0)
+
+        # Newest first, skipping what was dropped
+        self.assertEqual([item for item in store.recent(2)], [{'text': 'x' * 80}] * 2)
+        self.assertEqual(len(store.recent(1000)), len(store))
+
+    def test_recent_groups_and_replacements(self):
+        """Test newest-first listings per group, with replaced items keeping their place"""
+        store = MemoryStore()
+        for i in range(6):
+            store.put(f"item_{i}", {'id': f"item_{i}", 'level': 'beginner' if i % 2 else 'advanced'}, group=i % 3)
+        store.put('item_1', {'id': 'item_1', 'level': 'beginner', 'updated': True})
+
+        self.assertEqual([item['id'] for item in store.recent(3)], ['item_5', 'item_4', 'item_3'])
+        self.assertEqual([item['id'] for item in store.recent(10, group=1)], ['item_4', 'item_1'])
+        self.assertTrue(store.recent(10, group=1)[1]['updated'])
+        self.assertEqual(store.group('item_1'), 1)
+        beginner = store.recent(10, match=lambda item: item['level'] == 'beginner')
+        self.assertEqual([item['id'] for item in beginner], ['item_5', 'item_3', 'item_1'])
+
+        # Pages resume right after the item a previous page ended with
+        self.assertEqual([item['id'] for item in store.recent(2, before='item_4')], ['item_3', 'item_2'])
+        self.assertEqual([item['id'] for item in store.recent(10, group=1, before='item_4')], ['item_1'])
+        with self.assertRaises(KeyError):
+            store.recent(10, before='missing')
+
+    def test_journal_pages_in_memory(self):
+        """Test the Vercel journal listing: per-user pages with a cursor"""
+        previous = journal.IS_VERCEL, journal.JOURNAL_ENTRIES
+        journal.IS_VERCEL, journal.JOURNAL_ENTRIES = True, MemoryStore()
+        try:
+            for i in range(5):
+                for user_id in (1, 2):
+                    journal.save_journal_entry({'id': new_id(), 'content': f"{user_id}-{i}"}, user_id)
+
+            first, cursor = journal.get_journal_entries(1, limit=3)
+            second, last_cursor = journal.get_journal_entries(1, limit=3, cursor=cursor)
+            self.assertEqual([entry['content'] for entry in first + second], [f"1-{i}" for i in range(4, -1, -1)])
+            self.assertIsNone(last_cursor)
+            self.assertIsNone(journal.get_journal_entry(first[0]['id'], user_id=2))
+            self.assertEqual(journal.get_journal_entry(first[0]['id'], user_id=1)['content'], '1-4')
+        finally:
+            journal.IS_VERCEL, journal.JOURNAL_ENTRIES = previous
+
+if __name__ == '__main__':
+    unittest.main()
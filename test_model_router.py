@@ -0,0 +1,85 @@
+import time
+import unittest
+from ai_integration import llm_gateway
+from ai_integration.llm_backends import get_backend, set_backend
+from ai_integration.model_router import ModelRouter, Route
+
+class EchoBackend:
+    """Backend that reports which model and budget it was asked for"""
+
+    def __init__(self):
+        self.requests = []
+
+    def complete(self, request, timeout):
+        self.requests.append(request)
+        return {'text': request['model'], 'prompt_tokens': 1, 'completion_tokens': 1}
+
+class ModelRouterTestCase(unittest.TestCase):
+    """Test case for picking model tiers by latency target"""
+
+    def setUp(self):
+        self.tiers = {'quality': 'big', 'standard': 'medium', 'fast': 'small'}
+        self.router = ModelRouter(
+            routes={'lesson': Route('standard', 20.0, 1000), 'typing': Route('fast', 5.0, 400)},
+            tiers=self.tiers,
+            window=0.2,
+            min_samples=3
+        )
+
+    def test_budget_and_lanes(self):
+        """Test that routes cap the token budget and pick the lane by latency target"""
+        selection = self.router.select('lesson', max_tokens=1500)
+        self.assertEqual((selection.model, selection.max_tokens, selection.lane), ('medium', 1000, 'long'))
+        selection = self.router.select('typing', max_tokens=100)
+        self.assertEqual((selection.model, selection.max_tokens, selection.lane), ('small', 100, 'short'))
+
+        # Unrouted tasks and pinned models are left alone
+        self.assertIsNone(self.router.select('other', max_tokens=50).model)
+        self.assertEqual(self.router.select('lesson', model='pinned', max_tokens=50).model, 'pinned')
+
+    def test_downgrade_and_recover(self):
+        """Test that a slow tier is skipped until its samples age out"""
+        for _ in range(3):
+            self.router.observe('lesson', 'medium', 30.0)
+        selection = self.router.select('lesson')
+        self.assertEqual(selection.model, 'small')
+        self.assertTrue(selection.downgraded)
+
+        time.sleep(0.25)
+        self.assertEqual(self.router.select('lesson').model, 'medium')
+        self.assertEqual(self.router.stats()['downgraded'], 1)
+
+class GatewayRoutingTestCase(unittest.TestCase):
+    """Test case for routing inside the gateway"""
+
+    def setUp(self):
+        self.previous_backend = get_backend()
+        self.backend = EchoBackend()
+        set_backend(self.backend)
+
+    def tearDown(self):
+        set_backend(self.previous_backend)
+
+    def test_task_uses_its_tier(self):
+        """Test that a templated call goes to the task's tier model with its budget"""
+        response = llm_gateway.complete('hola', max_tokens=5000, template='typing_exercise:1', hedge=False)
+        self.assertEqual(response.text, 'gpt-4o-mini')
+        self.assertEqual(self.backend.requests[-1]['max_tokens'], 400)
+
+    def test_short_lane_does_not_wait_for_long_lane(self):
+        """Test that quick tasks still run while every long-lane slot is taken"""
+        long_lane = llm_gateway._lanes['long']
+        held = 0
+        while long_lane.acquire(blocking=False):
+            held += 1
+        try:
+            response = llm_gateway.complete('hola', template='translation_batch:1', timeout=1, hedge=False)
+            self.assertEqual(response.text, 'gpt-4o-mini')
+            with self.assertRaises(llm_gateway.LLMTimeoutError):
+                llm_gateway.complete('hola', template='interactive_lesson:1', timeout=0.1, hedge=False)
+        finally:
+            for _ in range(held):
+                long_lane.release()
+
+if __name__ == '__main__':
+    unittest.main()
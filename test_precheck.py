@@ -0,0 +1,73 @@
+import unittest
+from writing_exercises.precheck import precheck, summarize
+
+class PrecheckTestCase(unittest.TestCase):
+    """Test case for the local rule-based writing pre-checker"""
+
+    def issues(self, text):
+        return [(issue['type'], issue['text'], issue['suggestion']) for issue in precheck(text, 'Spanish')['issues']]
+
+    def test_accents(self):
+        """Test that missing accents and ñ are found"""
+        self.assertEqual(self.issues('Tambien me gusta la musica.'), [
+            ('accent', 'Tambien', 'También'),
+            ('accent', 'musica', 'música')
+        ])
+        self.assertEqual(self.issues('Tengo un nino.'), [('accent', 'nino', 'niño')])
+        self.assertEqual(self.issues('¿Donde vives? Tu eres mi amigo.'), [
+            ('accent', 'Donde', 'Dónde'),
+            ('accent', 'Tu', 'Tú')
+        ])
+        self.assertEqual(self.issues('Tu casa es grande.'), [])
+
+    def test_agreement(self):
+        """Test determiner, noun and adjective agreement"""
+        self.assertEqual(self.issues('Tengo un casa bonito.'), [
+            ('agreement', 'un', 'una'),
+            ('agreement', 'bonito', 'bonita')
+        ])
+        self.assertEqual(self.issues('La problema es difícil.'), [('agreement', 'La', 'El')])
+        self.assertEqual(self.issues('Las casas son bonitos.'), [('agreement', 'bonitos', 'bonitas')])
+        # Feminine nouns starting with a stressed a take el
+        self.assertEqual(self.issues('El agua está fría.'), [])
+        self.assertEqual(self.issues('La agua está fría.'), [('agreement', 'La', 'El')])
+
+    def test_ser_estar(self):
+        """Test that states take estar and traits take ser"""
+        self.assertEqual(self.issues('Yo soy cansado.'), [('ser_estar', 'soy', 'estoy')])
+        self.assertEqual(self.issues('Mi hermana esta enferma.'), [('accent', 'esta', 'está')])
+        self.assertEqual(self.issues('Somos en la playa.'), [('ser_estar', 'Somos', 'Estamos')])
+        self.assertEqual(self.issues('Estoy un estudiante.'), [('ser_estar', 'Estoy', 'Soy')])
+        self.assertEqual(self.issues('Ellos están muy cansados.'), [])
+
+    def test_spelling(self):
+        """Test that close unknown words get suggestions and names are left alone"""
+        self.assertEqual(self.issues('Hoy escrbí una crata.'), [
+            ('spelling', 'escrbí', 'escribí'),
+            ('spelling', 'crata', 'carta')
+        ])
+        self.assertEqual(self.issues('Vivo con Marta en Sevilla.'), [])
+
+    def test_correct_text(self):
+        """Test that correct writing produces no issues"""
+        text = ('Cuando era niño, jugaba en el parque todos los días después de la escuela. '
+                'Ayer fuimos al cine y vimos una película muy interesante.')
+        result = precheck(text, 'Spanish')
+        self.assertTrue(result['supported'])
+        self.assertEqual(result['issues'], [])
+        self.assertEqual(summarize(result), 'Automatic checks found no common errors.')
+
+    def test_offsets(self):
+        """Test that issues point at the text they describe"""
+        text = 'Me gusta el cafe.'
+        issue = precheck(text, 'Spanish')['issues'][0]
+        self.assertEqual(text[issue['start']:issue['end']], 'cafe')
+
+    def test_unsupported_language(self):
+        """Test that other languages are reported as unsupported"""
+        result = precheck('Bonjour tout le monde', 'French')
+        self.assertFalse(result['supported'])
+        self.assertEqual(result['issues'], [])
+
+if __name__ == '__main__':
+    unittest.main()
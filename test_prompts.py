@@ -0,0 +1,56 @@
+import unittest
+from ai_integration.prompts import PromptRegistry, PromptTemplate, prompts
+
+class PromptTemplateTestCase(unittest.TestCase):
+    """Test case for the prompt template registry"""
+
+    def test_render(self):
+        """Test that rendering fills parameters and keeps literal braces"""
+        template = PromptTemplate('greeting', 1, """
+            Say hello to {name} in {language}.
+            Answer as {{"text": "..."}}
+        """, params=('name', 'language'), max_tokens=20)
+        prompt = template.render(name='Ana', language='Spanish')
+        self.assertEqual(prompt.text, 'Say hello to Ana in Spanish.\nAnswer as {"text": "..."}')
+        self.assertEqual(prompt.template_id, 'greeting:1')
+        self.assertEqual(prompt.options(), {'template': 'greeting:1', 'max_tokens': 20, 'use_cache': False})
+        self.assertEqual(prompt.options(max_tokens=5)['max_tokens'], 5)
+
+    def test_parameters_are_checked(self):
+        """Test that undeclared, unused and missing parameters are rejected"""
+        with self.assertRaises(ValueError):
+            PromptTemplate('bad', 1, "Hello {name}", params=(), max_tokens=10)
+        with self.assertRaises(ValueError):
+            PromptTemplate('bad', 1, "Hello", params=('name',), max_tokens=10)
+
+        template = PromptTemplate('greeting', 1, "Hello {name}", params=('name',), max_tokens=10)
+        with self.assertRaises(ValueError):
+            template.render()
+        with self.assertRaises(ValueError):
+            template.render(name='Ana', language='Spanish')
+
+    def test_version_selection(self):
+        """Test that the latest version is used unless one is pinned"""
+        registry = PromptRegistry('greeting=1')
+        other = PromptRegistry()
+        for reg in (registry, other):
+            reg.register(PromptTemplate('greeting', 1, "Hello {name}", params=('name',), max_tokens=10))
+            reg.register(PromptTemplate('greeting', 2, "Hi {name}", params=('name',), max_tokens=10))
+
+        self.assertEqual(registry.render('greeting', name='Ana').text, 'Hello Ana')
+        self.assertEqual(other.render('greeting', name='Ana').text, 'Hi Ana')
+        self.assertEqual(other.get('greeting', 1).render(name='Ana').text, 'Hello Ana')
+        with self.assertRaises(ValueError):
+            other.register(PromptTemplate('greeting', 2, "Hey {name}", params=('name',), max_tokens=10))
+
+    def test_registered_templates(self):
+        """Test that every prompt used by the app is registered"""
+        names = {template['name'] for template in prompts.describe()}
+        self.assertTrue({
+            'interactive_lesson', 'subject_lesson', 'writing_exercise', 'writing_feedback', 'typing_exercise',
+            'journal_feedback', 'immersion_content', 'article_chunk_study_aids', 'youtube_chunk_study_aids',
+            'cultural_content', 'translation_batch'
+        } <= names)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import unittest
+from flask import Flask, jsonify, request
+from flask_login import LoginManager
+from subscriptions import rate_limits
+from subscriptions.rate_limits import MemoryBucketStore, RateLimiter, SQLiteBucketStore, plan_limits, rate_limited
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class RateLimiterTestCase(unittest.TestCase):
+    """Test case for the per-user token buckets"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(MemoryBucketStore(), clock=self.clock)
+
+    def test_burst_then_refill(self):
+        """Test that a full bucket allows a burst, then refills at the plan rate"""
+        limit = plan_limits('free')['generation']
+        for _ in range(limit['burst']):
+            self.assertTrue(self.limiter.check('user:1', 'free', 'generation').allowed)
+
+        decision = self.limiter.check('user:1', 'free', 'generation')
+        self.assertFalse(decision.allowed)
+        self.assertEqual(decision.retry_after, 3600 // limit['per_hour'])
+
+        self.clock.now += decision.retry_after
+        self.assertTrue(self.limiter.check('user:1', 'free', 'generation').allowed)
+
+    def test_buckets_are_per_user_class_and_plan(self):
+        """Test that users, endpoint classes and plans are limited separately"""
+        for _ in range(plan_limits('free')['generation']['burst']):
+            self.limiter.check('user:1', 'free', 'generation')
+        self.assertFalse(self.limiter.check('user:1', 'free', 'generation').allowed)
+        self.assertTrue(self.limiter.check('user:2', 'free', 'generation').allowed)
+        self.assertTrue(self.limiter.check('user:1', 'free', 'translation').allowed)
+        self.assertGreater(plan_limits('premium')['generation']['burst'], plan_limits('free')['generation']['burst'])
+
+    def test_shared_store(self):
+        """Test that limiters in different workers share a SQLite store"""
+        db_dir = tempfile.mkdtemp()
+        try:
+            db_path = os.path.join(db_dir, 'limits.db')
+            workers = [RateLimiter(SQLiteBucketStore(db_path), clock=self.clock) for _ in range(2)]
+            burst = plan_limits('free')['feedback']['burst']
+            allowed = [workers[i % 2].check('user:1', 'free', 'feedback').allowed for i in range(burst + 1)]
+            self.assertEqual(allowed, [True] * burst + [False])
+        finally:
+            shutil.rmtree(db_dir, ignore_errors=True)
+
+class RateLimitedViewTestCase(unittest.TestCase):
+    """Test case for the 429 responses of limited views"""
+
+    def setUp(self):
+        self.previous_limiter = rate_limits.limiter
+        rate_limits.limiter = RateLimiter(MemoryBucketStore(), clock=FakeClock())
+
+        app = Flask(__name__)
+        login_manager = LoginManager(app)
+        login_manager.user_loader(lambda user_id: None)
+
+        @app.route('/generate', methods=['GET', 'POST'])
+        @rate_limited('generation', methods=('POST',))
+        def generate():
+            return jsonify({'success': True})
+
+        @app.route('/translate', methods=['POST'])
+        @rate_limited('translation', cost=lambda: len(request.json['words']))
+        def translate():
+            return jsonify({'success': True})
+
+        self.client = app.test_client()
+
+    def tearDown(self):
+        rate_limits.limiter = self.previous_limiter
+
+    def test_too_many_requests(self):
+        """Test that requests over the limit get 429 with Retry-After"""
+        burst = plan_limits('free')['generation']['burst']
+        for remaining in reversed(range(burst)):
+            response = self.client.post('/generate')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['X-RateLimit-Remaining'], str(remaining))
+
+        response = self.client.post('/generate')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response.headers['Retry-After']), 0)
+        self.assertFalse(response.get_json()['success'])
+
+        # Methods that are not limited still go through
+        self.assertEqual(self.client.get('/generate').status_code, 200)
+
+    def test_cost_per_item(self):
+        """Test that a batch is charged one token per item"""
+        burst = plan_limits('free')['translation']['burst']
+        response = self.client.post('/translate', json={'words': ['hola'] * (burst - 1)})
+        self.assertEqual(response.headers['X-RateLimit-Remaining'], '1')
+        self.assertEqual(self.client.post('/translate', json={'words': ['a', 'b']}).status_code, 429)
+        self.assertEqual(self.client.post('/translate', json={'words': ['a']}).status_code, 200)
+
+        # A batch larger than the bucket could ever hold
+        response = self.client.post('/translate', json={'words': ['hola'] * (burst + 1)})
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
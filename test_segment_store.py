@@ -0,0 +1,135 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from segment_store import SegmentStore
+
+class SegmentStoreTestCase(unittest.TestCase):
+    """Test case for the append-only segment store"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.directory = os.path.join(self.tmp, 'segments')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def segment_files(self):
+        return sorted(name for name in os.listdir(self.directory) if name.startswith('segment-'))
+
+    def test_put_get_and_rollover(self):
+        """Test reads, overwrites and deletes across several segments"""
+        store = SegmentStore(self.directory, segment_bytes=512)
+        for i in range(50):
+            store.put(f"item_{i}", {'id': f"item_{i}", 'text': f"Texto número {i}"})
+        store.put('item_3', {'id': 'item_3', 'text': 'Nuevo'})
+        store.delete('item_4')
+
+        self.assertGreater(len(self.segment_files()), 1)
+        self.assertEqual(store.get('item_10'), {'id': 'item_10', 'text': 'Texto número 10'})
+        self.assertEqual(store.get('item_3')['text'], 'Nuevo')
+        self.assertIsNone(store.get('item_4'))
+        self.assertIsNone(store.get('missing'))
+        self.assertEqual(len(store), 49)
+
+    def test_reopen_and_other_instances(self):
+        """Test that the index is rebuilt on open, ignores a torn tail and follows other writers"""
+        store = SegmentStore(self.directory, segment_bytes=512)
+        for i in range(20):
+            store.put(f"item_{i}", {'n': i})
+
+        # A write cut short by a crash
+        last = os.path.join(self.directory, self.segment_files()[-1])
+        with open(last, 'ab') as f:
+            f.write(b'\x00\x00\x01\x00garbage')
+
+        reopened = SegmentStore(self.directory, segment_bytes=512)
+        self.assertEqual(len(reopened), 20)
+        self.assertEqual(reopened.get('item_7'), {'n': 7})
+
+        other = SegmentStore(self.directory, segment_bytes=512)
+        store.put('late', {'n': 'late'})
+        self.assertEqual(other.get('late'), {'n': 'late'})
+        self.assertIn('late', reopened)
+        self.assertEqual(SegmentStore(self.directory).get('late'), {'n': 'late'})
+
+    def test_compact(self):
+        """Test that compaction drops superseded records and readers follow the rewrite"""
+        store = SegmentStore(self.directory, segment_bytes=1024)
+        reader = SegmentStore(self.directory, segment_bytes=1024)
+        store.put('gone', {'n': 'gone'})
+        for round_number in range(5):
+            for i in range(20):
+                store.put(f"item_{i}", {'n': i, 'round': round_number})
+            if round_number == 0:
+                store.delete('gone')
+        reader.get('item_5')
+
+        summary = store.compact()
+        self.assertGreater(summary['segments'], 1)
+        self.assertLess(summary['bytes_after'], summary['bytes_before'])
+        for i in range(20):
+            self.assertEqual(store.get(f"item_{i}"), {'n': i, 'round': 4})
+            self.assertEqual(reader.get(f"item_{i}"), {'n': i, 'round': 4})
+        self.assertIsNone(SegmentStore(self.directory).get('gone'))
+        # The deletion sits in the oldest segment now, where it hides nothing
+        self.assertEqual(store._deleted, {})
+
+    def test_damaged_record(self):
+        """Test that a damaged record reads as missing without reloading, while other reads go on"""
+        store = SegmentStore(self.directory, compress=False)
+        for i in range(50):
+            store.put(f"item_{i}", {'n': i, 'text': 'abcdef'})
+        segment, offset, length = store._index['item_7']
+        with open(store._path(segment), 'r+b') as f:
+            f.seek(offset + length - 3)
+            f.write(b'XYZ')
+
+        keys = ['item_7' if i % 5 == 0 else f"item_{i % 50}" for i in range(2000)]
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            results = list(executor.map(store.get, keys))
+        for key, result in zip(keys, results):
+            self.assertEqual(result, None if key == 'item_7' else {'n': int(key[5:]), 'text': 'abcdef'})
+        self.assertEqual(store.counters['reloads'], 0)
+        self.assertEqual(store.counters['corrupt'], keys.count('item_7'))
+
+    def test_compression_and_training(self):
+        """Test that items are stored compressed and stay readable across dictionary changes"""
+        store = SegmentStore(self.directory)
+        other = SegmentStore(self.directory)
+        article = {'language': 'Spanish', 'content': 'La familia va al mercado de la ciudad. ' * 20}
+        for i in range(30):
+            store.put(f"imported_{i}", dict(article, id=f"imported_{i}", title=f"Artículo {i}"))
+        compressed_size = store.stats()['bytes']
+        self.assertLess(compressed_size, 30 * len(json.dumps(article)) / 4)
+
+        summary = store.train()
+        self.assertGreater(summary['dictionary_bytes'], 0)
+        self.assertEqual(store.stats()['dictionaries'], 1)
+        self.assertLess(store.stats()['bytes'], compressed_size)
+        store.put('imported_new', dict(article, id='imported_new'))
+
+        # Another instance picks up the new dictionary when it meets a record that needs it
+        self.assertEqual(other.get('imported_new')['id'], 'imported_new')
+        self.assertEqual(other.get('imported_3')['title'], 'Artículo 3')
+        self.assertEqual(SegmentStore(self.directory, compress=False).get('imported_29')['content'], article['content'])
+
+    def test_import_directory(self):
+        """Test importing one-file-per-item JSON once"""
+        files = os.path.join(self.tmp, 'files')
+        os.makedirs(files)
+        for i in range(3):
+            with open(os.path.join(files, f"imported_{i}.json"), 'w', encoding='utf-8') as f:
+                json.dump({'id': f"imported_{i}"}, f)
+        with open(os.path.join(files, 'broken.json'), 'w') as f:
+            f.write('{')
+
+        store = SegmentStore(self.directory)
+        self.assertEqual(store.import_directory(files), {'imported': 3, 'existing': 0, 'failed': 1})
+        self.assertEqual(store.import_directory(files), {'imported': 0, 'existing': 3, 'failed': 1})
+        self.assertEqual(store.get('imported_2'), {'id': 'imported_2'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import shutil
+import tempfile
+import unittest
+from ai_integration import llm_cache, llm_gateway, semantic_cache
+from ai_integration.llm_cache import LLMCache
+from ai_integration.llm_backends import get_backend, set_backend
+from ai_integration.prompts import prompts
+from ai_integration.semantic_cache import SemanticIndex, vectorize
+
+class CountingBackend:
+    """Backend that answers every call with its call number"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, request, timeout):
+        self.calls += 1
+        return {'text': f"lesson {self.calls}", 'prompt_tokens': 1, 'completion_tokens': 1}
+
+class SemanticIndexTestCase(unittest.TestCase):
+    """Test case for the hashed n-gram similarity index"""
+
+    def test_vectors(self):
+        """Test that word order and plurals do not matter, but different topics do"""
+        self.assertAlmostEqual(float(vectorize('ordering food') @ vectorize('food ordering')), 1.0, places=5)
+        self.assertGreater(float(vectorize('ordering food at a restaurant') @ vectorize('ordering food in restaurants')), 0.95)
+        self.assertLess(float(vectorize('at the airport') @ vectorize('at the train station')), 0.5)
+
+    def test_lookup_respects_threshold_and_partition(self):
+        """Test that only similar enough requests in the same partition match"""
+        index = SemanticIndex(dimensions=1024, max_entries=2)
+        index.add('spanish-beginner', 'ordering food', 'key-food')
+        self.assertEqual(index.lookup('spanish-beginner', 'food ordering', 0.8)[0], 'key-food')
+        self.assertIsNone(index.lookup('spanish-advanced', 'food ordering', 0.8))
+        self.assertIsNone(index.lookup('spanish-beginner', 'past tense verbs', 0.8))
+
+        # The oldest entry is replaced once the partition is full
+        index.add('spanish-beginner', 'past tense verbs', 'key-past')
+        index.add('spanish-beginner', 'the weather', 'key-weather')
+        self.assertIsNone(index.lookup('spanish-beginner', 'food ordering', 0.8))
+
+        stats = index.stats()
+        self.assertEqual(stats['lookups'], 4)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['entries'], 2)
+
+class SemanticGatewayTestCase(unittest.TestCase):
+    """Test case for reusing cached responses to similar requests"""
+
+    def setUp(self):
+        self.previous_backend = get_backend()
+        self.previous_cache = llm_cache.cache
+        self.previous_index = semantic_cache.index
+        self.cache_dir = tempfile.mkdtemp()
+        llm_cache.cache = LLMCache(cache_dir=self.cache_dir, ttl=60)
+        semantic_cache.index = SemanticIndex()
+        self.backend = CountingBackend()
+        set_backend(self.backend)
+
+    def tearDown(self):
+        set_backend(self.previous_backend)
+        llm_cache.cache = self.previous_cache
+        semantic_cache.index = self.previous_index
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def lesson(self, topic, level='beginner'):
+        prompt = prompts.get('interactive_lesson', 1).render(style='', level=level, language='Spanish', topic=topic)
+        return llm_gateway.complete(prompt.text, hedge=False, **prompt.options())
+
+    def test_similar_request_reuses_response(self):
+        """Test that a rephrased topic is served from the cache"""
+        self.assertEqual(self.lesson('ordering food').text, 'lesson 1')
+        response = self.lesson('Food ordering')
+        self.assertTrue(response.cached)
+        self.assertEqual(response.text, 'lesson 1')
+        self.assertEqual(self.backend.calls, 1)
+
+    def test_different_requests_call_the_model(self):
+        """Test that other topics and other exact parameters are not reused"""
+        self.lesson('ordering food')
+        self.assertEqual(self.lesson('ordering food', level='advanced').text, 'lesson 2')
+        self.assertEqual(self.lesson('asking for directions').text, 'lesson 3')
+        self.assertEqual(semantic_cache.index.stats()['hits'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
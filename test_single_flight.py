@@ -0,0 +1,88 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from ai_integration.llm_backends import LLMError
+from ai_integration.single_flight import SingleFlight
+
+class SingleFlightTestCase(unittest.TestCase):
+    """Test case for coalescing concurrent identical requests"""
+
+    def run_concurrently(self, flight, key, fn, callers=10):
+        """Call flight.do from several threads at once and collect the results"""
+        results = []
+        errors = []
+        barrier = threading.Barrier(callers)
+
+        def worker():
+            barrier.wait()
+            try:
+                results.append(flight.do(key, fn, timeout=5))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_callers_share_one_call(self):
+        """Test that concurrent callers with the same key run the function once"""
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'lesson'
+
+        flight = SingleFlight()
+        results, errors = self.run_concurrently(flight, 'key', slow)
+        self.assertEqual(errors, [])
+        self.assertEqual(results, ['lesson'] * 10)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.stats()['in_flight'], 0)
+
+    def test_errors_are_shared(self):
+        """Test that followers receive the leader's exception"""
+        def failing():
+            time.sleep(0.2)
+            raise ValueError('upstream failed')
+
+        results, errors = self.run_concurrently(SingleFlight(), 'key', failing, callers=5)
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 5)
+        self.assertTrue(all(isinstance(e, ValueError) for e in errors))
+
+    def test_lock_directory(self):
+        """Test that the cross-process lock file path runs the function"""
+        lock_dir = tempfile.mkdtemp()
+        try:
+            flight = SingleFlight(lock_dir=lock_dir)
+            self.assertEqual(flight.do('key', lambda: 42), 42)
+            results, errors = self.run_concurrently(flight, 'other', lambda: time.sleep(0.1) or 7, callers=5)
+            self.assertEqual((results, errors), ([7] * 5, []))
+            # Lock files are removed once their request is done
+            self.assertEqual(os.listdir(lock_dir), [])
+        finally:
+            shutil.rmtree(lock_dir, ignore_errors=True)
+
+    def test_timeouts_are_llm_errors(self):
+        """Test that a follower giving up raises the gateway's error type, so degraded responses can be served"""
+        def slow():
+            time.sleep(0.5)
+            return 'late'
+
+        flight = SingleFlight()
+        leader = threading.Thread(target=flight.do, args=('key', slow))
+        leader.start()
+        time.sleep(0.05)
+        with self.assertRaises(LLMError):
+            flight.do('key', slow, timeout=0.1)
+        leader.join()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import re
+import json
+import time
+import uuid
+import unittest
+from ai_integration.llm_backends import get_backend, set_backend
+from immersion.study_aids import (
+    MAX_PARALLEL_CHUNKS, MAX_QUESTIONS, generate_study_aids, generate_transcript_study_aids, merge_study_aids,
+    parse_transcript, split_into_chunks
+)
+
+class ChunkBackend:
+    """Backend that answers each chunk with the words of its first sentence, after a delay"""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = 0
+
+    def complete(self, request, timeout):
+        self.calls += 1
+        time.sleep(self.delay)
+        prompt = request['prompt']
+        part = re.search(r'part (\d+) of', prompt).group(1)
+        words = re.findall(r'Palabra\w+', prompt)
+        return {
+            'text': json.dumps({
+                'vocabulary': [{'word': word, 'translation': word.lower()} for word in words] + [{'word': 'casa', 'translation': 'house'}],
+                'questions': [f"Pregunta {part}.{i}" for i in range(3)]
+            }),
+            'prompt_tokens': 1,
+            'completion_tokens': 1
+        }
+
+class StudyAidsTestCase(unittest.TestCase):
+    """Test case for chunked study aids of imported content"""
+
+    def setUp(self):
+        self.previous_backend = get_backend()
+        self.backend = ChunkBackend()
+        set_backend(self.backend)
+
+    def tearDown(self):
+        set_backend(self.previous_backend)
+
+    def test_chunks_follow_paragraphs(self):
+        """Test that chunks end at paragraph breaks and long paragraphs split at sentence ends"""
+        paragraphs = [f"Párrafo {i}. " + "Una frase corta. " * 10 for i in range(6)]
+        chunks = split_into_chunks('\n\n'.join(paragraphs), chunk_chars=400)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual('\n\n'.join(chunks), '\n\n'.join(p.strip() for p in paragraphs))
+
+        long_paragraph = "Una frase bastante larga. " * 50
+        chunks = split_into_chunks(long_paragraph, chunk_chars=200)
+        self.assertTrue(all(len(chunk) <= 200 and chunk.endswith('.') for chunk in chunks))
+        self.assertLessEqual(len(split_into_chunks("Hola mundo. " * 1000, chunk_chars=100, max_chunks=5)), 6)
+
+    def test_merge(self):
+        """Test that repeated words rank first and every chunk gets questions"""
+        parts = [
+            {'vocabulary': [{'word': 'perro', 'translation': 'dog'}], 'questions': ['a1', 'a2', 'a3']},
+            None,
+            {'vocabulary': [{'word': 'Gato', 'translation': 'cat'}, {'word': 'perro', 'translation': ''}], 'questions': ['b1', 'b2']}
+        ]
+        merged = merge_study_aids(parts)
+        self.assertEqual([item['word'] for item in merged['vocabulary']], ['perro', 'Gato'])
+        self.assertEqual(merged['questions'][:4], ['a1', 'b1', 'a2', 'b2'])
+
+    def test_whole_text_in_about_one_chunk_time(self):
+        """Test that every chunk is covered and chunks run concurrently"""
+        paragraphs = [f"Palabra{i} aparece aquí. " + "Texto de relleno. " * 150 for i in range(5)]
+        started = time.monotonic()
+        aids = generate_study_aids('\n\n'.join(paragraphs), f"Artículo {uuid.uuid4().hex}")
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(aids['chunks'], 5)
+        self.assertEqual(aids['failed_chunks'], 0)
+        self.assertLess(elapsed, 2 * self.backend.delay + 0.3)
+        words = [item['word'] for item in aids['vocabulary']]
+        self.assertEqual(words[0], 'casa')
+        self.assertTrue({f"Palabra{i}" for i in range(5)} <= set(words))
+        self.assertEqual(len(aids['questions']), min(MAX_QUESTIONS, 15))
+        self.assertIn('Pregunta 5.0', aids['questions'])
+        self.assertIn('Vocabulary:', aids['text'])
+
+    def test_parse_transcript(self):
+        """Test that pasted YouTube transcripts keep their timestamps"""
+        segments = parse_transcript("0:00\nHola a todos\n1:05 Bienvenidos\n1:02:03\nAdiós")
+        self.assertEqual(segments, [
+            {'start': 0.0, 'text': 'Hola a todos'},
+            {'start': 65.0, 'text': 'Bienvenidos'},
+            {'start': 3723.0, 'text': 'Adiós'}
+        ])
+        self.assertEqual(parse_transcript("Hola\nAdiós"), [{'start': None, 'text': 'Hola'}, {'start': None, 'text': 'Adiós'}])
+
+    def test_long_transcript_in_about_one_chunk_time(self):
+        """Test that a 30-minute transcript runs in one round and words get their start times"""
+        segments = [
+            {'start': float(second), 'text': "Hoy hablamos de la casa y de muchas otras cosas interesantes del día"}
+            for second in range(0, 1800, 5)
+        ]
+        segments[100]['text'] += " Palabra1"
+        segments[300]['text'] += " Palabra2"
+        started = time.monotonic()
+        aids = generate_transcript_study_aids(segments, f"Vídeo {uuid.uuid4().hex}")
+        elapsed = time.monotonic() - started
+
+        self.assertLessEqual(aids['chunks'], MAX_PARALLEL_CHUNKS)
+        self.assertLess(elapsed, 2 * self.backend.delay + 0.3)
+        vocabulary = {item['word']: item for item in aids['vocabulary']}
+        self.assertEqual(vocabulary['Palabra1']['start'], 500.0)
+        self.assertEqual(vocabulary['Palabra2']['occurrences'], [1500.0])
+        self.assertEqual(vocabulary['casa']['start'], 0.0)
+        self.assertIn('Palabra2', aids['segments'][300]['vocabulary'])
+        self.assertEqual(aids['segments'][0]['duration'], 5.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import json
+import uuid
+import unittest
+from ai_integration.llm_backends import get_backend, set_backend
+from ai_integration.translation import translate_words, translation_cache, translation_key
+
+class BlankBackend:
+    """Backend that translates every word except 'nada', which it leaves blank"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, request, timeout):
+        self.calls += 1
+        prompt = request['prompt']
+        items = json.loads(prompt[prompt.index('[{'):prompt.index('}]') + 2])
+        rows = [
+            {'index': item['index'], 'translation': '' if item['word'] == 'nada' else item['word'].upper()}
+            for item in items
+        ]
+        return {'text': json.dumps(rows), 'prompt_tokens': 1, 'completion_tokens': 1}
+
+class TranslationTestCase(unittest.TestCase):
+    """Test case for batch translation and its shared cache"""
+
+    def setUp(self):
+        self.previous_backend = get_backend()
+        self.backend = BlankBackend()
+        set_backend(self.backend)
+
+    def tearDown(self):
+        set_backend(self.previous_backend)
+
+    def test_blank_translations_are_not_cached(self):
+        """Test that a word the model left blank fails and is asked again next time"""
+        context = f"Contexto {uuid.uuid4().hex}"
+        items = [{'word': 'casa', 'context': context}, {'word': 'nada', 'context': context}]
+
+        first = translate_words(items)
+        self.assertEqual(first[0]['translation'], 'CASA')
+        self.assertEqual(first[1]['error'], 'Translation failed')
+        self.assertIsNone(translation_cache.get(translation_key('Spanish', 'nada', context)))
+
+        second = translate_words(items)
+        self.assertTrue(second[0]['cached'])
+        self.assertFalse(second[1]['cached'])
+        self.assertEqual(self.backend.calls, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from segment_store import SegmentStore
+from write_behind import WriteBehindStore
+
+class SlowStore(SegmentStore):
+    """Segment store whose writes wait until released"""
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.release = threading.Event()
+        self.batches = []
+
+    def put_many(self, items, sync=False):
+        self.release.wait(5)
+        self.batches.append(len(items))
+        super().put_many(items, sync)
+
+class FailingStore(SegmentStore):
+    """Segment store whose first writes fail, recording the thread of each write"""
+
+    def __init__(self, directory, failures):
+        super().__init__(directory)
+        self.failures = failures
+        self.threads = set()
+
+    def put_many(self, items, sync=False):
+        self.threads.add(threading.current_thread().name)
+        if self.failures:
+            self.failures -= 1
+            raise OSError(28, 'No space left on device')
+        super().put_many(items, sync)
+
+class WriteBehindTestCase(unittest.TestCase):
+    """Test case for the write-behind queue in front of the segment store"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.directory = os.path.join(self.tmp, 'segments')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_served_from_memory_until_written(self):
+        """Test that puts return before the disk write and items are readable meanwhile"""
+        store = SlowStore(self.directory)
+        queued = WriteBehindStore(store, batch_size=16)
+
+        start = time.monotonic()
+        for i in range(40):
+            queued.put(f"item_{i}", {'n': i})
+        queued.put('item_0', {'n': 'new'})
+        self.assertLess(time.monotonic() - start, 1)
+
+        self.assertEqual(queued.get('item_5'), {'n': 5})
+        self.assertEqual(queued.get('item_0'), {'n': 'new'})
+        self.assertIn('item_39', queued)
+        self.assertIsNone(SegmentStore(self.directory).get('item_5'))
+
+        store.release.set()
+        queued.flush()
+        self.assertEqual(queued.stats()['pending'], 0)
+        self.assertLess(len(store.batches), 41)
+        self.assertEqual(sum(store.batches), 41)
+
+        reopened = SegmentStore(self.directory)
+        self.assertEqual(len(reopened), 40)
+        self.assertEqual(reopened.get('item_0'), {'n': 'new'})
+        self.assertEqual(queued.get('item_5'), {'n': 5})
+
+    def test_bounded_queue(self):
+        """Test that puts wait for the writer once the queue is full"""
+        store = SlowStore(self.directory)
+        queued = WriteBehindStore(store, max_pending=2, batch_size=1)
+        threading.Timer(0.3, store.release.set).start()
+
+        start = time.monotonic()
+        for i in range(5):
+            queued.put(f"item_{i}", {'n': i})
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertGreater(queued.stats()['blocked'], 0)
+
+        queued.flush()
+        self.assertEqual(SegmentStore(self.directory).get('item_4'), {'n': 4})
+
+    def test_failed_writes_are_kept_and_retried(self):
+        """Test that items survive failed writes and are written, in order, by the writer thread only"""
+        store = FailingStore(self.directory, failures=3)
+        queued = WriteBehindStore(store)
+        queued.put('a', {'a': 1})
+
+        self.assertFalse(queued.flush())
+        self.assertEqual(queued.get('a'), {'a': 1})
+        self.assertEqual(queued.stats()['pending'], 1)
+
+        queued.put('a', {'a': 2})
+        self.assertTrue(queued.flush())
+        self.assertEqual(queued.stats()['pending'], 0)
+        self.assertEqual(SegmentStore(self.directory).get('a'), {'a': 2})
+        self.assertEqual(store.threads, {'write-behind'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+import os
+import time
+import queue
+import threading
+
+# Items waiting to be written; a put blocks once this many are queued
+MAX_PENDING = int(os.getenv('WRITE_BEHIND_MAX_PENDING', 1000))
+# Items appended (and synced to disk) together by the background writer
+BATCH_SIZE = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 64))
+
+# Seconds flush() waits for the writer, e.g. at shutdown
+FLUSH_TIMEOUT = float(os.getenv('WRITE_BEHIND_FLUSH_SECONDS', 30))
+
+WRITE_ATTEMPTS = 3
+# Pause before a failed batch is tried again
+RETRY_SECONDS = 1.0
+
+
+class _Flush:
+    """Flush request travelling through the queue behind the items it waits for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.written = False
+
+
+class WriteBehindStore:
+    """
+    Write-behind front for a SegmentStore.
+
+    put() queues the item and returns without touching the disk; a background
+    thread appends queued items in batches with one fsync per batch. Until an
+    item is durable, get() serves it from memory; items whose write fails stay
+    in memory and are retried. Only the background thread writes, so writes
+    of the same id land in order. flush() waits for everything queued so far
+    and is registered to run at shutdown.
+    """
+
+    def __init__(self, store, max_pending=MAX_PENDING, batch_size=BATCH_SIZE):
+        self.store = store
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        # id -> (latest item, number of its writes still queued)
+        self._pending = {}
+        self._writer = None
+        self.counters = {'queued': 0, 'written': 0, 'batches': 0, 'blocked': 0, 'errors': 0}
+
+    def _ensure_writer(self):
+        # Also restarts the writer in a forked worker, where the thread does not exist
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name='write-behind', daemon=True)
+                self._writer.start()
+
+    def put(self, key, value):
+        """
+        Queue an item to be stored, replacing any earlier item with the same id.
+
+        Args:
+            key (str): The item id
+            value (dict): The item; must be JSON serializable
+        """
+        with self._lock:
+            _, queued = self._pending.get(key, (None, 0))
+            self._pending[key] = (value, queued + 1)
+            self.counters['queued'] += 1
+        self._ensure_writer()
+        if self._queue.full():
+            self.counters['blocked'] += 1
+        self._queue.put((key, value))
+
+    def get(self, key):
+        """
+        Fetch an item, including one that is not written yet.
+
+        Args:
+            key (str): The item id
+
+        Returns:
+            dict: The item, or None if there is none with this id
+        """
+        with self._lock:
+            pending = self._pending.get(key)
+        if pending is not None:
+            return pending[0]
+        return self.store.get(key)
+
+    def __contains__(self, key):
+        return key in self._pending or key in self.store
+
+    def _take(self, timeout=None):
+        """
+        Take up to a batch of queued items, waiting up to timeout seconds for the first.
+
+        Returns:
+            tuple: (items, flush requests found among them)
+        """
+        batch = []
+        flushes = []
+        try:
+            entry = self._queue.get(timeout=timeout)
+            while True:
+                if isinstance(entry, _Flush):
+                    flushes.append(entry)
+                else:
+                    batch.append(entry)
+                if len(batch) >= self.batch_size:
+                    break
+                entry = self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        return batch, flushes
+
+    def _write_loop(self):
+        # Items whose write failed; they are retried before anything queued after them
+        failed = []
+        while True:
+            if self._queue.maxsize and len(failed) >= self._queue.maxsize:
+                # Stop taking items while the disk is failing, so puts wait instead of piling up
+                time.sleep(RETRY_SECONDS)
+                batch, flushes = [], []
+            else:
+                batch, flushes = self._take(timeout=RETRY_SECONDS if failed else None)
+            batch = failed + batch
+            if batch:
+                failed = [] if self._write(batch) else batch
+            for flush in flushes:
+                flush.written = not failed
+                flush.done.set()
+
+    def _write(self, batch):
+        """
+        Append a batch with one fsync, then stop serving its items from memory.
+
+        Returns:
+            bool: False if the write failed; the items stay in memory to be retried
+        """
+        for attempt in range(WRITE_ATTEMPTS):
+            try:
+                self.store.put_many(batch, sync=True)
+                break
+            except Exception as e:
+                if attempt == WRITE_ATTEMPTS - 1:
+                    print(f"Error writing {len(batch)} items, will retry: {e}")
+                    self.counters['errors'] += 1
+                    return False
+                time.sleep(0.1 * 2 ** attempt)
+
+        self.counters['written'] += len(batch)
+        self.counters['batches'] += 1
+        with self._lock:
+            for key, _ in batch:
+                value, queued = self._pending[key]
+                if queued > 1:
+                    self._pending[key] = (value, queued - 1)
+                else:
+                    del self._pending[key]
+        return True
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """
+        Wait until the background writer has written every item queued so far.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait
+
+        Returns:
+            bool: True if the items reached the disk; False if writing failed or timed out
+        """
+        flush = _Flush()
+        self._ensure_writer()
+        self._queue.put(flush)
+        return flush.done.wait(timeout) and flush.written
+
+    def stats(self):
+        """
+        Get the queue's counters and the store's size.
+
+        Returns:
+            dict: Counters, ids not yet written, and the store's stats
+        """
+        return dict(self.counters, pending=len(self._pending), store=self.store.stats())
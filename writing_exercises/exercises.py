@@ -1,21 +1,56 @@
 import json
 import os
+import atexit
 import datetime
-import openai
+from ai_integration.llm_gateway import complete_text
+from ai_integration.prompts import prompts
 from ai_integration.API_Integration import generate_lesson
+from writing_exercises.precheck import precheck, summarize
+from ids import new_id
+from segment_store import SegmentStore
+from write_behind import WriteBehindStore
+from memory_store import MemoryStore
 
 # Use in-memory storage for Vercel deployment
 # Check if running on Vercel
 IS_VERCEL = os.environ.get('VERCEL') == '1'
 
-# In-memory storage for exercises when on Vercel
-EXERCISES_MEMORY = {}
+# Bounded in-memory storage for exercises when on Vercel
+EXERCISES_MEMORY = MemoryStore()
 
 # Local directory for exercises when running locally
 EXERCISES_DIR = os.path.join(os.path.dirname(__file__), 'generated')
 if not IS_VERCEL:
     os.makedirs(EXERCISES_DIR, exist_ok=True)
 
+# Generated exercises are appended to a segment store, off the request thread, rather than written one file per exercise
+EXERCISES_STORE_DIR = os.getenv('EXERCISES_STORE_DIR', os.path.join(EXERCISES_DIR, 'segments'))
+exercise_store = None if IS_VERCEL else WriteBehindStore(SegmentStore(EXERCISES_STORE_DIR))
+if exercise_store:
+    atexit.register(exercise_store.flush)
+
+def get_exercise(exercise_id):
+    """
+    Look up a generated exercise by its id.
+    
+    Args:
+        exercise_id (str): The ID of the exercise
+        
+    Returns:
+        dict: The exercise, or None if not found
+    """
+    if IS_VERCEL:
+        return EXERCISES_MEMORY.get(exercise_id)
+    
+    exercise = exercise_store.get(exercise_id)
+    if exercise is None:
+        # Exercises saved before the segment store, one file per exercise
+        filepath = os.path.join(EXERCISES_DIR, f"{exercise_id}.json")
+        if os.path.exists(filepath):
+            with open(filepath, 'r', encoding='utf-8') as f:
+                exercise = json.load(f)
+    return exercise
+
 def generate_writing_exercise(language='Spanish', level='beginner', topic=None):
     """
     Generate a writing exercise for language learning.
@@ -29,31 +64,18 @@ def generate_writing_exercise(language='Spanish', level='beginner', topic=None):
         dict: The generated writing exercise
     """
     # Generate a unique ID for the exercise
-    exercise_id = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    exercise_id = new_id()
     
     # Create the prompt for the AI
-    topic_str = f" about {topic}" if topic else ""
-    prompt = f"""
-    Generate a writing exercise for {level} level students learning {language}{topic_str}.
-    
-    Include the following:
-    1. A clear writing prompt or task
-    2. Any necessary vocabulary or phrases that might be helpful
-    3. Grammar points to focus on
-    4. A sample response (short example)
-    5. Word count target
-    
-    Format the response in a structured way with clear sections.
-    """
+    prompt = prompts.render(
+        'writing_exercise',
+        level=level,
+        language=language,
+        topic_clause=f" about {topic}" if topic else ""
+    )
     
     try:
-        response = openai.Completion.create(
-            model="text-davinci-003",
-            prompt=prompt,
-            max_tokens=500
-        )
-        
-        content = response.choices[0].text.strip()
+        content = complete_text(prompt.text, **prompt.options())
         
         # Create the exercise object
         exercise = {
@@ -62,19 +84,15 @@ def generate_writing_exercise(language='Spanish', level='beginner', topic=None):
             'level': level,
             'topic': topic,
             'content': content,
+            'prompt_template': prompt.template_id,
             'timestamp': datetime.datetime.now().isoformat()
         }
         
         if IS_VERCEL:
             # Store in memory when on Vercel
-            EXERCISES_MEMORY[exercise_id] = exercise
+            EXERCISES_MEMORY.put(exercise_id, exercise)
         else:
-            # Save the exercise to a file when running locally
-            filename = f"{exercise_id}.json"
-            filepath = os.path.join(EXERCISES_DIR, filename)
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(exercise, f, ensure_ascii=False, indent=2)
+            exercise_store.put(exercise_id, exercise)
         
         return exercise
     
@@ -85,57 +103,38 @@ def generate_writing_exercise(language='Spanish', level='beginner', topic=None):
             'message': 'Failed to generate writing exercise'
         }
 
-def check_writing(content, language='Spanish', exercise_id=None):
+def check_writing(content, language='Spanish', exercise_id=None, precheck_result=None):
     """
     Check a writing submission and provide feedback.
     
+    The local pre-check results are included with the model feedback. If the
+    model is unavailable, the pre-check results are returned on their own,
+    marked as degraded.
+    
     Args:
         content (str): The writing submission to check
         language (str): The language of the submission
         exercise_id (str, optional): The ID of the exercise being responded to
+        precheck_result (dict, optional): Pre-check results already computed for this content
         
     Returns:
         dict: Feedback on the writing submission
     """
+    if precheck_result is None:
+        precheck_result = precheck(content, language)
+    
     # Get the exercise if an ID is provided
     exercise_content = ""
     if exercise_id:
-        if IS_VERCEL:
-            # Get from memory when on Vercel
-            if exercise_id in EXERCISES_MEMORY:
-                exercise = EXERCISES_MEMORY[exercise_id]
-                exercise_content = f"\nThis is in response to the following exercise:\n{exercise['content']}"
-        else:
-            # Get from file when running locally
-            filepath = os.path.join(EXERCISES_DIR, f"{exercise_id}.json")
-            if os.path.exists(filepath):
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    exercise = json.load(f)
-                    exercise_content = f"\nThis is in response to the following exercise:\n{exercise['content']}"
+        exercise = get_exercise(exercise_id)
+        if exercise:
+            exercise_content = f"\nThis is in response to the following exercise:\n{exercise['content']}"
     
     # Create the prompt for the AI
-    prompt = f"""
-    Analyze the following writing submission in {language} and provide detailed feedback:{exercise_content}
-    
-    Submission:
-    {content}
-    
-    Provide feedback in the following format:
-    1. Grammar corrections (list specific errors and corrections)
-    2. Vocabulary usage (suggest better word choices or additional vocabulary)
-    3. Structure and coherence (comment on the organization and flow)
-    4. Style and tone (provide suggestions for improvement)
-    5. Overall assessment (strengths and areas for improvement)
-    """
+    prompt = prompts.render('writing_feedback', language=language, exercise_clause=exercise_content, content=content)
     
     try:
-        response = openai.Completion.create(
-            model="text-davinci-003",
-            prompt=prompt,
-            max_tokens=500
-        )
-        
-        feedback_text = response.choices[0].text.strip()
+        feedback_text = complete_text(prompt.text, **prompt.options())
         
         # Parse the feedback into sections
         sections = feedback_text.split('\n\n')
@@ -145,16 +144,32 @@ def check_writing(content, language='Spanish', exercise_id=None):
             'vocabulary': sections[1] if len(sections) > 1 else "No vocabulary feedback available.",
             'structure': sections[2] if len(sections) > 2 else "No structure feedback available.",
             'style': sections[3] if len(sections) > 3 else "No style feedback available.",
-            'overall': sections[4] if len(sections) > 4 else "No overall assessment available."
+            'overall': sections[4] if len(sections) > 4 else "No overall assessment available.",
+            'precheck': precheck_result,
+            'prompt_template': prompt.template_id
         }
         
         return feedback
     
     except Exception as e:
         print(f"Error checking writing: {e}")
+        if not precheck_result['supported']:
+            return {
+                'error': str(e),
+                'message': 'Failed to check writing submission'
+            }
+        
+        # Degraded mode: the local checks still give the student something to act on
+        unavailable = "AI feedback is temporarily unavailable."
         return {
-            'error': str(e),
-            'message': 'Failed to check writing submission'
+            'grammar': summarize(precheck_result),
+            'vocabulary': unavailable,
+            'structure': unavailable,
+            'style': unavailable,
+            'overall': unavailable,
+            'precheck': precheck_result,
+            'degraded': True,
+            'message': 'Showing automatic checks only'
         }
 
 def get_typing_exercise(language='Spanish', script_type='standard', difficulty='beginner'):
@@ -170,25 +185,10 @@ def get_typing_exercise(language='Spanish', script_type='standard', difficulty='
         dict: The generated typing exercise
     """
     # Create the prompt for the AI
-    prompt = f"""
-    Generate a typing exercise for {difficulty} level students learning to type in {language} using {script_type} script.
-    
-    Include the following:
-    1. A short paragraph (3-5 sentences) that includes common characters/symbols in this script
-    2. A list of the most challenging characters to type in this script
-    3. Tips for typing efficiently in this script
-    
-    Format the response in a structured way with clear sections.
-    """
+    prompt = prompts.render('typing_exercise', difficulty=difficulty, language=language, script_type=script_type)
     
     try:
-        response = openai.Completion.create(
-            model="text-davinci-003",
-            prompt=prompt,
-            max_tokens=400
-        )
-        
-        content = response.choices[0].text.strip()
+        content = complete_text(prompt.text, **prompt.options())
         
         # Create the exercise object
         exercise = {
@@ -196,6 +196,7 @@ def get_typing_exercise(language='Spanish', script_type='standard', difficulty='
             'script_type': script_type,
             'difficulty': difficulty,
             'content': content,
+            'prompt_template': prompt.template_id,
             'timestamp': datetime.datetime.now().isoformat()
         }
         
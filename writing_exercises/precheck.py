@@ -0,0 +1,612 @@
+import os
+import re
+import time
+import threading
+import unicodedata
+
+# Bundled lexicon (lemmas with part of speech, gender and verb classes)
+LEXICON_PATH = os.path.join(os.path.dirname(__file__), 'data', 'es_lexicon.txt')
+
+# Languages the pre-checker understands
+SUPPORTED_LANGUAGES = ('spanish', 'español', 'espanol', 'es')
+
+WORD_RE = re.compile(r"[A-Za-zÁÉÍÓÚÜÑáéíóúüñ]+")
+ALPHABET = 'abcdefghijklmnopqrstuvwxyzáéíóúüñ'
+VOWELS = 'aeiouáéíóúü'
+ACCENTED = {'a': 'á', 'e': 'é', 'i': 'í', 'o': 'ó', 'u': 'ú'}
+UNACCENTED = {v: k for k, v in ACCENTED.items()}
+
+# Determiner families, each as (masculine singular, feminine singular, masculine plural, feminine plural)
+DETERMINER_FAMILIES = (
+    ('el', 'la', 'los', 'las'),
+    ('un', 'una', 'unos', 'unas'),
+    ('este', 'esta', 'estos', 'estas'),
+    ('ese', 'esa', 'esos', 'esas'),
+    ('aquel', 'aquella', 'aquellos', 'aquellas'),
+    ('del', 'de la', 'de los', 'de las'),
+    ('al', 'a la', 'a los', 'a las')
+)
+_SLOTS = (('m', 's'), ('f', 's'), ('m', 'p'), ('f', 'p'))
+DETERMINERS = {
+    form: (family, gender, number)
+    for family in DETERMINER_FAMILIES
+    for form, (gender, number) in zip(family, _SLOTS)
+    if ' ' not in form
+}
+# Families that take the masculine form before feminine nouns starting with a stressed a (el agua)
+STRESSED_A_FAMILIES = ('el', 'un', 'del', 'al')
+
+# Words that start a direct question or exclamation and then carry an accent
+INTERROGATIVES = {
+    'que': 'qué', 'como': 'cómo', 'donde': 'dónde', 'adonde': 'adónde', 'cuando': 'cuándo',
+    'quien': 'quién', 'quienes': 'quiénes', 'cual': 'cuál', 'cuales': 'cuáles',
+    'cuanto': 'cuánto', 'cuanta': 'cuánta', 'cuantos': 'cuántos', 'cuantas': 'cuántas'
+}
+PREPOSITIONS = ('a', 'de', 'para', 'por', 'sin', 'en', 'sobre', 'hacia', 'hasta', 'contra', 'entre')
+
+# ser <-> estar, form by form
+SER_TO_ESTAR = {
+    'soy': 'estoy', 'eres': 'estás', 'es': 'está', 'somos': 'estamos', 'sois': 'estáis', 'son': 'están',
+    'era': 'estaba', 'eras': 'estabas', 'éramos': 'estábamos', 'erais': 'estabais', 'eran': 'estaban',
+    'fui': 'estuve', 'fuiste': 'estuviste', 'fue': 'estuvo', 'fuimos': 'estuvimos', 'fueron': 'estuvieron',
+    'sea': 'esté', 'seas': 'estés', 'sean': 'estén', 'ser': 'estar'
+}
+ESTAR_TO_SER = {estar: ser for ser, estar in SER_TO_ESTAR.items()}
+COPULAS = set(SER_TO_ESTAR) | set(ESTAR_TO_SER) | {'parece', 'parecen', 'parecía', 'parecían'}
+INTENSIFIERS = ('muy', 'bastante', 'tan', 'demasiado', 'algo', 'un poco', 'poco', 'más', 'menos', 'siempre', 'también', 'no')
+
+# Adjective lemmas that describe a state (estar) and ones that describe a trait (ser);
+# adjectives whose meaning changes with the verb (listo, aburrido, malo...) are left out
+STATE_ADJECTIVES = (
+    'cansado', 'enfermo', 'contento', 'ocupado', 'enojado', 'preocupado', 'sentado', 'muerto', 'roto',
+    'lleno', 'vacío', 'mojado', 'embarazado', 'despierto', 'dormido', 'sorprendido', 'emocionado',
+    'estresado', 'resfriado', 'harto', 'enamorado', 'abierto', 'cerrado', 'sucio', 'limpio'
+)
+TRAIT_ADJECTIVES = (
+    'alto', 'bajo', 'inteligente', 'simpático', 'amable', 'honesto', 'responsable', 'tímido',
+    'generoso', 'rubio', 'moreno', 'trabajador', 'perezoso', 'famoso', 'importante'
+)
+# Adjectives that usually start a phrase rather than describe the noun before them
+QUANTIFIERS = ('todo', 'mucho', 'poco', 'otro', 'tanto', 'demasiado', 'alguno', 'ninguno', 'cierto', 'vario', 'mismo', 'cada')
+# Words after 'esta' that show it is the verb (está) rather than the demonstrative
+ESTA_VERB_CUES = ('bien', 'mal', 'aquí', 'allí', 'allá', 'ahí', 'en', 'muy', 'bastante', 'tan', 'lejos', 'cerca')
+
+_lexicon = None
+_lexicon_lock = threading.Lock()
+
+
+def strip_accents(word):
+    """Remove diacritics, including the tilde of ñ, the way a keyboard without them would"""
+    decomposed = unicodedata.normalize('NFD', word)
+    return ''.join(c for c in decomposed if unicodedata.category(c) != 'Mn')
+
+
+def _remove_last_accent(word):
+    return ''.join(UNACCENTED.get(c, c) for c in word)
+
+
+def _vowel_groups(word):
+    return len(re.findall(f"[{VOWELS}]+", word))
+
+
+def _plural(word):
+    """Pluralize a noun or adjective"""
+    last = word[-1]
+    if last in 'aeiouáéó':
+        return word + 's'
+    if last in 'íú':
+        return word + 'es'
+    if last == 's' and word[-2] in 'aeiou' and _vowel_groups(word) > 1:
+        # Unstressed final syllable: el lunes / los lunes, la crisis / las crisis
+        return word
+    if last == 'z':
+        return word[:-1] + 'ces'
+    if word.endswith('ís'):
+        return word + 'es'
+    if re.search(r"[áéóú][ns]$", word):
+        # The stress no longer falls on the last syllable: canción -> canciones
+        return _remove_last_accent(word) + 'es'
+    if word.endswith('en') and not re.search(r"[áéíóú]", word):
+        # The stress moves to the antepenultimate syllable: examen -> exámenes
+        match = re.search(r"([aeiou])[^aeiou]*en$", word)
+        if match:
+            i = match.start(1)
+            return word[:i] + ACCENTED[word[i]] + word[i + 1:] + 'es'
+    return word + 'es'
+
+
+def _adjective_forms(lemma):
+    """
+    Inflect an adjective.
+
+    Returns:
+        dict: (gender, number) -> form, where gender is None for adjectives with one form for both genders
+    """
+    if lemma.endswith('o'):
+        stem = lemma[:-1]
+        return {('m', 's'): lemma, ('f', 's'): stem + 'a', ('m', 'p'): stem + 'os', ('f', 'p'): stem + 'as'}
+    if re.search(r"(or|ol|és|án|ín|ón)$", lemma) and lemma not in ('mejor', 'peor', 'mayor', 'menor', 'interior', 'exterior'):
+        feminine = _remove_last_accent(lemma) + 'a'
+        return {('m', 's'): lemma, ('f', 's'): feminine, ('m', 'p'): _plural(lemma), ('f', 'p'): feminine + 's'}
+    return {(None, 's'): lemma, (None, 'p'): _plural(lemma)}
+
+
+def _change_stem(stem, change):
+    """Apply a stem change (e>ie, o>ue, u>ue, e>i, o>u) to the last matching vowel"""
+    old, new = change.split('>')
+    i = stem.rfind(old)
+    return stem if i == -1 else stem[:i] + new + stem[i + len(old):]
+
+
+def _conjugate(infinitive, tags):
+    """
+    Generate the conjugation of a verb from its infinitive.
+
+    Args:
+        infinitive (str): The infinitive, optionally reflexive (ducharse)
+        tags (list): Stem change (e>ie, o>ue, u>ue, e>i) and spelling classes (ortho, zc, uy)
+
+    Returns:
+        tuple: (set of conjugated forms, past participle)
+    """
+    reflexive = infinitive.endswith('se')
+    if reflexive:
+        infinitive = infinitive[:-2]
+    stem, ending = infinitive[:-2], infinitive[-2:]
+    if ending not in ('ar', 'er', 'ir', 'ír'):
+        return {infinitive}, None
+    group = 'ar' if ending == 'ar' else 'er' if ending == 'er' else 'ir'
+
+    change = next((tag for tag in tags if '>' in tag), None)
+    strong = _change_stem(stem, change) if change else stem
+    # -ir verbs with a stem change also change weakly in some forms (pidió, durmiendo)
+    weak = stem
+    if change and group == 'ir':
+        weak = _change_stem(stem, 'e>i' if change.startswith('e') else 'o>u')
+
+    def respell(base):
+        """Spelling changes before e/a that keep the consonant sound (busque, escoja, conozca, construya)"""
+        if 'uy' in tags:
+            return base + 'y'
+        if 'zc' in tags:
+            return base[:-1] + 'zc'
+        if group == 'ar' and 'ortho' in tags and base[-1] in 'cgz':
+            return base[:-1] + {'c': 'qu', 'g': 'gu', 'z': 'c'}[base[-1]]
+        if group != 'ar' and base.endswith('g'):
+            return base[:-1] + 'j'
+        return base
+
+    if group == 'ar':
+        present = ['o', 'as', 'a', 'amos', 'áis', 'an']
+        preterite = ['é', 'aste', 'ó', 'amos', 'asteis', 'aron']
+        imperfect = ['aba', 'abas', 'aba', 'ábamos', 'abais', 'aban']
+        subjunctive = ['e', 'es', 'e', 'emos', 'éis', 'en']
+        past_subjunctive = ['ara', 'aras', 'ara', 'áramos', 'arais', 'aran']
+        gerund, participle = 'ando', 'ado'
+    else:
+        present = ['o', 'es', 'e', 'emos', 'éis', 'en'] if group == 'er' else ['o', 'es', 'e', 'imos', 'ís', 'en']
+        preterite = ['í', 'iste', 'ió', 'imos', 'isteis', 'ieron']
+        imperfect = ['ía', 'ías', 'ía', 'íamos', 'íais', 'ían']
+        subjunctive = ['a', 'as', 'a', 'amos', 'áis', 'an']
+        past_subjunctive = ['iera', 'ieras', 'iera', 'iéramos', 'ierais', 'ieran']
+        gerund, participle = 'iendo', 'ido'
+    if 'uy' in tags:
+        # construir: construyo, construyó, construyeron, construyera, construyendo
+        preterite = ['í', 'iste', 'yó', 'imos', 'isteis', 'yeron']
+        past_subjunctive = ['y' + suffix[1:] for suffix in past_subjunctive]
+        gerund = 'yendo'
+
+    forms = {infinitive}
+    if reflexive:
+        forms.add(infinitive + 'se')
+    for person, suffix in enumerate(present):
+        if person == 0 and group != 'ar':
+            forms.add(respell(strong) + suffix)
+        elif person in (1, 2, 5):
+            forms.add((stem + 'y' if 'uy' in tags else strong) + suffix)
+        else:
+            forms.add((strong if person == 0 else stem) + suffix)
+    for person, suffix in enumerate(subjunctive):
+        base = strong if person in (0, 1, 2, 5) else weak
+        forms.add(respell(base) + suffix)
+    for person, suffix in enumerate(preterite):
+        if person == 0 and group == 'ar':
+            forms.add(respell(stem) + suffix)
+        else:
+            forms.add((weak if person in (2, 5) else stem) + suffix)
+    for suffix in imperfect:
+        forms.add(stem + suffix)
+    for suffix in past_subjunctive:
+        forms.add(weak + suffix)
+    future_stem = infinitive.replace('ír', 'ir')
+    for suffix in ('é', 'ás', 'á', 'emos', 'éis', 'án', 'ía', 'ías', 'íamos', 'íais', 'ían'):
+        forms.add(future_stem + suffix)
+    forms.add(future_stem[:-1] + 'd')
+    forms.add(weak + gerund)
+
+    return forms, stem + participle
+
+
+def _load_lexicon(path=LEXICON_PATH):
+    """
+    Expand the bundled lemmas into every inflected form.
+
+    Returns:
+        dict: 'words' (form -> rank), 'stripped' (unaccented form -> forms),
+            'nouns' (form -> (gender, number, stressed_a)), 'adjectives'
+            (form -> (lemma, gender, number)), 'adjective_forms' (lemma -> forms)
+            and 'verbs' (set of conjugated forms)
+    """
+    words = {}
+    nouns = {}
+    adjectives = {}
+    adjective_forms = {}
+    verbs = set()
+
+    def add(form):
+        words.setdefault(form, len(words))
+
+    def add_adjective(lemma, forms):
+        adjective_forms[lemma] = forms
+        for (gender, number), form in forms.items():
+            adjectives.setdefault(form, (lemma, gender, number))
+            add(form)
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            entry, _, extra = line.partition('|')
+            fields = entry.split()
+            lemma, pos, tags = fields[0].lower(), fields[1], fields[2:]
+            extras = extra.split()
+
+            if pos == 'n':
+                add(lemma)
+                gender = next((tag for tag in tags if tag in ('m', 'f', 'mf')), 'm')
+                stressed_a = 'a' in tags
+                if 'sg' in tags:
+                    nouns.setdefault(lemma, (gender, 's', stressed_a))
+                elif 'pl' in tags:
+                    nouns.setdefault(lemma, (gender, 'p', stressed_a))
+                else:
+                    plural = _plural(lemma)
+                    number = 'sp' if plural == lemma else 's'
+                    nouns.setdefault(lemma, (gender, number, stressed_a))
+                    nouns.setdefault(plural, (gender, 'sp' if plural == lemma else 'p', False))
+                    add(plural)
+            elif pos == 'adj':
+                add_adjective(lemma, _adjective_forms(lemma))
+            elif pos == 'v':
+                forms, participle = _conjugate(lemma, tags)
+                verbs.update(forms)
+                for form in sorted(forms):
+                    add(form)
+                # Irregular participles are listed with their four forms (abierto abierta abiertos abiertas)
+                irregular = [form[:-2] + 'o' for form in extras if form.endswith('os') and form[:-2] + 'as' in extras]
+                for lemma_form in irregular or ([participle] if participle else []):
+                    add_adjective(lemma_form, _adjective_forms(lemma_form))
+            else:
+                add(lemma)
+
+            for form in extras:
+                if pos == 'v':
+                    verbs.add(form)
+                add(form)
+
+    stripped = {}
+    for form in words:
+        stripped.setdefault(strip_accents(form), []).append(form)
+
+    return {
+        'words': words,
+        'stripped': stripped,
+        'nouns': nouns,
+        'adjectives': adjectives,
+        'adjective_forms': adjective_forms,
+        'verbs': verbs
+    }
+
+
+def get_lexicon():
+    """Get the expanded lexicon, loading it on first use"""
+    global _lexicon
+    if _lexicon is None:
+        with _lexicon_lock:
+            if _lexicon is None:
+                _lexicon = _load_lexicon()
+    return _lexicon
+
+
+def _tokenize(text):
+    """
+    Split text into words.
+
+    Returns:
+        list: (word, lowercase word, start, end, sentence_start, opening mark) tuples,
+            where the opening mark is '¿' or '¡' when the word directly follows one
+    """
+    tokens = []
+    previous_end = 0
+    for match in WORD_RE.finditer(text):
+        gap = text[previous_end:match.start()]
+        sentence_start = not tokens or bool(re.search(r"[.!?\n]", gap))
+        opening = gap.strip()[-1:] if gap.strip()[-1:] in ('¿', '¡') else ''
+        tokens.append((match.group(), match.group().lower(), match.start(), match.end(), sentence_start, opening))
+        previous_end = match.end()
+    return tokens
+
+
+def _match_case(original, suggestion):
+    if original.isupper() and len(original) > 1:
+        return suggestion.upper()
+    if original[:1].isupper():
+        return suggestion[:1].upper() + suggestion[1:]
+    return suggestion
+
+
+def _issue(kind, token, suggestion, message):
+    return {
+        'type': kind,
+        'text': token[0],
+        'suggestion': _match_case(token[0], suggestion),
+        'message': message,
+        'start': token[2],
+        'end': token[3]
+    }
+
+
+def _check_accents(tokens, lexicon, issues, flagged):
+    words, stripped, nouns, adjectives, verbs = (
+        lexicon['words'], lexicon['stripped'], lexicon['nouns'], lexicon['adjectives'], lexicon['verbs']
+    )
+
+    for i, token in enumerate(tokens):
+        word = token[1]
+        following = tokens[i + 1][1] if i + 1 < len(tokens) else None
+        previous = tokens[i - 1][1] if i > 0 else None
+        suggestion = None
+
+        if token[5] and word in INTERROGATIVES:
+            suggestion = INTERROGATIVES[word]
+            message = f"Question and exclamation words carry an accent: '{suggestion}'"
+        elif word not in words and len(word) > 1:
+            candidates = [form for form in stripped.get(strip_accents(word), []) if form != word]
+            if len(candidates) == 1:
+                suggestion = candidates[0]
+                message = f"Missing accent or ñ: '{suggestion}'"
+            elif not candidates and re.search(r"[cs]ion$", word):
+                suggestion = word[:-3] + 'ión'
+                message = f"Words ending in -ción/-sión carry an accent: '{suggestion}'"
+        elif word == 'tu' and following in verbs and following not in nouns and following not in adjectives:
+            suggestion, message = 'tú', "The pronoun 'tú' (you) carries an accent; 'tu' means 'your'"
+        elif word == 'el' and following in verbs and following not in nouns and following not in adjectives and following not in DETERMINERS:
+            suggestion, message = 'él', "The pronoun 'él' (he) carries an accent; 'el' means 'the'"
+        elif word == 'mi' and previous in PREPOSITIONS and following not in nouns and following not in adjectives:
+            suggestion, message = 'mí', "After a preposition, the pronoun 'mí' carries an accent; 'mi' means 'my'"
+        elif word == 'esta' and following is not None and (
+            following in ESTA_VERB_CUES or re.search(r"(ando|iendo|yendo)$", following)
+            or (following in adjectives and adjectives[following][0] in STATE_ADJECTIVES)
+        ):
+            suggestion, message = 'está', "The verb 'está' carries an accent; 'esta' means 'this'"
+
+        if suggestion and suggestion != word:
+            issues.append(_issue('accent', token, suggestion, message))
+            flagged.add(i)
+
+
+def _noun_gender(noun, determiner):
+    gender = noun[0]
+    return determiner[1] if gender == 'mf' else gender
+
+
+def _expected_determiner(determiner, noun):
+    """The determiner form that agrees with a noun"""
+    family, det_gender, _ = determiner
+    gender, number, stressed_a = noun
+    gender = det_gender if gender == 'mf' else gender
+    number = determiner[2] if number == 'sp' else number
+    if stressed_a and number == 's' and family[0] in STRESSED_A_FAMILIES:
+        gender = 'm'
+    return family[_SLOTS.index((gender, number))]
+
+
+def _adjective_for(lexicon, adjective, gender, number):
+    lemma, adj_gender, _ = lexicon['adjectives'][adjective]
+    forms = lexicon['adjective_forms'][lemma]
+    return forms.get((gender if adj_gender else None, number))
+
+
+def _check_agreement(tokens, lexicon, issues, flagged):
+    nouns, adjectives = lexicon['nouns'], lexicon['adjectives']
+
+    for i, token in enumerate(tokens[:-1]):
+        determiner = DETERMINERS.get(token[1])
+        noun_token = tokens[i + 1]
+        noun = nouns.get(noun_token[1])
+        if not determiner or not noun:
+            continue
+
+        expected = _expected_determiner(determiner, noun)
+        if expected != token[1] and i not in flagged:
+            kind = 'singular' if noun[1] == 's' else 'plural' if noun[1] == 'p' else None
+            gender = {'m': 'masculine', 'f': 'feminine'}.get(noun[0], '')
+            description = ' '.join(part for part in (gender, kind) if part)
+            issues.append(_issue(
+                'agreement', token, expected,
+                f"'{noun_token[0]}' is {description}: use '{expected} {noun_token[0]}'"
+            ))
+            flagged.add(i)
+
+        gender = _noun_gender(noun, determiner)
+        number = determiner[2] if noun[1] == 'sp' else noun[1]
+
+        # The adjective right after the noun, or after a linking verb (la casa es bonita)
+        j = i + 2
+        if j < len(tokens) and tokens[j][1] in COPULAS:
+            j += 1
+            while j < len(tokens) and tokens[j][1] in INTENSIFIERS:
+                j += 1
+        if j >= len(tokens) or j in flagged:
+            continue
+        adjective = tokens[j][1]
+        if adjective not in adjectives or adjective in nouns or adjective in DETERMINERS:
+            continue
+        # A quantifier starting the next phrase (el parque todos los días)
+        if adjectives[adjective][0] in QUANTIFIERS or (j + 1 < len(tokens) and tokens[j + 1][1] in DETERMINERS):
+            continue
+        correct = _adjective_for(lexicon, adjective, gender, number)
+        if correct and correct != adjective:
+            issues.append(_issue(
+                'agreement', tokens[j], correct,
+                f"The adjective must agree with '{token[0]} {noun_token[0]}': '{correct}'"
+            ))
+            flagged.add(j)
+
+
+def _check_ser_estar(tokens, lexicon, issues, flagged):
+    adjectives = lexicon['adjectives']
+
+    for i, token in enumerate(tokens[:-1]):
+        word = token[1]
+        if word not in SER_TO_ESTAR and word not in ESTAR_TO_SER or i in flagged:
+            continue
+
+        j = i + 1
+        while j < len(tokens) - 1 and tokens[j][1] in INTENSIFIERS:
+            j += 1
+        following = tokens[j][1]
+        lemma = adjectives[following][0] if following in adjectives else None
+
+        if word in SER_TO_ESTAR:
+            estar = SER_TO_ESTAR[word]
+            if lemma in STATE_ADJECTIVES:
+                message = f"'{following}' describes a state, which takes estar: '{estar}'"
+            elif re.search(r"(ando|iendo|yendo)$", following) and following in lexicon['verbs']:
+                message = f"The progressive (-ando/-iendo) is formed with estar: '{estar} {following}'"
+            elif following == 'en' and j == i + 1 and word in ('soy', 'eres', 'somos', 'sois', 'estoy'):
+                message = f"Where someone is takes estar: '{estar} en'"
+            else:
+                continue
+            issues.append(_issue('ser_estar', token, estar, message))
+            flagged.add(i)
+        else:
+            ser = ESTAR_TO_SER[word]
+            if lemma in TRAIT_ADJECTIVES:
+                message = f"'{following}' describes a lasting trait, which takes ser: '{ser}'"
+            elif following in ('un', 'una') and j == i + 1 and word in ('estoy', 'estás', 'estamos', 'estáis'):
+                message = f"Saying what someone is takes ser: '{ser} {following} ...'"
+            else:
+                continue
+            issues.append(_issue('ser_estar', token, ser, message))
+            flagged.add(i)
+
+
+def _edits(word):
+    """Every string one edit away from word"""
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    deletes = [left + right[1:] for left, right in splits if right]
+    transposes = [left + right[1] + right[0] + right[2:] for left, right in splits if len(right) > 1]
+    replaces = [left + c + right[1:] for left, right in splits if right for c in ALPHABET]
+    inserts = [left + c + right for left, right in splits for c in ALPHABET]
+    return set(deletes + transposes + replaces + inserts)
+
+
+def _check_spelling(tokens, lexicon, issues, flagged):
+    words = lexicon['words']
+
+    for i, token in enumerate(tokens):
+        word = token[1]
+        if i in flagged or word in words or len(word) < 4:
+            continue
+        # Capitalized words inside a sentence are most likely names
+        if token[0][:1].isupper() and not token[4]:
+            continue
+        # Learners rarely get the first letter wrong, and a small lexicon makes
+        # words that differ there (aprobamos/probamos) likely both valid
+        candidates = sorted(
+            (form for form in _edits(word) if form in words and form[:1] == word[:1]),
+            key=words.get
+        )
+        if candidates:
+            issues.append(_issue('spelling', token, candidates[0], f"Unknown word; did you mean '{candidates[0]}'?"))
+            flagged.add(i)
+
+
+def _check_repetition(tokens, issues, flagged):
+    for i in range(1, len(tokens)):
+        if tokens[i][1] == tokens[i - 1][1] and i not in flagged:
+            token = tokens[i]
+            issues.append({
+                'type': 'repetition',
+                'text': token[0],
+                'suggestion': '',
+                'message': f"'{token[0]}' is repeated",
+                'start': tokens[i - 1][3],
+                'end': token[3]
+            })
+            flagged.add(i)
+
+
+def precheck(text, language='Spanish'):
+    """
+    Run the local rule-based checks on a piece of writing.
+
+    The checks are deterministic and need no model call: missing accents
+    and ñ, determiner/noun/adjective agreement, ser vs. estar, spelling
+    against the bundled lexicon, and repeated words.
+
+    Args:
+        text (str): The writing to check
+        language (str): The language of the writing (only Spanish is supported)
+
+    Returns:
+        dict: 'supported', 'issues' (each with type, text, suggestion, message,
+            start and end offsets into text) and 'elapsed_ms'
+    """
+    started = time.perf_counter()
+    if (language or '').strip().lower() not in SUPPORTED_LANGUAGES or not text:
+        return {'language': language, 'supported': False, 'issues': [], 'elapsed_ms': 0.0}
+
+    lexicon = get_lexicon()
+    tokens = _tokenize(text)
+    issues = []
+    flagged = set()
+
+    # Earlier checks take precedence over later ones for the same word
+    _check_accents(tokens, lexicon, issues, flagged)
+    _check_agreement(tokens, lexicon, issues, flagged)
+    _check_ser_estar(tokens, lexicon, issues, flagged)
+    _check_spelling(tokens, lexicon, issues, flagged)
+    _check_repetition(tokens, issues, flagged)
+
+    issues.sort(key=lambda issue: issue['start'])
+    return {
+        'language': language,
+        'supported': True,
+        'issues': issues,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def summarize(result):
+    """
+    Describe pre-check issues as feedback text (used when model feedback is unavailable).
+
+    Args:
+        result (dict): The result of precheck()
+
+    Returns:
+        str: One line per issue, or a note that nothing was found
+    """
+    if not result.get('supported'):
+        return "Automatic checks are not available for this language."
+    if not result['issues']:
+        return "Automatic checks found no common errors."
+
+    lines = [f"Automatic checks found {len(result['issues'])} possible issue(s):"]
+    for issue in result['issues']:
+        fix = f" -> {issue['suggestion']}" if issue['suggestion'] else ''
+        lines.append(f"- {issue['text']}{fix}: {issue['message']}")
+    return '\n'.join(lines)